@@ -1,8 +1,16 @@
 import argparse
+import atexit
+import datetime
 import logging
 
 import pyminknow.config as config
-import pyminknow.server
+import pyminknow.jsonlog
+import pyminknow.startup
+
+# The server's modules are imported in main(), once the modules it doesn't need until it's listening have been
+# deferred (in turn, so the startup report times each)
+SERVER_MODULES = ('pyminknow.clock', 'pyminknow.scheduler', 'pyminknow.bandwidth', 'pyminknow.server',
+                  'pyminknow.retention', 'pyminknow.shard')
 
 LOGGER = logging.getLogger(__name__)
 
@@ -20,22 +28,96 @@ def get_args():
     parser = argparse.ArgumentParser(usage=USAGE, description=DESCRIPTION)
 
     parser.add_argument('-v', '--verbose', action='store_true', help='Debug logging')
+    parser.add_argument('--log_format', choices=pyminknow.jsonlog.FORMATS, default=config.LOG_FORMAT,
+                        help='Log output format')
     parser.add_argument('-p', '--port', type=int, default=config.DEFAULT_PORT, help='Listen on this port')
     parser.add_argument('-g', '--grace', type=int, default=config.GRACE, help='Grace period (seconds) when stopping')
+    parser.add_argument('-j', '--inject', action='append', default=list(),
+                        help='Latency/fault injection rule e.g. "method=get_*,device=X1,latency=uniform:0.1:0.5"')
+    parser.add_argument('--inject_file', help='JSON file of latency/fault injection rules (reloaded on change)')
+    parser.add_argument('--inject_seed', type=int, help='Random seed for latency/fault injection')
+    parser.add_argument('--record', help='Record RPCs to this binary log file')
+    parser.add_argument('--replay', help='Serve recorded responses from this binary log file')
+    parser.add_argument('--replay_time_scale', type=float, default=1., help='Replay speed-up factor')
+    parser.add_argument('--trace', help='Write request traces to this OTLP JSON-lines file')
+    parser.add_argument('--trace_sample', type=float, default=config.TRACE_SAMPLE_RATE,
+                        help='Fraction of requests to trace (unless the client decides)')
+    parser.add_argument('--retain_days', type=float, default=config.RETENTION_MAX_AGE,
+                        help='Expire runs older than this many days')
+    parser.add_argument('--retain_runs', type=int, default=config.RETENTION_MAX_COUNT,
+                        help='Keep at most this many runs per device')
+    parser.add_argument('--retain_gb', type=float, default=config.RETENTION_MAX_GB,
+                        help='Keep at most this much output data (GB) per device')
+    parser.add_argument('-s', '--speed', type=float, default=config.CLOCK_SPEED,
+                        help='Simulated clock speed (e.g. 1440 runs a day-long experiment in a minute)')
+    parser.add_argument('--shards', type=int, default=config.SHARDS,
+                        help='Serve devices from this many worker processes')
+    parser.add_argument('--max_runs', type=int, default=config.MAX_ACTIVE_RUNS,
+                        help='Maximum runs generating data at once across all positions (others are queued)')
+    parser.add_argument('--disk_mb', type=float, default=config.DISK_BANDWIDTH_MB,
+                        help='Disk write budget (MB/s) shared by the positions writing output')
+    parser.add_argument('--generation_workers', type=int, default=config.GENERATION_WORKERS,
+                        help='Processes that build output records (default: one per CPU, 0: none)')
+    parser.add_argument('--startup_report', '--startup-report', action='store_true',
+                        help='Print how long each stage of starting the server took')
+    parser.add_argument('--startup_budget', type=float, default=config.STARTUP_BUDGET,
+                        help='Warn if the server takes longer than this (seconds) to start listening')
+
+    args = parser.parse_args()
 
-    return parser.parse_args()
+    # Each shard runs at least one protocol at a time
+    if args.shards and args.max_runs and args.max_runs < min(args.shards, len(config.DEVICES)):
+        parser.error('--max_runs must be at least the number of shards')
 
+    return args
 
-def configure_logging(verbose: bool = False):
-    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO)
+
+def configure_logging(verbose: bool = False, log_format: str = None):
+    """Write logs from a background thread so request handlers never wait for stderr"""
+    listener = pyminknow.jsonlog.configure(verbose=verbose, log_format=log_format)
+    atexit.register(listener.stop)
     logging.captureWarnings(capture=True)
 
 
 def main():
     args = get_args()
-    configure_logging(verbose=args.verbose)
+    configure_logging(verbose=args.verbose, log_format=args.log_format)
+
+    startup = pyminknow.startup.StartupReport(budget=args.startup_budget, show=args.startup_report)
+    pyminknow.startup.defer_imports()
+    startup.mark('parse arguments')
+    startup.import_modules(*SERVER_MODULES)
+
+    pyminknow.clock.CLOCK.speed = args.speed
+    pyminknow.scheduler.SCHEDULER.max_active = args.max_runs
+    pyminknow.bandwidth.GOVERNOR.rate_mb = args.disk_mb
+    config.GENERATION_WORKERS = args.generation_workers
+
+    middleware = dict(
+        inject=args.inject,
+        inject_file=args.inject_file,
+        inject_seed=args.inject_seed,
+        record=args.record,
+        replay=args.replay,
+        replay_time_scale=args.replay_time_scale,
+        trace=args.trace,
+        trace_sample=args.trace_sample,
+    )
+
+    retention = pyminknow.retention.RetentionPolicy(
+        max_age=datetime.timedelta(days=args.retain_days) if args.retain_days is not None else None,
+        max_count=args.retain_runs,
+        max_bytes=int(args.retain_gb * 1e9) if args.retain_gb is not None else None,
+    )
 
-    server = pyminknow.server.Server(port=args.port)
+    if args.shards:
+        server = pyminknow.shard.ShardedServer(shards=args.shards, port=args.port, middleware=middleware,
+                                               verbose=args.verbose, log_format=args.log_format,
+                                               max_runs=args.max_runs, disk_mb=args.disk_mb,
+                                               retention=retention or None, startup=startup)
+    else:
+        server = pyminknow.server.Server(port=args.port, retention=retention or None, startup=startup,
+                                         **pyminknow.server.build_middleware(**middleware))
     server.serve(grace=args.grace)
 
 
@@ -0,0 +1,124 @@
+"""
+Resource accounting
+
+Each run counts the resources it uses: bytes written and files created (output and run metadata), CPU seconds
+(generating reads, building and writing records in this process or the record builders, and compressing) and the
+memory held in buffers between stages (reads waiting to be basecalled, rendered records, blocks being compressed).
+A run's counters roll up into its position's, and the positions' into the host's, so the host's peak buffer memory
+is the most held at once across every position.
+
+Counters are updated once per batch, block or file from figures the code has at hand (lengths, and the thread CPU
+clock, which doesn't need a system call), never by asking the operating system about the process.
+"""
+
+import contextlib
+import threading
+import time
+
+FIELDS = ('bytes_written', 'files_created', 'cpu_seconds', 'buffer_bytes', 'peak_buffer_bytes')
+
+
+class Usage:
+    """Resources used by a run, a position or the host"""
+
+    def __init__(self, parent=None):
+        """
+        :param parent: Usage that includes this one
+        """
+        self.parent = parent
+        self.bytes_written = 0
+        self.files_created = 0
+        self.cpu_seconds = 0.
+        self.buffer_bytes = 0
+        self.peak_buffer_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, bytes_written: int = 0, files_created: int = 0, cpu_seconds: float = 0.):
+        with self._lock:
+            self.bytes_written += bytes_written
+            self.files_created += files_created
+            self.cpu_seconds += cpu_seconds
+        if self.parent:
+            self.parent.add(bytes_written, files_created, cpu_seconds)
+
+    def hold(self, size: int):
+        """Memory taken by a buffer"""
+        with self._lock:
+            self.buffer_bytes += size
+            self.peak_buffer_bytes = max(self.peak_buffer_bytes, self.buffer_bytes)
+        if self.parent:
+            self.parent.hold(size)
+
+    def release(self, size: int):
+        with self._lock:
+            self.buffer_bytes -= size
+        if self.parent:
+            self.parent.release(size)
+
+    @contextlib.contextmanager
+    def buffer(self, size: int):
+        """Hold memory while a buffer is in use"""
+        self.hold(size)
+        try:
+            yield
+        finally:
+            self.release(size)
+
+    @contextlib.contextmanager
+    def cpu(self):
+        """Count the CPU time this thread spends inside the block"""
+        start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(cpu_seconds=time.thread_time() - start)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {field: getattr(self, field) for field in FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        usage = cls()
+        for field in FIELDS:
+            setattr(usage, field, data.get(field, 0))
+        return usage
+
+
+def total(usages) -> dict:
+    """Sum of several usages, as dictionaries (the peak is an upper bound: the parts may not peak together)"""
+    result = dict.fromkeys(FIELDS, 0)
+    for usage in usages:
+        for field in FIELDS:
+            result[field] += usage.get(field, 0)
+    return result
+
+
+class Accounts:
+    """Usage of the host and each position served by this process, since the server started"""
+
+    def __init__(self):
+        self.host = Usage()
+        self.positions = dict()
+        self._lock = threading.Lock()
+
+    def position(self, name: str) -> Usage:
+        with self._lock:
+            try:
+                return self.positions[name]
+            except KeyError:
+                usage = self.positions[name] = Usage(parent=self.host)
+                return usage
+
+    def run(self, position: str) -> Usage:
+        """New counters for a run, included in its position's"""
+        return Usage(parent=self.position(position))
+
+    def stats(self) -> dict:
+        with self._lock:
+            positions = dict(self.positions)
+        return dict(host=self.host.as_dict(), positions={name: usage.as_dict() for name, usage in positions.items()})
+
+
+# Shared by every position in this process
+ACCOUNTS = Accounts()
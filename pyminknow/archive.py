@@ -0,0 +1,86 @@
+"""
+Run history archive
+
+Metadata for expired runs is compacted from one pickle file per run into a single archive file per device, which is
+a pickled dictionary of run data keyed by run ID.
+"""
+
+import logging
+import os
+import pathlib
+import pickle
+import threading
+
+import pyminknow.bandwidth
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RunArchive:
+    """Compacted run metadata for a device"""
+    FILENAME = 'runs.archive'
+
+    # Loaded archives keyed by path, with the modification time they were read at
+    _cache = dict()
+    _lock = threading.Lock()
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = pathlib.Path(directory)
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self.directory.joinpath(self.FILENAME)
+
+    def load(self) -> dict:
+        """Read the archive (cached until the file changes)"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return dict()
+
+        with self._lock:
+            try:
+                cached_mtime, runs = self._cache[self.path]
+                if cached_mtime == mtime:
+                    return runs
+            except KeyError:
+                pass
+
+            with self.path.open('rb') as file:
+                runs = pickle.load(file)
+
+                LOGGER.debug("Read '%s'", file.name)
+
+            self._cache[self.path] = mtime, runs
+
+            return runs
+
+    def get(self, run_id: str) -> dict:
+        """Get the data for an archived run"""
+        # Copy because deserialisation consumes the dictionary
+        return dict(self.load()[run_id])
+
+    def __contains__(self, run_id: str) -> bool:
+        return run_id in self.load()
+
+    @property
+    def run_ids(self) -> list:
+        """Chronological order (by start time ascending)"""
+        runs = self.load()
+        return sorted(runs, key=lambda run_id: runs[run_id]['_start_time'])
+
+    def add(self, runs: dict):
+        """Merge runs into the archive"""
+        data = dict(self.load())
+        data.update(runs)
+
+        # Atomic replacement so readers never see a partial archive
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        data = pickle.dumps(data)
+        pyminknow.bandwidth.GOVERNOR.acquire(None, len(data), priority=True)
+        with temp_path.open('wb') as file:
+            file.write(data)
+        os.replace(temp_path, self.path)
+
+        LOGGER.info("Archived %s runs to '%s'", len(runs), self.path)
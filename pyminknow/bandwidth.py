@@ -0,0 +1,144 @@
+"""
+Disk bandwidth governor
+
+Output writers draw from a host-wide write budget (config.DISK_BANDWIDTH_MB) so that positions generating data at
+the same time share the disk evenly and can't starve each other or the run metadata. Each position that is writing
+has its own token bucket, refilled at an equal share of the budget; the shares are recalculated whenever a position
+starts or stops writing.
+
+Bulk data waits until its position's bucket is no longer in debt. Metadata and journal writes are marked as priority:
+they never wait, but their bytes are still taken from the buckets, so bulk data makes room for them.
+"""
+
+import logging
+import threading
+import time
+
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Bytes that may be written now, refilled at a fixed rate"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: Bytes per second
+        :param capacity: Maximum burst (bytes)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def delay(self) -> float:
+        """Seconds until the bucket is out of debt"""
+        return max(-self.tokens / self.rate, 0.) if self.rate else 0.
+
+
+class DiskGovernor:
+    """Share a write budget fairly between positions, with priority for metadata"""
+
+    def __init__(self, rate_mb: float = None, burst: float = None):
+        """
+        :param rate_mb: Host-wide write budget (MB/s, None: unlimited)
+        :param burst: Seconds of each position's share that may be written at once
+        """
+        self.rate_mb = pyminknow.config.DISK_BANDWIDTH_MB if rate_mb is None else rate_mb
+        self.burst = burst or pyminknow.config.DISK_BURST_SECONDS
+
+        # Token bucket and number of open writers for each position
+        self.buckets = dict()
+        self.writers = dict()
+        self._condition = threading.Condition()
+
+        # Statistics
+        self.bytes = dict(bulk=0, priority=0)
+        self.waited = 0.
+
+    @property
+    def rate(self) -> float:
+        """Bytes per second (0: unlimited)"""
+        return (self.rate_mb or 0) * 1e6
+
+    def register(self, position: str):
+        """A writer for this position has opened"""
+        with self._condition:
+            self.writers[position] = self.writers.get(position, 0) + 1
+            if position not in self.buckets:
+                bucket = self.buckets[position] = TokenBucket(rate=0, capacity=0)
+                self._rebalance()
+                bucket.tokens = bucket.capacity
+
+    def unregister(self, position: str):
+        with self._condition:
+            self.writers[position] -= 1
+            if not self.writers[position]:
+                del self.writers[position]
+                del self.buckets[position]
+                self._rebalance()
+            self._condition.notify_all()
+
+    def _rebalance(self):
+        """Give every writing position an equal share of the budget"""
+        if not self.buckets:
+            return
+
+        share = self.rate / len(self.buckets)
+        now = time.monotonic()
+        for bucket in self.buckets.values():
+            bucket.refill(now)
+            bucket.rate = share
+            bucket.capacity = share * self.burst
+            bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+        LOGGER.debug("Disk bandwidth %.1f MB/s per position for %s", share / 1e6, ', '.join(self.buckets))
+
+    def acquire(self, position: str, size: int, priority: bool = False):
+        """
+        Take bytes from a position's budget, waiting if it's in debt (unless the write has priority)
+
+        :param position: Position name (None for host-level writes, which are charged to every position)
+        :param size: Bytes about to be written
+        :param priority: Metadata or journal write
+        """
+        with self._condition:
+            self.bytes['priority' if priority else 'bulk'] += size
+
+            if not self.rate:
+                return
+
+            if position not in self.buckets:
+                # Spread host-level writes across the positions that are writing
+                for bucket in self.buckets.values():
+                    bucket.refill()
+                    bucket.tokens -= size / len(self.buckets)
+                return
+
+            bucket = self.buckets[position]
+            bucket.refill()
+
+            if not priority:
+                start = time.monotonic()
+                while bucket.tokens < 0 and self.buckets.get(position) is bucket:
+                    self._condition.wait(bucket.delay)
+                    bucket.refill()
+                self.waited += time.monotonic() - start
+
+            # Large writes may leave the bucket in debt
+            bucket.tokens -= size
+
+    def stats(self) -> dict:
+        with self._condition:
+            return dict(self.bytes, waited=self.waited, positions=len(self.buckets))
+
+
+# Shared by every position in this process
+GOVERNOR = DiskGovernor()
@@ -0,0 +1,176 @@
+"""
+Simulated basecalling
+
+Reads pass through a basecaller between acquisition and the output files. Batches of reads wait in a bounded queue
+(acquisition waits when it's full) and are taken by a pool of worker threads, each of which spends as long on a batch
+as its share of the basecaller's throughput (raw samples per simulated second) allows. Reads are routed to pass or
+fail by their mean q-score.
+
+How far basecalling has got is reported as the acquisition time of the reads processed so far, so progress reports can
+compare it with acquisition. When a run ends, the reads still queued are basecalled at the same rate; when it's
+stopped without finishing processing they're written straight away.
+
+If writing a batch fails, the batches after it are dropped and the error is raised by the next call to submit() or by
+close(), so the run fails rather than completing with reads missing.
+"""
+
+import logging
+import queue
+import threading
+
+import pyminknow.accounting
+import pyminknow.clock
+import pyminknow.config
+import pyminknow.reads
+import pyminknow.throughput
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Basecaller:
+    """Basecall batches of reads on worker threads, with a bounded backlog"""
+
+    def __init__(self, throughput: pyminknow.throughput.Throughput, write, rate: float = None,
+                 workers: int = None, queue_size: int = None, min_qscore: float = None, name: str = '',
+                 usage: pyminknow.accounting.Usage = None, record=None):
+        """
+        :param throughput: Flow cell sequencing model
+        :param write: Callable that writes a basecalled batch of reads (called by one worker at a time)
+        :param rate: Raw samples basecalled per simulated second across all workers (None: keep up with acquisition)
+        :param workers: Worker threads
+        :param queue_size: Batches waiting to be basecalled
+        :param min_qscore: Minimum mean q-score for a read to pass
+        :param name: Position name, for thread names
+        :param usage: Count the memory taken by the batches waiting
+        :param record: Callable that counts a basecalled batch of reads in the run statistics, with the batch's
+            acquisition time (called with write)
+        """
+        self.throughput = throughput
+        self.write = write
+        self.record = record
+        self.rate = pyminknow.config.BASECALL_RATE if rate is None else rate
+        self.workers = workers or pyminknow.config.BASECALL_WORKERS
+        self.min_qscore = pyminknow.config.QSCORE_THRESHOLD if min_qscore is None else min_qscore
+        self.usage = usage or pyminknow.accounting.Usage()
+
+        self.queue = queue.Queue(maxsize=queue_size or pyminknow.config.BASECALL_QUEUE_SIZE)
+        self._write_lock = threading.Lock()
+
+        # Set to write the remaining reads without waiting
+        self._flush = threading.Event()
+
+        # Acquisition time of each batch, and of the batches before the first one still being basecalled
+        self._sequence = 0
+        self._elapsed = dict()
+        self._done = set()
+        self._next = 0
+        self.processed_elapsed = 0.
+        self._progress_lock = threading.Lock()
+
+        # The first batch that failed to be written
+        self.error = None
+
+        # Statistics
+        self.samples = 0
+        self.reads = 0
+
+        self._threads = [threading.Thread(target=self.work, name='basecall-{}-{}'.format(name, index), daemon=True)
+                         for index in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def classify(self, batch: pyminknow.reads.ReadBatch) -> pyminknow.reads.ReadBatch:
+        """Route reads to pass or fail by their mean q-score"""
+        return batch._replace(passed=batch.qscores >= self.min_qscore)
+
+    def samples_in(self, batch: pyminknow.reads.ReadBatch) -> int:
+        return int(batch.lengths.sum() * self.throughput.samples_per_base)
+
+    def submit(self, batch: pyminknow.reads.ReadBatch, elapsed: float):
+        """
+        Queue reads for basecalling, waiting if the backlog is full
+
+        :param elapsed: Acquisition time (seconds) at the end of this batch
+        :raises: The error that stopped basecalling, if a batch failed
+        """
+        if self.error is not None:
+            raise self.error
+
+        with self._progress_lock:
+            sequence = self._sequence
+            self._sequence += 1
+            self._elapsed[sequence] = elapsed
+
+        size = pyminknow.reads.batch_size(batch)
+        self.usage.hold(size)
+        self.queue.put((sequence, batch, size))
+
+    def work(self):
+        per_worker = self.rate / self.workers if self.rate else None
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            sequence, batch, size = item
+            try:
+                # Drop the rest of the reads after a failure
+                if self.error is not None:
+                    continue
+
+                samples = self.samples_in(batch)
+                if per_worker and not self._flush.is_set():
+                    pyminknow.clock.wait(self._flush, samples / per_worker)
+
+                with self._write_lock:
+                    batch = self.classify(batch)
+                    self.write(batch)
+                    if self.record:
+                        self.record(batch, self._elapsed[sequence])
+                    self.samples += samples
+                    self.reads += len(batch.lengths)
+            except Exception as error:
+                LOGGER.exception("Basecalling failed")
+                self.error = self.error or error
+            finally:
+                self.usage.release(size)
+                self.done(sequence)
+
+    def done(self, sequence: int):
+        """Advance progress past every batch that has been basecalled"""
+        with self._progress_lock:
+            self._done.add(sequence)
+            while self._next in self._done:
+                self._done.remove(self._next)
+                self.processed_elapsed = self._elapsed.pop(self._next)
+                self._next += 1
+
+    @property
+    def backlog(self) -> int:
+        """Batches waiting to be basecalled"""
+        return self.queue.qsize()
+
+    def flush(self):
+        """Write the remaining reads without basecalling delay"""
+        self._flush.set()
+
+    def close(self):
+        """
+        Basecall every queued batch and stop the workers
+
+        :raises: The error that stopped basecalling, if a batch failed
+        """
+        threads, self._threads = self._threads, list()
+        if not threads:
+            return
+
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+
+        LOGGER.info("Basecalled %s reads (%.1f M samples)", self.reads, self.samples / 1e6)
+
+        if self.error is not None:
+            raise self.error
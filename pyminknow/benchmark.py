@@ -0,0 +1,251 @@
+"""
+Microbenchmarks
+
+Times the functions on the request path that scale with run history or configuration: serialising run metadata,
+writing run reports, building run and protocol information, listing run IDs and describing flow cell positions.
+Runs are written to a temporary directory, not RUN_DIR or DATA_DIR.
+
+Results are written as JSON. Compare against a stored baseline to flag benchmarks that have slowed down, e.g.
+
+    python -m pyminknow.benchmark --output baseline.json
+    python -m pyminknow.benchmark --output results.json --compare baseline.json --threshold 0.2
+
+The exit status is 1 if any benchmark regressed.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import minknow_api.protocol_pb2
+
+import pyminknow.channels
+import pyminknow.config
+import pyminknow.reads
+import pyminknow.service.manager
+import pyminknow.service.protocol
+import pyminknow.stats
+import pyminknow.throughput
+
+LOGGER = logging.getLogger(__name__)
+
+HISTORY_SIZES = (10, 100, 1000, 10000, 100000)
+MIN_TIME = 0.2  # seconds per round
+ROUNDS = 5
+THRESHOLD = 0.2  # fractional slow-down
+
+Run = pyminknow.service.protocol.Run
+ProtocolService = pyminknow.service.protocol.ProtocolService
+
+
+def build_run(device: dict) -> Run:
+    """A completed run with statistics"""
+    run = Run(protocol_id=pyminknow.config.PROTOCOLS[0]['identifier'],
+              user_info=Run.build_user_info(protocol_group_id='benchmark', sample_id='benchmark'),
+              args=['--fast5=on', '--fastq=on', '--experiment_time=1'], device=dict(device))
+    run.start_time = datetime.datetime(2020, 5, 12, 15, 17)
+    run.end_time = run._start_time + datetime.timedelta(hours=1)
+    run.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_COMPLETED
+
+    throughput = pyminknow.throughput.Throughput.for_device(device)
+    run.statistics = pyminknow.stats.RunStatistics(throughput)
+    run.channels = pyminknow.channels.ChannelStates.for_device(device)
+    generator = pyminknow.reads.ReadGenerator(throughput, seed=0)
+    for minute in range(1, 61):
+        run.channels.advance(60)
+        run.statistics.add(generator.generate_until(minute * 60), minute * 60, run.channels.counts())
+
+    return run
+
+
+def build_history(device: dict, size: int, data: bytes):
+    """Write run files for a device, oldest first"""
+    directory = Run.build_serialisation_dir(device)
+    directory.mkdir(parents=True, exist_ok=True)
+    for _ in range(size):
+        directory.joinpath('{}.{}'.format(Run.make_run_id(), Run.SERIALISATION_EXT)).write_bytes(data)
+
+
+def is_selected(name: str, names: list = None) -> bool:
+    """Whether a benchmark's name contains one of the patterns (all are selected if there are none)"""
+    return not names or any(pattern in name for pattern in names)
+
+
+def build_benchmarks(history_sizes: tuple = HISTORY_SIZES, names: list = None) -> dict:
+    """
+    Functions to time, keyed by name (call inside a temporary RUN_DIR and DATA_DIR)
+
+    :param names: Only build benchmarks whose names contain one of these (run history is only written for these)
+    """
+    device = pyminknow.config.DEVICES[0]
+    run = build_run(device)
+    run.serialise()
+
+    def deserialise():
+        Run(run_id=run.run_id, device=device).deserialise()
+
+    tags = [value for protocol in pyminknow.config.PROTOCOLS for value in protocol['tags'].values()]
+
+    def tag_value():
+        for value in tags:
+            ProtocolService.tag_value(value)
+
+    # One position isn't running
+    status = {device['name']: ('STATE_INITIALISING', 'Restarting')}
+    manager = pyminknow.service.manager.ManagerService(status=lambda: status)
+
+    benchmarks = {
+        'run.serialise': run.serialise,
+        'run.deserialise': deserialise,
+        'run.save_data': run.save_data,
+        'run.info': lambda: run.info,
+        'protocol.get_protocol_info': ProtocolService.get_protocol_info,
+        'protocol.tag_value': tag_value,
+        'manager.flow_cell_positions': lambda: manager._flow_cell_positions,
+    }
+
+    data = run.path.read_bytes()
+    for size in history_sizes:
+        name = 'run.get_run_ids[{}]'.format(size)
+        if not is_selected(name, names):
+            continue
+        history = dict(device, name='history{}'.format(size))
+        build_history(history, size, data)
+        benchmarks[name] = lambda history=history: list(Run.get_run_ids(history))
+
+    return {name: func for name, func in benchmarks.items() if is_selected(name, names)}
+
+
+def measure(func, min_time: float = MIN_TIME, rounds: int = ROUNDS) -> dict:
+    """Seconds per call, from several rounds of repeated calls"""
+    # Find how many calls take long enough to time reliably
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    times = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+
+    return dict(
+        median=statistics.median(times),
+        min=min(times),
+        mean=statistics.mean(times),
+        stdev=statistics.stdev(times) if len(times) > 1 else 0.,
+        rounds=len(times),
+        iterations=number,
+    )
+
+
+def run_benchmarks(names: list = None, history_sizes: tuple = HISTORY_SIZES, min_time: float = MIN_TIME,
+                   rounds: int = ROUNDS) -> dict:
+    """
+    :param names: Only run benchmarks whose names contain one of these
+    :returns: Results document
+    """
+    results = dict()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        run_dir, data_dir = pyminknow.config.RUN_DIR, pyminknow.config.DATA_DIR
+        pyminknow.config.RUN_DIR = directory.joinpath('runs')
+        pyminknow.config.DATA_DIR = str(directory.joinpath('data'))
+        try:
+            benchmarks = build_benchmarks(history_sizes=history_sizes, names=names)
+
+            for name, func in benchmarks.items():
+                results[name] = measure(func, min_time=min_time, rounds=rounds)
+                LOGGER.info("%s: %.3g s", name, results[name]['median'])
+        finally:
+            pyminknow.config.RUN_DIR, pyminknow.config.DATA_DIR = run_dir, data_dir
+
+    return dict(
+        time=datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpu_count=os.cpu_count(),
+        results=results,
+    )
+
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD) -> dict:
+    """
+    Compare median times with a baseline
+
+    :returns: Ratio of current to baseline time for each benchmark in both, and the names of those that regressed
+    """
+    ratios = dict()
+    for name, result in results['results'].items():
+        try:
+            ratios[name] = result['median'] / baseline['results'][name]['median']
+        except (KeyError, ZeroDivisionError):
+            continue
+
+    regressions = [name for name, ratio in ratios.items() if ratio > 1 + threshold]
+
+    return dict(ratios=ratios, regressions=regressions)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Run microbenchmarks')
+
+    parser.add_argument('-o', '--output', help='Results file (JSON)')
+    parser.add_argument('-c', '--compare', help='Baseline results file to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=THRESHOLD,
+                        help='Flag benchmarks this fraction slower than the baseline')
+    parser.add_argument('-k', '--names', nargs='+', help='Only run benchmarks with names containing these')
+    parser.add_argument('-s', '--history_sizes', type=int, nargs='+', default=HISTORY_SIZES,
+                        help='Numbers of past runs to list')
+    parser.add_argument('-r', '--rounds', type=int, default=ROUNDS, help='Timed rounds per benchmark')
+    parser.add_argument('-m', '--min_time', type=float, default=MIN_TIME, help='Minimum seconds per round')
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmarks(names=args.names, history_sizes=args.history_sizes, min_time=args.min_time,
+                             rounds=args.rounds)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    comparison = dict(ratios=dict(), regressions=list())
+    if args.compare:
+        with open(args.compare) as file:
+            comparison = compare(results, json.load(file), threshold=args.threshold)
+
+    for name, result in results['results'].items():
+        line = '{:40} {:>12.3f} us  ({} x {})'.format(name, result['median'] * 1e6, result['rounds'],
+                                                      result['iterations'])
+        if name in comparison['ratios']:
+            line += '  {:+.1%}{}'.format(comparison['ratios'][name] - 1,
+                                         '  REGRESSION' if name in comparison['regressions'] else '')
+        print(line)
+
+    if comparison['regressions']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Channel and well state simulation
+
+The state of every channel on a flow cell is held in NumPy arrays and advanced with vectorised random transitions:
+
+* each channel is connected to one of its wells (the mux); wells (pores) die at a constant rate
+* when the selected well dies the channel switches to its next live well, or becomes unavailable
+* channels with a live pore alternate between an open pore and sequencing a strand
+* channels occasionally saturate and later recover
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+
+import numpy
+
+import pyminknow.config
+
+STATES = ('pore', 'strand', 'saturated', 'unavailable')
+PORE, STRAND, SATURATED, UNAVAILABLE = range(len(STATES))
+
+
+class ChannelStates:
+    """Channel states for one flow cell"""
+
+    # Models for each device, keyed by device name
+    _devices = dict()
+    _devices_lock = threading.Lock()
+
+    def __init__(self, channel_count: int = None, wells_per_channel: int = None, seed: int = None):
+        self.channel_count = channel_count or pyminknow.config.THROUGHPUT['channel_count']
+        self.wells_per_channel = wells_per_channel or pyminknow.config.WELLS_PER_CHANNEL
+        self.random = numpy.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        # Not every well has a working pore when the flow cell is new
+        shape = (self.channel_count, self.wells_per_channel)
+        self.alive = self.random.random(shape) < pyminknow.config.CHANNEL_ACTIVE_FRACTION
+
+        # Selected well for each channel (1-based, 0 means none)
+        self.mux = self.first_alive()
+        self.state = numpy.where(self.mux > 0, PORE, UNAVAILABLE).astype(numpy.uint8)
+        self.elapsed = 0.
+
+    @classmethod
+    def for_device(cls, device: dict):
+        """Get the model for the flow cell in a device"""
+        with cls._devices_lock:
+            try:
+                return cls._devices[device['name']]
+            except KeyError:
+                flow_cell = device.get('flow_cell') or dict()
+                model = cls._devices[device['name']] = cls(
+                    channel_count=flow_cell.get('channel_count'),
+                    wells_per_channel=flow_cell.get('wells_per_channel'),
+                )
+                return model
+
+    def first_alive(self) -> numpy.ndarray:
+        """The first live well of each channel (1-based, 0 if there are none)"""
+        return numpy.where(self.alive.any(axis=1), self.alive.argmax(axis=1) + 1, 0).astype(numpy.uint8)
+
+    @staticmethod
+    def probability(rate: float, dt: float) -> float:
+        """Probability of at least one event of a Poisson process in a time interval"""
+        return 1 - math.exp(-rate * dt)
+
+    def advance(self, dt: float):
+        """Move the simulation forward by a time interval (seconds)"""
+        if dt <= 0:
+            return
+
+        channels = numpy.arange(self.channel_count)
+
+        with self._lock:
+            # Pore death
+            self.alive &= self.random.random(self.alive.shape) >= self.probability(
+                1 / pyminknow.config.PORE_LIFETIME, dt)
+
+            # Switch channels whose selected well died to another well
+            selected = self.mux > 0
+            lost = selected & ~self.alive[channels, self.mux.astype(numpy.int64) - 1]
+            if lost.any():
+                self.mux[lost] = self.first_alive()[lost]
+                self.state[lost] = PORE
+
+            # Occupancy and saturation
+            state = self.state
+            draw = self.random.random(self.channel_count)
+            saturate = self.random.random(self.channel_count) < self.probability(
+                pyminknow.config.SATURATION_RATE, dt)
+            new_state = state.copy()
+            new_state[(state == PORE) & (draw < self.probability(pyminknow.config.CAPTURE_RATE, dt))] = STRAND
+            new_state[(state == STRAND) & (draw < self.probability(pyminknow.config.RELEASE_RATE, dt))] = PORE
+            new_state[(state == SATURATED) & (draw < self.probability(pyminknow.config.RECOVERY_RATE, dt))] = PORE
+            new_state[((state == PORE) | (state == STRAND)) & saturate] = SATURATED
+            new_state[self.mux == 0] = UNAVAILABLE
+
+            self.state = new_state
+            self.elapsed += dt
+
+    def counts(self) -> numpy.ndarray:
+        """Number of channels in each state"""
+        with self._lock:
+            return numpy.bincount(self.state, minlength=len(STATES))
+
+    def snapshot(self, first_channel: int = 1, last_channel: int = None) -> numpy.ndarray:
+        """Copy of the states of a range of channels (1-based, inclusive)"""
+        with self._lock:
+            return self.state[first_channel - 1:last_channel or self.channel_count].copy()
+
+    def mux_scan(self) -> tuple:
+        """
+        Classify every well
+
+        :returns: Arrays of channel, mux, well state name
+        """
+        with self._lock:
+            alive = self.alive.copy()
+            saturated = (self.state == SATURATED)[:, numpy.newaxis]
+
+        well_states = numpy.where(alive, numpy.where(saturated, 'saturated', 'single_pore'), 'zero')
+        channels, muxes = numpy.indices(alive.shape)
+
+        return (channels + 1).ravel(), (muxes + 1).ravel(), well_states.ravel()
+
+    def write_mux_scan(self, path):
+        channels, muxes, well_states = self.mux_scan()
+        table = numpy.column_stack((channels.astype(str), muxes.astype(str), well_states))
+
+        numpy.savetxt(path, table, fmt='%s', delimiter=',', header='channel,mux,well_state', comments='')
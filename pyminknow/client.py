@@ -1,7 +1,9 @@
 import argparse
+import json
 import logging
 
 import grpc
+import google.protobuf.empty_pb2
 import google.protobuf.wrappers_pb2
 
 import minknow_api.device_pb2
@@ -12,8 +14,12 @@ import minknow_api.protocol_pb2
 import minknow_api.protocol_pb2_grpc
 import minknow_api.acquisition_pb2
 import minknow_api.acquisition_pb2_grpc
+import minknow_api.data_pb2
+import minknow_api.data_pb2_grpc
 
 import pyminknow.config
+import pyminknow.service.fleet
+import pyminknow.tracing
 
 LOGGER = logging.getLogger(__name__)
 
@@ -59,6 +65,9 @@ class RpcClient:
             device=minknow_api.device_pb2_grpc.DeviceServiceStub,
             protocol=minknow_api.protocol_pb2_grpc.ProtocolServiceStub,
             manager=minknow_api.manager_pb2_grpc.ManagerServiceStub,
+            acquisition=minknow_api.acquisition_pb2_grpc.AcquisitionServiceStub,
+            data=minknow_api.data_pb2_grpc.DataServiceStub,
+            fleet=pyminknow.service.fleet.FleetServiceStub,
         )
 
         Stub = stubs[service]
@@ -95,6 +104,27 @@ class ManagerClient(RpcClient):
         yield from self.stub.flow_cell_positions(request, **kwargs)
 
 
+class FleetClient(RpcClient):
+    """
+    Fleet status client (pyminknow extension, served by the manager)
+    """
+
+    stub_name = 'fleet'
+
+    def get_fleet_status(self, **kwargs) -> dict:
+        request = google.protobuf.empty_pb2.Empty()
+        return pyminknow.service.fleet.to_dict(self.stub.get_fleet_status(request, **kwargs))
+
+    def watch_fleet_status(self, **kwargs) -> iter:
+        request = google.protobuf.empty_pb2.Empty()
+        for response in self.stub.watch_fleet_status(request, **kwargs):
+            yield pyminknow.service.fleet.to_dict(response)
+
+    def get_resource_usage(self, **kwargs) -> dict:
+        request = google.protobuf.empty_pb2.Empty()
+        return pyminknow.service.fleet.to_dict(self.stub.get_resource_usage(request, **kwargs))
+
+
 class ProtocolClient(RpcClient):
     """
     Protocol client
@@ -151,7 +181,7 @@ class ProtocolClient(RpcClient):
 
     @property
     def latest_run_id(self) -> str:
-        return next(iter(self.list_protocol_runs().run_ids))
+        return self.list_protocol_runs().run_ids[-1]
 
     def get_run_info(self, run_id: str = None) -> minknow_api.protocol_pb2.ProtocolRunInfo:
         # If no run is specified, use the most recent one
@@ -199,6 +229,56 @@ class DeviceClient(RpcClient):
         return response
 
 
+class AcquisitionClient(RpcClient):
+    """
+    Acquisition client
+
+    https://github.com/nanoporetech/minknow_lims_interface/blob/master/minknow/rpc/acquisition.proto
+    """
+
+    stub_name = 'acquisition'
+
+    def get_acquisition_info(self, run_id: str = None) -> minknow_api.acquisition_pb2.AcquisitionRunInfo:
+        # If no run is specified, use the current acquisition
+        request = minknow_api.acquisition_pb2.GetAcquisitionRunInfoRequest(run_id=run_id)
+        return self.stub.get_acquisition_info(request)
+
+    def get_progress(self) -> minknow_api.acquisition_pb2.GetProgressResponse:
+        request = minknow_api.acquisition_pb2.GetProgressRequest()
+        return self.stub.get_progress(request)
+
+    def watch_current_acquisition_run(self) -> iter:
+        request = minknow_api.acquisition_pb2.WatchCurrentAcquisitionRunRequest()
+        yield from self.stub.watch_current_acquisition_run(request)
+
+
+class DataClient(RpcClient):
+    """
+    Data client
+
+    https://github.com/nanoporetech/minknow_lims_interface/blob/master/minknow/rpc/data.proto
+    """
+
+    stub_name = 'data'
+
+    def get_signal_bytes(self, seconds: float, first_channel: int = 1, last_channel: int = 512,
+                         calibrated_data: bool = False) -> iter:
+        request = minknow_api.data_pb2.GetSignalBytesRequest(
+            seconds=seconds,
+            first_channel=first_channel,
+            last_channel=last_channel,
+            calibrated_data=calibrated_data,
+        )
+        yield from self.stub.get_signal_bytes(request)
+
+    def get_channel_states(self, first_channel: int = 1, last_channel: int = 512) -> iter:
+        request = minknow_api.data_pb2.GetChannelStatesRequest(
+            first_channel=first_channel,
+            last_channel=last_channel,
+        )
+        yield from self.stub.get_channel_states(request)
+
+
 def get_args():
     # TODO separate into separate clients for each service
     parser = argparse.ArgumentParser(usage=USAGE, description=DESCRIPTION)
@@ -214,6 +294,9 @@ def get_args():
     parser.add_argument('-w', '--flow_cell_info', action='store_true', help='Get flow cell info (Device)')
     parser.add_argument('-f', '--flow_cell_positions', action='store_true',
                         help='List all known positions where flow cells can be inserted (Manager)')
+    parser.add_argument('-x', '--fleet_status', action='store_true', help='Get the status of every position (Manager)')
+    parser.add_argument('--resource_usage', action='store_true',
+                        help='Get the resources used by the host and each position (Manager)')
     parser.add_argument('-i', '--start_protocol', help='Start a protocol given by this identifier')
     parser.add_argument('-g', '--protocol_group_id', help='The group which the experiment should be held in')
     parser.add_argument('-r', '--list_protocol_runs', action='store_true',
@@ -221,6 +304,9 @@ def get_args():
     parser.add_argument('-u', '--get_run_info', action='store_true', help="Get run info (Protocol)")
     parser.add_argument('-n', '--run_id', help="Protocol run identifier")
     parser.add_argument('-a', '--sample_id', help="Sample identifier")
+    parser.add_argument('-c', '--acquisition_info', action='store_true',
+                        help='Get acquisition run info (Acquisition)')
+    parser.add_argument('-t', '--progress', action='store_true', help='Get acquisition progress (Acquisition)')
 
     return parser, parser.parse_args()
 
@@ -240,7 +326,8 @@ def connect(host: str = 'localhost', port: int = 9501):
 
     channel = grpc.insecure_channel(target=target, options=options)
 
-    return channel
+    # Send the context of the trace in progress (see pyminknow.tracing.trace)
+    return grpc.intercept_channel(channel, pyminknow.tracing.ClientTracingInterceptor())
 
 
 def configure_logging(verbose: bool = False):
@@ -301,6 +388,17 @@ def main():
             else:
                 raise ValueError('Unknown command')
 
+        # Acquisition
+        elif args.acquisition_info or args.progress:
+            client = AcquisitionClient(channel)
+
+            if args.acquisition_info:
+                print(client.get_acquisition_info(args.run_id))
+            elif args.progress:
+                print(client.get_progress())
+            else:
+                raise ValueError('Unknown command')
+
         # Manager
         elif args.list_devices or args.flow_cell_positions or args.describe_host:
 
@@ -317,6 +415,12 @@ def main():
             else:
                 raise ValueError('Unknown command')
 
+        elif args.fleet_status:
+            print(json.dumps(FleetClient(channel).get_fleet_status(), indent=2))
+
+        elif args.resource_usage:
+            print(json.dumps(FleetClient(channel).get_resource_usage(), indent=2))
+
         else:
             parser.print_help()
 
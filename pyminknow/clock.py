@@ -0,0 +1,83 @@
+"""
+Simulated clock
+
+Runs, timestamps and data generation follow a shared clock that can run faster than real time, so that long
+experiments can be simulated quickly. At a speed of 1440 a day-long protocol finishes in a minute. The simulated
+clock starts at the real time when the server starts.
+"""
+
+import datetime
+import threading
+import time
+
+import pyminknow.config
+
+
+class Clock:
+    """Simulated time that runs at a multiple of real time"""
+
+    def __init__(self, speed: float = 1., origin: datetime.datetime = None):
+        """
+        :param speed: Simulated seconds per real second
+        :param origin: Simulated date and time at the start (default: now)
+        """
+        if speed <= 0:
+            raise ValueError('Clock speed must be positive')
+
+        self.origin = origin or datetime.datetime.utcnow()
+
+        # Real time, simulated time and speed at the last change of speed (replaced together)
+        self._base = (time.monotonic(), 0., float(speed))
+
+    @property
+    def speed(self) -> float:
+        return self._base[2]
+
+    @speed.setter
+    def speed(self, speed: float):
+        """Change speed without a jump in simulated time"""
+        if speed <= 0:
+            raise ValueError('Clock speed must be positive')
+        self._base = (time.monotonic(), self.monotonic(), float(speed))
+
+    def monotonic(self) -> float:
+        """Simulated seconds since the clock started"""
+        real, simulated, speed = self._base
+        return simulated + (time.monotonic() - real) * speed
+
+    def now(self) -> datetime.datetime:
+        """Simulated UTC date and time"""
+        return self.origin + datetime.timedelta(seconds=self.monotonic())
+
+    def sleep(self, seconds: float):
+        """Wait for a simulated duration"""
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        """
+        Wait for a simulated duration or until an event is set, whichever is sooner
+
+        :returns: Whether the event is set
+        """
+        return event.wait(max(seconds, 0) / self.speed)
+
+
+# Shared by every service in this process
+CLOCK = Clock(speed=pyminknow.config.CLOCK_SPEED)
+
+
+def now() -> datetime.datetime:
+    return CLOCK.now()
+
+
+def monotonic() -> float:
+    return CLOCK.monotonic()
+
+
+def sleep(seconds: float):
+    CLOCK.sleep(seconds)
+
+
+def wait(event: threading.Event, seconds: float) -> bool:
+    return CLOCK.wait(event, seconds)
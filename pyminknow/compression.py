@@ -0,0 +1,265 @@
+"""
+Parallel block compression
+
+Output is split into blocks of up to 64 KiB that are compressed independently on a shared thread pool (zlib releases
+the GIL, so this scales across cores) and written in order. Each block is a complete gzip member, so files can be
+read by any gzip reader. In BGZF mode each member also records its compressed size, as used by samtools/htslib for
+random access, and the file ends with the standard empty EOF block.
+
+The bytes waiting to be compressed or written are limited to a fixed budget shared by all files, so writers block
+rather than build up a backlog when compression can't keep up.
+
+To measure compression speed, run:
+
+    python -m pyminknow.compression --level 6
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy
+
+import pyminknow.accounting
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+MODES = ('gzip', 'bgzf')
+
+# Uncompressed bytes per block (BGZF blocks must fit in 64 KiB even if the data is incompressible)
+BLOCK_SIZE = 0xff00
+
+GZIP_HEADER = struct.Struct('<4BI2B')
+BGZF_HEADER = struct.Struct('<4BI2BH2BHH')
+TRAILER = struct.Struct('<II')
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def compress_block(data: bytes, level: int, mode: str) -> tuple:
+    """
+    Compress one block as a gzip member
+
+    :returns: Compressed bytes, CPU seconds taken
+    """
+    start = time.thread_time()
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    trailer = TRAILER.pack(zlib.crc32(data), len(data))
+
+    if mode == 'bgzf':
+        # Extra field "BC" holds the total block size minus one
+        size = BGZF_HEADER.size + len(deflated) + TRAILER.size
+        header = BGZF_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, size - 1)
+    else:
+        header = GZIP_HEADER.pack(0x1f, 0x8b, 8, 0, 0, 0, 0xff)
+
+    return b''.join((header, deflated, trailer)), time.thread_time() - start
+
+
+class Compressor:
+    """Thread pool and memory budget shared by compressed files"""
+
+    def __init__(self, level: int = None, workers: int = None, budget: int = None):
+        """
+        :param level: zlib compression level (1-9)
+        :param workers: Compression threads
+        :param budget: Maximum uncompressed bytes in flight (across all files)
+        """
+        self.level = pyminknow.config.COMPRESSION_LEVEL if level is None else level
+        self.workers = workers or pyminknow.config.COMPRESSION_WORKERS or os.cpu_count()
+        budget = budget or pyminknow.config.COMPRESSION_BUFFER_MB * 2 ** 20
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                          thread_name_prefix='compression')
+
+        # One permit per block
+        self.budget = threading.BoundedSemaphore(max(budget // BLOCK_SIZE, 1))
+
+    def submit(self, data: bytes, mode: str) -> concurrent.futures.Future:
+        return self.pool.submit(compress_block, data, self.level, mode)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+_compressor = None
+_compressor_lock = threading.Lock()
+
+
+def get_compressor() -> Compressor:
+    """The compressor shared by all runs in this process"""
+    global _compressor
+    with _compressor_lock:
+        if _compressor is None:
+            _compressor = Compressor()
+        return _compressor
+
+
+class CompressedFile:
+    """Write-only file compressed in parallel blocks"""
+
+    def __init__(self, path, mode: str = 'bgzf', compressor: Compressor = None, file=None,
+                 usage: pyminknow.accounting.Usage = None):
+        """
+        :param file: Open binary file to write to instead of opening the path (e.g. one that hashes what's written)
+        :param usage: Count the CPU time and the memory taken by blocks being compressed
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown compression mode '{}'".format(mode))
+
+        self.path = path
+        self.mode = mode
+        self.compressor = compressor or get_compressor()
+        self.file = file or open(path, 'wb')
+        self.buffer = bytearray()
+        self.usage = usage
+
+        # Blocks being compressed and their sizes, in file order
+        self.pending = collections.deque()
+        self._lock = threading.Lock()
+
+        # The first block that failed to be compressed or written (reported when the file is closed)
+        self.error = None
+
+        # Statistics
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.
+
+    def write(self, data: bytes):
+        self.buffer += data
+
+        while len(self.buffer) >= BLOCK_SIZE:
+            block = bytes(self.buffer[:BLOCK_SIZE])
+            del self.buffer[:BLOCK_SIZE]
+            self.submit(block)
+
+    def submit(self, block: bytes):
+        # Wait for space in the memory budget
+        self.compressor.budget.acquire()
+
+        if self.usage:
+            self.usage.hold(len(block))
+
+        future = self.compressor.submit(block, self.mode)
+        with self._lock:
+            self.pending.append((future, len(block)))
+            self.bytes_in += len(block)
+
+        future.add_done_callback(self.drain)
+
+    def drain(self, _=None):
+        """Write the blocks at the front of the queue that have been compressed"""
+        with self._lock:
+            while self.pending and self.pending[0][0].done():
+                future, size = self.pending.popleft()
+                try:
+                    # Blocks after one that failed are dropped, as the file can't be read past it
+                    if self.error is None:
+                        data, cpu_time = future.result()
+                        self.file.write(data)
+                        self.bytes_out += len(data)
+                        self.cpu_time += cpu_time
+                        if self.usage:
+                            self.usage.add(cpu_seconds=cpu_time)
+                except Exception as error:
+                    self.error = error
+                finally:
+                    self.compressor.budget.release()
+                    if self.usage:
+                        self.usage.release(size)
+
+    def close(self):
+        """Write the remaining blocks and close the file, raising the error if any block failed"""
+        if self.file.closed:
+            return
+
+        if self.buffer:
+            self.submit(bytes(self.buffer))
+            self.buffer.clear()
+
+        concurrent.futures.wait([future for future, _ in self.pending])
+        self.drain()
+
+        try:
+            if self.mode == 'bgzf' and self.error is None:
+                self.file.write(BGZF_EOF)
+        finally:
+            self.file.close()
+
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def rate(bytes_in: int, cpu_time: float) -> float:
+    """Uncompressed MB per CPU second"""
+    return bytes_in / 1e6 / cpu_time if cpu_time else 0.
+
+
+def benchmark(level: int, workers: int, megabytes: int = 256, mode: str = 'bgzf') -> dict:
+    """Compress synthetic FASTQ and measure speed"""
+    random = numpy.random.default_rng(0)
+    sequence = numpy.frombuffer(b'ACGT', dtype=numpy.uint8)[random.integers(0, 4, 2 ** 20)].tobytes()
+    qualities = (random.integers(0, 4, 2 ** 20) + 43).astype(numpy.uint8).tobytes()
+
+    records = list()
+    size = 0
+    while size < megabytes * 2 ** 20:
+        start = int(random.integers(0, len(sequence) - 8000))
+        records.append(b''.join((b'@read\n', sequence[start:start + 8000], b'\n+\n',
+                                 qualities[start:start + 8000], b'\n')))
+        size += len(records[-1])
+    data = b''.join(records)
+
+    compressor = Compressor(level=level, workers=workers)
+    start = time.monotonic()
+
+    with CompressedFile(os.devnull, mode=mode, compressor=compressor) as file:
+        for i in range(0, len(data), 2 ** 20):
+            file.write(data[i:i + 2 ** 20])
+
+    elapsed = time.monotonic() - start
+    compressor.shutdown()
+
+    return dict(
+        megabytes_per_second=len(data) / 1e6 / elapsed,
+        megabytes_per_second_per_core=rate(file.bytes_in, file.cpu_time),
+        ratio=file.bytes_in / file.bytes_out,
+    )
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Measure parallel block compression speed')
+
+    parser.add_argument('-l', '--level', type=int, default=pyminknow.config.COMPRESSION_LEVEL, help='zlib level')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=sorted({1, 2, os.cpu_count()}),
+                        help='Thread counts to try')
+    parser.add_argument('-m', '--megabytes', type=int, default=256, help='Data size')
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    for workers in args.workers:
+        result = benchmark(level=args.level, workers=workers, megabytes=args.megabytes)
+        print("{workers} workers: {megabytes_per_second:.0f} MB/s, {megabytes_per_second_per_core:.0f} MB/s per core, "
+              "ratio {ratio:.2f}".format(workers=workers, **result))
+
+
+if __name__ == '__main__':
+    main()
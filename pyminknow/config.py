@@ -61,5 +61,131 @@ DEVICES = (
     dict(name='X5', layout=dict(x=4, y=0), ports=dict(secure=8001, insecure=8000), flow_cell=None),
 )
 
-RUN_DURATION = 1  # seconds
+RUN_DURATION = 1  # seconds (unless the protocol's --experiment_time is given)
+
+# Run outputs
+DEFAULT_OUTPUTS = ('fast5', 'fastq')  # unless turned off by protocol arguments e.g. --fast5=off
+READS_PER_FILE = 4000
+BARCODING_KITS = {
+    # Kit: (first, last) barcode number
+    'EXP-NBD103': (1, 12),
+    'EXP-NBD104': (1, 12),
+    'EXP-NBD114': (13, 24),
+    'EXP-NBD196': (1, 96),
+    'EXP-PBC001': (1, 12),
+    'EXP-PBC096': (1, 96),
+    'SQK-PBK004': (1, 12),
+    'SQK-RBK004': (1, 12),
+    'SQK-RPB004': (1, 12),
+}
+UNCLASSIFIED_FRACTION = 0.05  # barcoded reads that don't match any barcode
+BARCODE_EVENNESS = 5  # higher values spread reads more evenly between barcodes
+
+# Output compression: None, 'gzip' (multi-member) or 'bgzf' (also turned on by the protocol's --fastq_data compress)
+OUTPUT_COMPRESSION = os.getenv('MINKNOW_OUTPUT_COMPRESSION')
+COMPRESSION_LEVEL = int(os.getenv('MINKNOW_COMPRESSION_LEVEL', 6))  # zlib level 1-9
+COMPRESSION_WORKERS = None  # threads (default: one per core)
+COMPRESSION_BUFFER_MB = 64  # uncompressed data waiting to be compressed or written
+
+# Sequencing yield (devices may override these with a "throughput" dictionary)
+THROUGHPUT = dict(
+    reads_per_second=25,  # whole flow cell
+    mean_read_length=8000,  # bases
+    pass_fraction=0.85,
+    sample_rate=4000,  # Hz per channel
+    channel_count=512,
+    samples_per_base=8.9,  # ~450 bases per second per pore
+)
+WATCH_INTERVAL = 1  # seconds between updates on streaming watch RPCs
+FLEET_STATUS_TTL = 1  # seconds a fleet status snapshot is reused
+STOP_TIMEOUT = 10  # seconds stop_protocol waits for the run to stop
+
+# Run scheduling (one run at a time on each position; others wait in a queue)
+RUN_PRIORITY = 0  # unless the protocol's --priority is given (higher runs first)
+MAX_ACTIVE_RUNS = None  # runs generating data at once across the host (None: no limit beyond one per position)
+
+# Disk write budget shared fairly by the positions writing output (metadata writes take priority)
+DISK_BANDWIDTH_MB = None  # MB/s across the host (None: unlimited)
+DISK_BURST_SECONDS = 0.5  # of each position's share that may be written at once
+
+# Share identical run files (reports, channel tables) between runs as hard links to one stored copy
+CONTENT_STORE = True
+
+# Processes that build output records (None: one per CPU, 0: build them in the server process)
+GENERATION_WORKERS = None
+
+# Synthetic reads
+DATA_BATCH_INTERVAL = 0.1  # seconds between batches of reads
+READ_LENGTH_SHAPE = 1.5  # gamma distribution shape
+QSCORE_MEAN = 11
+QSCORE_SD = 3.5
+QSCORE_MAX = 50
+QSCORE_THRESHOLD = 7  # minimum mean q-score for a read to pass, unless the protocol's --min_qscore is given
+
+# Simulated basecalling between acquisition and the output files
+BASECALL_RATE = None  # raw samples per simulated second, unless the protocol's --basecall_rate is given (None: keeps up)
+BASECALL_WORKERS = 2
+BASECALL_QUEUE_SIZE = 50  # batches of reads waiting to be basecalled (acquisition waits when it's full)
+
+# Channel states
+WELLS_PER_CHANNEL = 4
+CHANNEL_ACTIVE_FRACTION = 0.9  # wells with a working pore on a new flow cell
+PORE_LIFETIME = 12 * 3600  # mean seconds
+CAPTURE_RATE = 0.2  # strand captures per second for an open pore
+RELEASE_RATE = 1 / 18  # per second (~8 kb at 450 bases per second)
+SATURATION_RATE = 1e-4  # per second
+RECOVERY_RATE = 0.01  # per second
+CHANNEL_STATES_INTERVAL = 0.5  # seconds between checks for channel state changes
+
+# Run statistics
+STATISTICS_BUCKET_SECONDS = 60
+READ_LENGTH_BIN_WIDTH = 500  # bases
+READ_LENGTH_BINS = 200
+
+# Raw signal
+DIGITISATION = 8192  # ADC values per range
+SIGNAL_OFFSET = 10  # ADC calibration offset
+SIGNAL_RANGE = 1500  # pA calibration range
+SIGNAL_RING_SECONDS = 2  # length of the synthetic signal block that is repeated
+SIGNAL_CHUNK_SAMPLES = 400  # samples per channel in each streamed message
+SIGNAL_EVENT_SAMPLES = 10  # mean duration of a current level
 DEFAULT_GRACE = 1
+
+# Fault injection
+INJECTION_RELOAD_INTERVAL = 1  # seconds between checks for changes to the rules file
+
+# Record and replay
+REPLAY_MAX_WORKERS = 100  # concurrent calls when re-sending a recorded session
+
+# Run history retention (None means no limit)
+RETENTION_MAX_AGE = None  # days
+RETENTION_MAX_COUNT = None  # runs per device
+RETENTION_MAX_GB = None  # output data per device
+RETENTION_INTERVAL = 60  # seconds between enforcement passes
+
+# Multi-process device sharding
+SHARDS = None  # worker processes (None serves every device in one process)
+SHARD_CHECK_INTERVAL = 1  # seconds between checks for crashed shards
+SHARD_STATUS_TIMEOUT = 1  # seconds to wait for a shard to report its status
+
+# Simulated clock
+CLOCK_SPEED = 1  # simulated seconds per real second
+
+# Logging
+LOG_FORMAT = 'text'  # or 'json'
+LOG_QUEUE_SIZE = 10000  # records waiting to be written (more are dropped)
+LOG_RATE_LIMIT = 20  # records per logger and message in each interval (below WARNING)
+LOG_RATE_INTERVAL = 1  # seconds
+
+# Request tracing (see pyminknow.tracing)
+TRACE_SAMPLE_RATE = 0.01  # of requests that don't carry a sampling decision
+TRACE_QUEUE_SIZE = 10000  # finished spans waiting to be written (more are dropped)
+
+# Serialised run information for completed runs
+RUN_INFO_CACHE_MB = 16
+RUN_INFO_CACHE_LOG_INTERVAL = 300  # seconds between logging hit/miss statistics
+
+# Startup (see pyminknow.startup and pyminknow.lazy)
+STARTUP_BUDGET = float(os.getenv('MINKNOW_STARTUP_BUDGET', 1.))  # seconds from process start until listening
+DEFERRED_IMPORTS = ('numpy',)  # loaded once the server is listening
+DEFERRED_PACKAGE_INIT = ('minknow_api',)  # packages whose messages are imported without running their __init__
@@ -0,0 +1,298 @@
+"""
+Synthetic output data
+
+FASTQ records, fast5 records and sequencing summary rows are built from batches of reads in worker processes, so
+the CPU work doesn't hold the GIL in the server process. A batch is split between the workers, and each worker
+writes its records into a new shared memory block and returns only the block's name and the layout of the records
+in it. The writer writes straight from the shared memory to disk and then frees the block.
+
+Without workers (config.GENERATION_WORKERS = 0) records are built in the calling thread with the same layout.
+"""
+
+import concurrent.futures
+import logging
+import multiprocessing
+import multiprocessing.resource_tracker
+import multiprocessing.shared_memory
+import os
+import signal
+import struct
+import threading
+import time
+import uuid
+
+import numpy
+
+import pyminknow.config
+import pyminknow.rawsignal
+import pyminknow.reads
+import pyminknow.throughput
+
+LOGGER = logging.getLogger(__name__)
+
+# Worker processes don't inherit the server's threads or gRPC state
+CONTEXT = multiprocessing.get_context('spawn')
+
+POOL_SIZE = 2 ** 20
+SAMPLE_COUNT = struct.Struct('<I')
+QUALITY_SD = 3
+
+# Key of the sequencing summary rows in a rendered batch (other keys are (output, passed, bin name))
+SUMMARY = 'summary'
+MIN_SPLIT = 100  # reads per worker, below which a batch isn't split
+
+
+class RecordRenderer:
+    """Build output records from batches of reads"""
+
+    def __init__(self, outputs: tuple, throughput: pyminknow.throughput.Throughput, seed: int = None):
+        """
+        :param outputs: File types to build records for e.g. ('fast5', 'fastq')
+        :param throughput: Flow cell sequencing model
+        :param seed: Random seed
+        """
+        self.outputs = tuple(outputs)
+        self.throughput = throughput
+        random = numpy.random.default_rng(seed)
+
+        # Base calls and signal are sliced from preallocated pools
+        if 'fastq' in outputs:
+            self.bases = numpy.frombuffer(b'ACGT', dtype=numpy.uint8)[random.integers(0, 4, POOL_SIZE)].tobytes()
+            self.quality_noise = random.normal(0, QUALITY_SD, POOL_SIZE).astype(numpy.int16)
+        if 'fast5' in outputs:
+            self.signal = pyminknow.rawsignal.SignalBuffer(
+                channel_count=1, sample_rate=throughput.sample_rate, seconds=POOL_SIZE / throughput.sample_rate,
+                seed=seed).data[0].tobytes()
+        self.random = random
+
+    def _slice(self, pool, size: int):
+        """Part of a pool (bytes or array) from a random position"""
+        if size > len(pool):
+            if isinstance(pool, numpy.ndarray):
+                return numpy.resize(pool, size)
+            return (pool * (size // len(pool) + 1))[:size]
+        start = int(self.random.integers(0, len(pool) - size + 1))
+        return pool[start:start + size]
+
+    def fastq(self, read_id: str, run_id: str, read_number: int, channel: int, length: int, qscore: float,
+              bin_name: str) -> bytes:
+        header = '@{} runid={} read={} ch={} barcode={}\n'.format(
+            read_id, run_id, read_number, channel, bin_name or 'none')
+        quality = (self._slice(self.quality_noise, length) + (33 + int(qscore))).clip(33, 126).astype(numpy.uint8)
+        return b''.join((header.encode(), self._slice(self.bases, length), b'\n+\n', quality.tobytes(), b'\n'))
+
+    def fast5(self, read_id: str, length: int) -> bytes:
+        samples = int(length * self.throughput.samples_per_base)
+        return b''.join((read_id.encode(), SAMPLE_COUNT.pack(samples), self._slice(self.signal, 2 * samples)))
+
+    def render(self, batch: pyminknow.reads.ReadBatch, bins: tuple, run_id: str, read_number: int) -> dict:
+        """
+        Build the records for a batch, grouped by output file
+
+        :param bins: Output bin names, indexed by the batch's barcodes
+        :param read_number: Number of reads before this batch
+        :returns: Records for each (output, passed, bin name), and sequencing summary rows
+        """
+        parts = dict()
+        summary = list()
+
+        for passed in (True, False):
+            for bin_index, bin_name in enumerate(bins):
+                indexes = numpy.flatnonzero((batch.passed == passed) & (batch.barcodes == bin_index))
+                if not len(indexes):
+                    continue
+
+                records = {output: parts.setdefault((output, passed, bin_name), list()) for output in self.outputs}
+                for i in indexes:
+                    read_id = str(uuid.uuid4())
+                    read_number += 1
+                    summary.append('{}\t{}\t{}\t{}\t{}\t{:.2f}\t{}\n'.format(
+                        read_id, run_id, batch.channels[i], 'TRUE' if passed else 'FALSE', batch.lengths[i],
+                        batch.qscores[i], bin_name or 'unclassified').encode())
+                    if 'fastq' in records:
+                        records['fastq'].append(self.fastq(read_id, run_id, read_number, int(batch.channels[i]),
+                                                           int(batch.lengths[i]), float(batch.qscores[i]), bin_name))
+                    if 'fast5' in records:
+                        records['fast5'].append(self.fast5(read_id, int(batch.lengths[i])))
+
+        parts[SUMMARY] = summary
+        return parts
+
+
+def layout(parts: dict) -> tuple:
+    """
+    Positions of the records when packed end to end
+
+    :returns: Total size, {key: (start offset, end offset of each record)}
+    """
+    segments = dict()
+    offset = 0
+    for key, records in parts.items():
+        ends = numpy.cumsum([len(record) for record in records], dtype=numpy.int64) + offset
+        segments[key] = (offset, ends)
+        offset = int(ends[-1]) if len(ends) else offset
+    return offset, segments
+
+
+def pack(parts: dict) -> tuple:
+    """Records packed into one buffer in this process: (buffer, segments)"""
+    _, segments = layout(parts)
+    return b''.join(record for records in parts.values() for record in records), segments
+
+
+# Renderers in this worker process, by output types and throughput settings
+_renderers = dict()
+
+
+def render_shared(outputs: tuple, throughput: pyminknow.throughput.Throughput, batch: pyminknow.reads.ReadBatch,
+                  bins: tuple, run_id: str, read_number: int) -> tuple:
+    """
+    Worker process: render a batch into a new shared memory block
+
+    :returns: Block name, segments (see layout), CPU seconds taken
+    """
+    start = time.thread_time()
+    key = (tuple(outputs), tuple(sorted(vars(throughput).items())))
+    try:
+        renderer = _renderers[key]
+    except KeyError:
+        renderer = _renderers[key] = RecordRenderer(outputs, throughput)
+
+    parts = renderer.render(batch, bins, run_id, read_number)
+    size, segments = layout(parts)
+
+    block = multiprocessing.shared_memory.SharedMemory(create=True, size=max(size, 1))
+    # The writer frees the block; don't let this process's resource tracker remove it first
+    multiprocessing.resource_tracker.unregister(block._name, 'shared_memory')
+
+    offset = 0
+    for records in parts.values():
+        for record in records:
+            block.buf[offset:offset + len(record)] = record
+            offset += len(record)
+
+    name = block.name
+    block.close()
+    return name, segments, time.thread_time() - start
+
+
+def split(batch: pyminknow.reads.ReadBatch, parts: int) -> list:
+    """Divide a batch into consecutive parts"""
+    count = len(batch.lengths)
+    parts = max(min(parts, count // MIN_SPLIT), 1)
+    bounds = numpy.linspace(0, count, parts + 1).astype(int)
+    return [pyminknow.reads.ReadBatch(*(field[start:stop] for field in batch))
+            for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def free(name: str):
+    """Remove a shared memory block that a worker made"""
+    try:
+        block = multiprocessing.shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+def ignore_interrupts():
+    """Worker process: leave Ctrl-C to the server, which shuts the pool down"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class SharedBatch:
+    """Records rendered by a worker, read from shared memory and freed on close"""
+
+    def __init__(self, name: str, segments: dict, cpu_time: float = 0.):
+        self.block = multiprocessing.shared_memory.SharedMemory(name=name)
+        self.buffer = self.block.buf
+        self.segments = segments
+        self.cpu_time = cpu_time
+
+    def close(self):
+        self.buffer.release()
+        self.block.close()
+        self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class GenerationPool:
+    """Worker processes that render output records"""
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or os.cpu_count()
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=CONTEXT,
+                                                               initializer=ignore_interrupts)
+
+    def start(self):
+        """Start the workers now rather than on the first batch"""
+        for future in [self.executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        LOGGER.info("Started %s data generation workers", self.workers)
+
+    def render(self, outputs: tuple, throughput: pyminknow.throughput.Throughput,
+               batch: pyminknow.reads.ReadBatch, bins: tuple, run_id: str, read_number: int) -> list:
+        """
+        Render a batch in parallel
+
+        :returns: SharedBatch for each part of the batch, in order (close each one after use)
+        """
+        futures = list()
+        for part in split(batch, self.workers):
+            futures.append(self.executor.submit(render_shared, outputs, throughput, part, bins, run_id,
+                                                read_number))
+            read_number += len(part.lengths)
+
+        # Wait for every part, so that if one fails the blocks made for the others can be freed
+        results = list()
+        error = None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as part_error:
+                error = error or part_error
+
+        parts = list()
+        try:
+            if error is not None:
+                raise error
+            for result in results:
+                parts.append(SharedBatch(*result))
+        except BaseException:
+            # The workers don't track the blocks they make, so nothing else would remove them
+            for part in parts:
+                part.close()
+            for name, *_ in results[len(parts):]:
+                free(name)
+            raise
+
+        return parts
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> GenerationPool:
+    """The worker pool shared by all runs in this process (None if records are built in-process)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None and pyminknow.config.GENERATION_WORKERS != 0:
+            _pool = GenerationPool(workers=pyminknow.config.GENERATION_WORKERS)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,227 @@
+"""
+Latency and fault injection
+
+Rules are matched against each RPC by method name and device name (shell-style wildcards) and may:
+
+* delay the response by a latency drawn from a distribution
+* abort the call with an error status code at a given rate
+* stall a response stream between messages at a given rate
+
+Rules may be specified on the command line e.g.
+
+    --inject "method=get_run_info,device=X1,latency=lognormal:-3:1,error=UNAVAILABLE,error_rate=0.01"
+
+or in a JSON file containing a list of rules with the same keys, which is reloaded when it changes.
+"""
+
+import fnmatch
+import json
+import logging
+import pathlib
+import random
+import threading
+import time
+
+import grpc
+
+import pyminknow.config
+import pyminknow.interceptors
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Distribution:
+    """
+    Random variable (in seconds) specified as "name:param:param" e.g. "uniform:0.1:0.5"
+
+    https://docs.python.org/3/library/random.html#real-valued-distributions
+    """
+
+    SAMPLERS = dict(
+        fixed=lambda rng, value: value,
+        uniform=lambda rng, low, high: rng.uniform(low, high),
+        normal=lambda rng, mu, sigma: rng.normalvariate(mu, sigma),
+        exponential=lambda rng, mean: rng.expovariate(1 / mean),
+        lognormal=lambda rng, mu, sigma: rng.lognormvariate(mu, sigma),
+        pareto=lambda rng, scale, alpha: scale * rng.paretovariate(alpha),
+    )
+
+    def __init__(self, spec: str):
+        self.spec = str(spec)
+        name, *params = self.spec.split(':')
+
+        try:
+            self.sampler = self.SAMPLERS[name]
+        except KeyError:
+            raise ValueError("Unknown distribution '{}'".format(name))
+
+        self.params = tuple(float(param) for param in params)
+
+    def sample(self, rng: random.Random) -> float:
+        # Durations can't be negative
+        return max(self.sampler(rng, *self.params), 0.)
+
+    def __repr__(self):
+        return "{}('{}')".format(type(self).__name__, self.spec)
+
+
+class Rule:
+    """Fault injection rule"""
+
+    def __init__(self, method: str = '*', device: str = '*', latency: str = None, error: str = None,
+                 error_rate: float = 1., stall: str = None, stall_rate: float = 1.):
+        """
+        :param method: RPC method name pattern e.g. "get_*"
+        :param device: Device name pattern e.g. "X1"
+        :param latency: Added latency distribution
+        :param error: gRPC status code name e.g. "UNAVAILABLE"
+        :param error_rate: Probability of returning the error
+        :param stall: Stream stall duration distribution
+        :param stall_rate: Probability of stalling before each streamed message
+        """
+        self.method = method
+        self.device = device
+        self.latency = Distribution(latency) if latency else None
+        self.error = self.status_code(error) if error else None
+        self.error_rate = float(error_rate)
+        self.stall = Distribution(stall) if stall else None
+        self.stall_rate = float(stall_rate)
+
+    @staticmethod
+    def status_code(name: str) -> grpc.StatusCode:
+        try:
+            return grpc.StatusCode[name.upper()]
+        except (KeyError, AttributeError):
+            raise ValueError("Unknown status code '{}'".format(name))
+
+    @classmethod
+    def parse(cls, spec: str):
+        """Build a rule from a command line string of comma-separated key=value pairs"""
+        kwargs = dict(item.split('=', 1) for item in spec.split(',') if item)
+        return cls(**kwargs)
+
+    def matches(self, method: str, device: str = None) -> bool:
+        # The manager service doesn't belong to a device
+        if device is None:
+            return self.device == '*' and fnmatch.fnmatchcase(method, self.method)
+
+        return fnmatch.fnmatchcase(method, self.method) and fnmatch.fnmatchcase(device, self.device)
+
+
+class RuleSet:
+    """
+    Collection of fault injection rules that may be changed at runtime, either by calling `update` or by editing the
+    rules file.
+    """
+
+    def __init__(self, rules: list = None, path: str = None, seed: int = None):
+        self.path = pathlib.Path(path) if path else None
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._extra_rules = list(rules or ())
+        self._file_rules = list()
+        self._mtime = None
+        self._checked = 0.
+
+        if self.path:
+            self.reload()
+
+    def update(self, rules: list):
+        """Replace the rules specified at runtime"""
+        with self._lock:
+            self._extra_rules = list(rules)
+
+    def reload(self):
+        """Load rules from the JSON file"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            LOGGER.warning("Fault injection rules file '%s' not found", self.path)
+            return
+
+        if mtime == self._mtime:
+            return
+
+        try:
+            with self.path.open() as file:
+                rules = [Rule(**data) for data in json.load(file)]
+        except (ValueError, TypeError):
+            # Keep the rules loaded before and don't read this version of the file again
+            self._mtime = mtime
+            raise
+
+        with self._lock:
+            self._file_rules = rules
+            self._mtime = mtime
+
+        LOGGER.info("Loaded %s fault injection rules from '%s'", len(rules), self.path)
+
+    @property
+    def rules(self) -> list:
+        # Check for file changes, at most once per interval
+        if self.path:
+            now = time.monotonic()
+            if now - self._checked > pyminknow.config.INJECTION_RELOAD_INTERVAL:
+                self._checked = now
+                try:
+                    self.reload()
+                except (ValueError, TypeError):
+                    LOGGER.exception("Invalid fault injection rules file '%s'", self.path)
+
+        with self._lock:
+            return self._file_rules + self._extra_rules
+
+    def match(self, method: str, device: str = None) -> list:
+        return [rule for rule in self.rules if rule.matches(method, device)]
+
+    def chance(self, rate: float) -> bool:
+        return self.random.random() < rate
+
+
+class InjectionInterceptor(grpc.ServerInterceptor):
+    """Apply fault injection rules to every RPC served for a device"""
+
+    def __init__(self, rule_set: RuleSet, device: dict = None):
+        self.rule_set = rule_set
+        self.device_name = device['name'] if device else None
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+
+        method = pyminknow.interceptors.method_name(handler_call_details)
+        rules = self.rule_set.match(method, self.device_name)
+
+        if not rules:
+            return handler
+
+        def wrapper(behaviour, response_streaming: bool):
+            def inject(request, context):
+                self.delay(rules)
+                self.fail(rules, context)
+                return behaviour(request, context)
+
+            def inject_stream(request, context):
+                self.delay(rules)
+                self.fail(rules, context)
+                for response in behaviour(request, context):
+                    self.stall(rules)
+                    yield response
+
+            return inject_stream if response_streaming else inject
+
+        return pyminknow.interceptors.wrap_handler(handler, wrapper)
+
+    def delay(self, rules: list):
+        latency = sum(rule.latency.sample(self.rule_set.random) for rule in rules if rule.latency)
+        if latency:
+            time.sleep(latency)
+
+    def fail(self, rules: list, context):
+        for rule in rules:
+            if rule.error and self.rule_set.chance(rule.error_rate):
+                context.abort(rule.error, 'Injected fault')
+
+    def stall(self, rules: list):
+        for rule in rules:
+            if rule.stall and self.rule_set.chance(rule.stall_rate):
+                time.sleep(rule.stall.sample(self.rule_set.random))
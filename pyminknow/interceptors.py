@@ -0,0 +1,69 @@
+"""
+Helpers for gRPC server interceptors
+
+https://grpc.github.io/grpc/python/grpc.html#service-side-interceptor
+"""
+
+import grpc
+
+# RPC method handler attributes, one for each combination of request and response cardinality
+BEHAVIOURS = ('unary_unary', 'unary_stream', 'stream_unary', 'stream_stream')
+
+
+def method_name(handler_call_details: grpc.HandlerCallDetails) -> str:
+    """
+    Get the short method name from the full RPC path
+    e.g. "/minknow_api.protocol.ProtocolService/get_run_info" => "get_run_info"
+    """
+    return handler_call_details.method.rpartition('/')[2]
+
+
+def wrap_handler(handler: grpc.RpcMethodHandler, wrapper) -> grpc.RpcMethodHandler:
+    """
+    Replace the behaviour of an RPC method handler
+
+    :param handler: The handler returned by the interceptor continuation
+    :param wrapper: Callable wrapper(behaviour, response_streaming: bool) that returns the new behaviour
+    """
+    if handler is None:
+        return None
+
+    for attr in BEHAVIOURS:
+        behaviour = getattr(handler, attr)
+
+        if behaviour is not None:
+            return handler._replace(**{attr: wrapper(behaviour, handler.response_streaming)})
+
+    return handler
+
+
+def passthrough_serializer(serializer):
+    """
+    Wrap a response serializer so that responses that are already serialised (bytes) are sent as-is
+    """
+
+    def serialize(response) -> bytes:
+        if isinstance(response, bytes):
+            return response
+        return serializer(response)
+
+    return serialize
+
+
+class SerialisedResponseInterceptor(grpc.ServerInterceptor):
+    """Allow service methods to return responses that are already serialised"""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+
+        if handler is None or handler.response_serializer is None:
+            return handler
+
+        return handler._replace(response_serializer=passthrough_serializer(handler.response_serializer))
+
+
+def serialise(message) -> bytes:
+    """Serialise a Protocol Buffers message (deterministically, so it may be used as a key)"""
+    if isinstance(message, bytes):
+        return message
+    return message.SerializeToString(deterministic=True)
@@ -0,0 +1,176 @@
+"""
+Non-blocking structured logging
+
+Log records are put on a bounded queue and written by a background thread (QueueHandler/QueueListener), so a gRPC
+worker thread never waits for stderr. If the queue is full the record is dropped rather than blocking; the number
+dropped is reported on the next record that gets through and when logging stops. Records below WARNING are rate
+limited per logger and message, and the number suppressed is reported on the next record that gets through.
+
+Records are written as text by default. With the JSON format each record is written as one line of JSON, e.g.
+
+    {"time": "2020-05-12T15:17:00.123Z", "level": "INFO", "logger": "pyminknow.server", "message": "..."}
+"""
+
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+import pyminknow.config
+
+FORMATS = ('json', 'text')
+
+# Attributes of every LogRecord (anything else was passed as "extra")
+RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = dict(
+            time=datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage(),
+            thread=record.threadName,
+        )
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+
+        # Extra fields e.g. LOGGER.info("...", extra=dict(run_id=run_id))
+        for key, value in vars(record).items():
+            if key not in RESERVED and key not in data:
+                data[key] = value
+
+        return json.dumps(data, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Allow a limited number of records per logger and message in each interval"""
+
+    def __init__(self, rate: int = None, interval: float = None, level: int = logging.WARNING):
+        """
+        :param rate: Records allowed per interval for each logger and message
+        :param interval: Seconds
+        :param level: Records at this level or above are never limited
+        """
+        super().__init__()
+        self.rate = rate or pyminknow.config.LOG_RATE_LIMIT
+        self.interval = interval or pyminknow.config.LOG_RATE_INTERVAL
+        self.level = level
+
+        # (logger, message template): [interval start, count, suppressed]
+        self.counters = dict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+
+        with self._lock:
+            counter = self.counters.setdefault(key, [now, 0, 0])
+
+            # Start a new interval
+            if now - counter[0] >= self.interval:
+                counter[0] = now
+                counter[1] = 0
+
+            if counter[1] >= self.rate:
+                counter[2] += 1
+                return False
+
+            counter[1] += 1
+            if counter[2]:
+                record.suppressed = counter[2]
+                counter[2] = 0
+
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue records without blocking, dropping them if the queue is full"""
+
+    def __init__(self, queue_):
+        super().__init__(queue_)
+        self.dropped = 0
+
+        # Dropped since the last record that got through
+        self._unreported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the message arguments now (they may change later) but leave formatting to the listener"""
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self._unreported:
+            record.dropped = self._unreported
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+        else:
+            self._unreported = 0
+
+
+class DroppingQueueListener(logging.handlers.QueueListener):
+    """Write queued records, reporting how many the queue handler dropped when stopped"""
+
+    def __init__(self, queue_handler: DroppingQueueHandler, *handlers, **kwargs):
+        super().__init__(queue_handler.queue, *handlers, **kwargs)
+        self.queue_handler = queue_handler
+
+    def stop(self):
+        super().stop()
+
+        if self.queue_handler.dropped:
+            self.handle(logging.makeLogRecord(dict(
+                name=__name__, levelno=logging.WARNING, levelname=logging.getLevelName(logging.WARNING),
+                msg='Dropped {} log records (queue full)'.format(self.queue_handler.dropped))))
+
+
+def configure(verbose: bool = False, log_format: str = None, stream=None) -> DroppingQueueListener:
+    """
+    Send log records through a queue to a background thread that writes them to stderr
+
+    :returns: Listener (stop it to flush the queue)
+    """
+    log_format = log_format or pyminknow.config.LOG_FORMAT
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=pyminknow.config.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+    listener = DroppingQueueListener(queue_handler, handler, respect_handler_level=True)
+    listener.start()
+
+    return listener
@@ -0,0 +1,123 @@
+"""
+Deferred imports
+
+The server binds its ports before it needs most of what it imports. Some modules are slow to load and only used once
+a run starts (numpy), and the minknow_api package's __init__ loads the client (Connection) and every service's
+messages, when the server only needs a few of its *_pb2 modules, which don't depend on it.
+
+defer() registers a module without running its code; the code runs the first time one of the module's attributes is
+used, from whichever thread gets there first (the others wait for it). Import statements that find the module already
+registered don't load it. With `submodules=True` a package's submodules can be imported before the package itself is
+loaded. Deferred modules that haven't been loaded yet can be loaded in the background with load_all().
+"""
+
+import importlib.machinery
+import importlib.util
+import logging
+import sys
+import threading
+import time
+import types
+
+LOGGER = logging.getLogger(__name__)
+
+# Attributes the import system reads from registered modules, which don't need the module's code to have run
+IMPORT_ATTRIBUTES = {'__class__', '__dict__', '__name__', '__spec__', '__loader__', '__file__', '__package__',
+                     '__doc__', '__cached__'}
+
+_lock = threading.RLock()
+
+# Deferred modules whose code is running
+_loading = set()
+
+# Seconds taken to load each deferred module, once it's loaded
+LOAD_TIMES = dict()
+
+
+class DeferredModule(types.ModuleType):
+    """A module whose code hasn't run yet"""
+
+    def __getattribute__(self, name: str):
+        namespace = object.__getattribute__(self, '__dict__')
+        submodules = namespace.get('_lazy_submodules')
+
+        if name == '__path__':
+            if not submodules:
+                load(self)
+        elif name not in IMPORT_ATTRIBUTES and name not in namespace:
+            # Let the import system import a submodule that isn't loaded yet, e.g. `from package import module`
+            if submodules and is_submodule(self, name):
+                raise AttributeError(name)
+            load(self)
+
+        return types.ModuleType.__getattribute__(self, name)
+
+
+def is_submodule(module: types.ModuleType, name: str) -> bool:
+    fullname = '{}.{}'.format(module.__name__, name)
+    if fullname in sys.modules:
+        return False
+    return importlib.machinery.PathFinder.find_spec(fullname, module.__dict__['__path__']) is not None
+
+
+def load(module: types.ModuleType):
+    """Run a deferred module's code, if it hasn't run already"""
+    with _lock:
+        # The thread running the module's code uses it as it is
+        if type(module) is not DeferredModule or module.__name__ in _loading:
+            return
+
+        _loading.add(module.__name__)
+        start = time.perf_counter()
+        try:
+            module.__spec__.loader.exec_module(module)
+        except Exception as error:
+            # Not an AttributeError, which hasattr() would hide
+            raise ImportError("Failed to load deferred module {}".format(module.__name__),
+                              name=module.__name__) from error
+        finally:
+            _loading.discard(module.__name__)
+            module.__class__ = types.ModuleType
+        LOAD_TIMES[module.__name__] = time.perf_counter() - start
+        del module._lazy_submodules
+
+    LOGGER.debug("Loaded deferred module %s in %.3f s", module.__name__, LOAD_TIMES[module.__name__])
+
+
+def defer(name: str, submodules: bool = False) -> types.ModuleType:
+    """
+    Register a module so its code runs when it's first used
+
+    :param name: Top-level module or package
+    :param submodules: Allow the package's submodules to be imported without loading it
+    :returns: The module (loaded already if it was imported before)
+    """
+    with _lock:
+        if name in sys.modules:
+            return sys.modules[name]
+
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError("No module named '{}'".format(name), name=name)
+
+        module = importlib.util.module_from_spec(spec)
+        module._lazy_submodules = submodules
+        module.__class__ = DeferredModule
+        sys.modules[name] = module
+
+    return module
+
+
+def is_deferred(name: str) -> bool:
+    """Whether a module is registered but hasn't been loaded"""
+    return type(sys.modules.get(name)) is DeferredModule
+
+
+def load_all():
+    """Load every deferred module that hasn't been loaded yet"""
+    for name, module in list(sys.modules.items()):
+        if type(module) is DeferredModule:
+            try:
+                load(module)
+            except Exception:
+                LOGGER.exception("Failed to load %s", name)
@@ -0,0 +1,146 @@
+"""
+Run manifests
+
+Every output file is hashed as it's written, so consumers don't have to read it again to check it. When a run's output
+is saved, a manifest listing each file's path (relative to the run output directory), size and SHA-256 digest is
+written, and when the run finishes a completion marker records its final state and the digest of the manifest. Both
+are written to a temporary name and renamed into place, so a consumer that sees either can trust its content:
+
+    manifest_<flow cell ID>_<acquisition>.json
+    complete_<flow cell ID>_<acquisition>.json
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import uuid
+
+import pyminknow.accounting
+
+LOGGER = logging.getLogger(__name__)
+
+ALGORITHM = 'sha256'
+
+
+class ChecksumFile:
+    """Binary file, opened for writing, that hashes its content as it's written"""
+
+    def __init__(self, path, usage: pyminknow.accounting.Usage = None):
+        """
+        :param usage: Count the file and the bytes written to it
+        """
+        self.path = pathlib.Path(path)
+        self.file = open(path, 'wb')
+        self.hash = hashlib.new(ALGORITHM)
+        self.size = 0
+        self.usage = usage
+        if usage:
+            usage.add(files_created=1)
+
+    def write(self, data: bytes) -> int:
+        self.hash.update(data)
+        self.size += len(data)
+        if self.usage:
+            self.usage.add(bytes_written=len(data))
+        return self.file.write(data)
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    @property
+    def digest(self) -> str:
+        return self.hash.hexdigest()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def write_atomic(path: pathlib.Path, data: bytes, usage: pyminknow.accounting.Usage = None):
+    """Write a file under a temporary name and rename it into place once it's on disk"""
+    path = pathlib.Path(path)
+    temp_path = path.with_name('.{}.{}.tmp'.format(path.name, uuid.uuid4()))
+    try:
+        with temp_path.open('wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    if usage:
+        usage.add(bytes_written=len(data), files_created=1)
+
+
+class Manifest:
+    """Paths, sizes and digests of the files in a run output directory"""
+
+    def __init__(self, root: pathlib.Path):
+        """
+        :param root: Run output directory (paths are listed relative to it)
+        """
+        self.root = pathlib.Path(root)
+        self.files = dict()
+
+    def add(self, path: pathlib.Path, size: int, digest: str):
+        path = pathlib.Path(path).relative_to(self.root).as_posix()
+        self.files[path] = dict(path=path, size=size, **{ALGORITHM: digest})
+
+    def add_file(self, file: ChecksumFile):
+        self.add(file.path, file.size, file.digest)
+
+    def as_dict(self, **info) -> dict:
+        return dict(info, algorithm=ALGORITHM, files=[self.files[path] for path in sorted(self.files)])
+
+    def write(self, path: pathlib.Path, usage: pyminknow.accounting.Usage = None, **info) -> str:
+        """
+        Write the manifest atomically
+
+        :param usage: Count the file
+        :param info: Run details to include
+        :returns: Digest of the manifest
+        """
+        data = json.dumps(self.as_dict(**info), indent=2).encode()
+        write_atomic(path, data, usage=usage)
+        LOGGER.info("Wrote manifest of %s files to '%s'", len(self.files), path)
+
+        return hashlib.new(ALGORITHM, data).hexdigest()
+
+
+def write_marker(path: pathlib.Path, usage: pyminknow.accounting.Usage = None, **info):
+    """Write a completion marker atomically"""
+    write_atomic(path, json.dumps(info, indent=2).encode(), usage=usage)
+    LOGGER.info("Wrote '%s'", path)
+
+
+def verify(path: pathlib.Path) -> list:
+    """
+    Check the files listed in a manifest
+
+    :returns: Paths of files that are missing or don't match
+    """
+    path = pathlib.Path(path)
+    manifest = json.loads(path.read_bytes())
+    algorithm = manifest['algorithm']
+    failed = list()
+
+    for entry in manifest['files']:
+        try:
+            data = path.parent.joinpath(entry['path']).read_bytes()
+        except FileNotFoundError:
+            failed.append(entry['path'])
+            continue
+        if len(data) != entry['size'] or hashlib.new(algorithm, data).hexdigest() != entry[algorithm]:
+            failed.append(entry['path'])
+
+    return failed
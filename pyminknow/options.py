@@ -0,0 +1,173 @@
+"""
+Protocol run options
+
+The arguments passed to start_protocol, together with the protocol's tags, decide which output files a run writes,
+which barcodes reads are classified into and how long the experiment lasts. Arguments follow the minKNOW protocol
+script conventions, for example:
+
+    --fast5=on --fastq=on --barcoding_kits EXP-NBD114 EXP-NBD104 --experiment_time=24
+
+A run's --priority decides its place in the queue when its position is busy. Reads are basecalled at --basecall_rate
+(raw samples per second) and pass if their mean q-score is at least --min_qscore.
+"""
+
+from __future__ import annotations
+
+import logging
+
+import numpy
+
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+OUTPUTS = ('fast5', 'fastq')
+UNCLASSIFIED = 'unclassified'
+
+
+def parse_args(args: list) -> dict:
+    """
+    Parse protocol script arguments
+
+    "--key=value" and "--key value" give a single value, "--key a b" gives a list and "--key" alone gives True.
+    """
+    options = dict()
+    key = None
+
+    for arg in args:
+        if arg.startswith('--'):
+            key, sep, value = arg[2:].partition('=')
+            options[key] = value if sep else True
+        elif key is not None:
+            # Collect values that follow an option
+            value = options[key]
+            if value is True:
+                options[key] = arg
+            elif isinstance(value, list):
+                value.append(arg)
+            else:
+                options[key] = [value, arg]
+        else:
+            LOGGER.warning("Ignoring protocol argument '%s'", arg)
+
+    return options
+
+
+def is_on(value) -> bool:
+    return value is True or str(value).lower() in {'on', 'true', '1', 'yes'}
+
+
+def as_list(value) -> list:
+    """Values of an option that may be given once, several times or as a flag"""
+    if isinstance(value, str):
+        return [value]
+    return list(value) if isinstance(value, list) else []
+
+
+def as_number(value, cast=float):
+    """Value of a numeric option (the last one, if it's given more than once), or None if it's missing or a flag"""
+    if isinstance(value, list):
+        value = value[-1]
+    return cast(value) if value not in {None, True} else None
+
+
+def find_protocol(identifier: str) -> dict:
+    for protocol in pyminknow.config.PROTOCOLS:
+        if protocol['identifier'] == identifier:
+            return protocol
+    return dict(identifier=identifier, tags=dict())
+
+
+class RunOptions:
+    """Output layout and volume for a protocol run"""
+
+    def __init__(self, outputs: tuple = None, barcodes: tuple = (), duration: float = None,
+                 compression: str = None, priority: int = None, basecall_rate: float = None,
+                 min_qscore: float = None):
+        """
+        :param outputs: File types to write e.g. ('fast5', 'fastq')
+        :param barcodes: Barcode names (reads that don't match any are unclassified)
+        :param duration: Experiment time (simulated seconds)
+        :param compression: Compress FASTQ and the sequencing summary: 'gzip', 'bgzf' or None
+        :param priority: Queue priority (higher starts first)
+        :param basecall_rate: Raw samples basecalled per second (None: keep up with acquisition)
+        :param min_qscore: Minimum mean q-score for a read to pass
+        """
+        self.outputs = tuple(pyminknow.config.DEFAULT_OUTPUTS if outputs is None else outputs)
+        self.barcodes = tuple(barcodes)
+        self.duration = pyminknow.config.RUN_DURATION if duration is None else duration
+        self.compression = compression
+        self.priority = pyminknow.config.RUN_PRIORITY if priority is None else priority
+        self.basecall_rate = pyminknow.config.BASECALL_RATE if basecall_rate is None else basecall_rate
+        self.min_qscore = pyminknow.config.QSCORE_THRESHOLD if min_qscore is None else min_qscore
+
+    def __repr__(self):
+        return ('{}(outputs={}, barcodes={}, duration={}, compression={}, priority={}, basecall_rate={}, '
+                'min_qscore={})').format(type(self).__name__, self.outputs, len(self.barcodes), self.duration,
+                                         self.compression, self.priority, self.basecall_rate, self.min_qscore)
+
+    @classmethod
+    def from_protocol(cls, identifier: str, args: list):
+        """Combine start_protocol arguments with the protocol's tags"""
+        tags = find_protocol(identifier).get('tags', dict())
+        options = parse_args(args)
+
+        # Output files
+        outputs = tuple(output for output in OUTPUTS
+                        if is_on(options.get(output, output in pyminknow.config.DEFAULT_OUTPUTS)))
+
+        # Barcoding is possible with multiplexing kits
+        kits = as_list(options.get('barcoding_kits'))
+        if tags.get('barcoding') and tags.get('kit') in pyminknow.config.BARCODING_KITS:
+            kits.insert(0, tags['kit'])
+        if kits and not (tags.get('barcoding') or 'Multiplexing' in tags.get('kit_category', ())):
+            LOGGER.warning("Protocol %s doesn't support barcoding kits %s", identifier, kits)
+            kits = []
+
+        barcodes = cls.build_barcodes(kits)
+
+        # Experiment time is given in hours
+        hours = as_number(options.get('experiment_time'))
+        duration = hours * 3600 if hours is not None else None
+
+        # e.g. --fastq_data compress
+        compression = pyminknow.config.OUTPUT_COMPRESSION
+        if not compression and 'compress' in as_list(options.get('fastq_data')):
+            compression = 'bgzf'
+
+        priority = as_number(options.get('priority'), int)
+
+        basecall_rate = as_number(options.get('basecall_rate'))
+        min_qscore = as_number(options.get('min_qscore'))
+
+        return cls(outputs=outputs, barcodes=barcodes, duration=duration, compression=compression,
+                   priority=priority, basecall_rate=basecall_rate, min_qscore=min_qscore)
+
+    @staticmethod
+    def build_barcodes(kits: list) -> tuple:
+        """Names of the barcodes in a set of kits, in order"""
+        numbers = set()
+        for kit in kits:
+            try:
+                first, last = pyminknow.config.BARCODING_KITS[kit]
+            except KeyError:
+                LOGGER.warning("Unknown barcoding kit '%s'", kit)
+                continue
+            numbers.update(range(first, last + 1))
+
+        return tuple('barcode{:02d}'.format(number) for number in sorted(numbers))
+
+    @property
+    def bins(self) -> tuple:
+        """Output directories for classified reads (a single unnamed bin without barcoding)"""
+        return self.barcodes + (UNCLASSIFIED,) if self.barcodes else ('',)
+
+    def barcode_weights(self, seed: int = None) -> numpy.ndarray:
+        """Share of reads in each bin: uneven between barcodes, with a fixed unclassified fraction"""
+        if not self.barcodes:
+            return numpy.ones(1)
+
+        unclassified = pyminknow.config.UNCLASSIFIED_FRACTION
+        evenness = numpy.full(len(self.barcodes), pyminknow.config.BARCODE_EVENNESS)
+        weights = numpy.random.default_rng(seed).dirichlet(evenness)
+        return numpy.append(weights * (1 - unclassified), unclassified)
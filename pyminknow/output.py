@@ -0,0 +1,214 @@
+"""
+Sequencing output files
+
+Reads are written as they are generated into the directory layout minKNOW uses, e.g.
+
+    fastq_pass/barcode01/<run code>_0.fastq
+    fast5_fail/unclassified/<run code>_0.fast5
+
+or directly into fast5_pass etc. when there is no barcoding. Each file holds up to config.READS_PER_FILE reads.
+Writes draw on the position's share of the host's disk bandwidth (see pyminknow.bandwidth). Records are built by
+worker processes (see pyminknow.generation) and written from shared memory. A sequencing summary row is written for
+every read. With compression turned on, FASTQ files and the sequencing summary are block-compressed (.gz) on a
+thread pool. Every file is hashed as it's written (see pyminknow.manifest).
+
+The fast5 files are not HDF5: each read is stored as its ID, the number of samples and the int16 signal.
+"""
+
+import logging
+import pathlib
+
+import pyminknow.accounting
+import pyminknow.bandwidth
+import pyminknow.compression
+import pyminknow.config
+import pyminknow.generation
+import pyminknow.manifest
+import pyminknow.options
+import pyminknow.reads
+import pyminknow.throughput
+
+LOGGER = logging.getLogger(__name__)
+
+WRITE_SIZE = 2 ** 20  # bytes drawn from the disk bandwidth budget at a time
+
+SUMMARY_COLUMNS = ('read_id', 'run_id', 'channel', 'passes_filtering', 'sequence_length_template',
+                   'mean_qscore_template', 'barcode_arrangement')
+
+
+class OutputWriter:
+    """Write the reads of one protocol run to fast5 and fastq files and the sequencing summary"""
+
+    def __init__(self, path: pathlib.Path, run_code: str, run_id: str, options: pyminknow.options.RunOptions,
+                 throughput: pyminknow.throughput.Throughput, summary_filename: str = None, seed: int = None,
+                 position: str = None, pool: pyminknow.generation.GenerationPool = None,
+                 usage: pyminknow.accounting.Usage = None):
+        """
+        :param path: Run output directory
+        :param run_code: File name prefix
+        :param run_id: Protocol run ID
+        :param options: Outputs, barcodes and compression
+        :param throughput: Flow cell sequencing model
+        :param summary_filename: Sequencing summary file name (in the output directory)
+        :param seed: Random seed (records are then built in this process, so the output is reproducible)
+        :param position: Device name, for the disk bandwidth share
+        :param pool: Worker processes that build records (default: the shared pool)
+        :param usage: Count the files, bytes, CPU time and buffer memory used
+        """
+        self.path = pathlib.Path(path)
+        self.run_code = run_code
+        self.run_id = run_id
+        self.options = options
+        self.throughput = throughput
+        self.read_number = 0
+        self.usage = usage or pyminknow.accounting.Usage()
+
+        self.position = position
+        self.registered = position is not None
+        if self.registered:
+            pyminknow.bandwidth.GOVERNOR.register(position)
+
+        # Open files and the number of reads in each, keyed by (output, pass/fail, bin)
+        self.files = dict()
+
+        self.pool = None
+        self.renderer = None
+        if seed is None:
+            self.pool = pool or pyminknow.generation.get_pool()
+        if self.pool is None:
+            self.renderer = pyminknow.generation.RecordRenderer(options.outputs, throughput, seed=seed)
+
+        # Every file written with compression, and every file on disk with its checksum
+        self.compressed = list()
+        self.written = list()
+
+        self.closed = False
+        self.summary = None
+        if summary_filename:
+            self.summary = self.open_file(self.path.joinpath(summary_filename), compress=True)
+            self.write_bytes(self.summary, '\t'.join(SUMMARY_COLUMNS).encode() + b'\n')
+
+    def open_file(self, path: pathlib.Path, compress: bool = False):
+        """Open a file for writing, compressed if the run options say so"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if compress and self.options.compression:
+            path = path.with_name(path.name + '.gz')
+            file = pyminknow.compression.CompressedFile(path, mode=self.options.compression,
+                                                        file=self.open_checksum_file(path), usage=self.usage)
+            self.compressed.append(file)
+            return file
+
+        return self.open_checksum_file(path)
+
+    def open_checksum_file(self, path: pathlib.Path) -> pyminknow.manifest.ChecksumFile:
+        file = pyminknow.manifest.ChecksumFile(path, usage=self.usage)
+        self.written.append(file)
+        return file
+
+    def directory(self, output: str, passed: bool, bin_name: str) -> pathlib.Path:
+        return self.path.joinpath('{}_{}'.format(output, 'pass' if passed else 'fail'), bin_name)
+
+    def open(self, key: tuple):
+        """Get the current file for an output bin, starting a new one when the current one is full"""
+        try:
+            file, count, index = self.files[key]
+            if count < pyminknow.config.READS_PER_FILE:
+                return file
+            file.close()
+            index += 1
+        except KeyError:
+            index = 0
+
+        path = self.directory(*key).joinpath('{}_{}.{}'.format(self.run_code, index, key[0]))
+        file = self.open_file(path, compress=key[0] == 'fastq')
+        self.files[key] = [file, 0, index]
+        LOGGER.debug("Writing '%s'", path)
+
+        return file
+
+    def write(self, batch: pyminknow.reads.ReadBatch):
+        """Write a batch of reads to the files for their pass/fail result and barcode"""
+        if not len(batch.lengths):
+            return
+
+        args = (batch, self.options.bins, self.run_id, self.read_number)
+        with self.usage.cpu():
+            if self.pool is None:
+                buffer, segments = pyminknow.generation.pack(self.renderer.render(*args))
+                with self.usage.buffer(len(buffer)):
+                    self.write_segments(buffer, segments)
+            else:
+                parts = self.pool.render(self.options.outputs, self.throughput, *args)
+                size = sum(part.block.size for part in parts)
+                self.usage.add(cpu_seconds=sum(part.cpu_time for part in parts))
+                try:
+                    with self.usage.buffer(size):
+                        for part in parts:
+                            self.write_segments(part.buffer, part.segments)
+                finally:
+                    for part in parts:
+                        part.close()
+
+        self.read_number += len(batch.lengths)
+
+    def write_segments(self, buffer, segments: dict):
+        """Write packed records to their files"""
+        with memoryview(buffer) as view:
+            for key, (start, ends) in segments.items():
+                if not len(ends):
+                    continue
+                if key == pyminknow.generation.SUMMARY:
+                    if self.summary:
+                        self.write_bytes(self.summary, view[start:int(ends[-1])])
+                else:
+                    self.write_records(key, view, start, ends)
+
+    def write_records(self, key: tuple, view: memoryview, start: int, ends):
+        """Append records, splitting them between files so none holds too many reads"""
+        index = 0
+        while index < len(ends):
+            file = self.open(key)
+            entry = self.files[key]
+            stop = min(index + pyminknow.config.READS_PER_FILE - entry[1], len(ends))
+            end = int(ends[stop - 1])
+            self.write_bytes(file, view[start:end])
+            entry[1] += stop - index
+            index, start = stop, end
+
+    def write_bytes(self, file, data: bytes):
+        """Write in pieces as the disk bandwidth budget allows"""
+        view = memoryview(data)
+        for start in range(0, len(view), WRITE_SIZE):
+            piece = view[start:start + WRITE_SIZE]
+            pyminknow.bandwidth.GOVERNOR.acquire(self.position, len(piece))
+            file.write(piece)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.registered:
+            pyminknow.bandwidth.GOVERNOR.unregister(self.position)
+            self.registered = False
+
+        # Close every file even if one fails (a compressed file reports a block that failed when it's closed)
+        files = [file for file, _, _ in self.files.values()] + ([self.summary] if self.summary else [])
+        self.files.clear()
+        error = None
+        for file in files:
+            try:
+                file.close()
+            except Exception as file_error:
+                error = error or file_error
+
+        if self.compressed:
+            bytes_in = sum(file.bytes_in for file in self.compressed)
+            bytes_out = sum(file.bytes_out for file in self.compressed)
+            cpu_time = sum(file.cpu_time for file in self.compressed)
+            LOGGER.info("Compressed %.1f MB to %.1f MB at %.1f MB/s per core", bytes_in / 1e6, bytes_out / 1e6,
+                        pyminknow.compression.rate(bytes_in, cpu_time))
+
+        if error is not None:
+            raise error
@@ -0,0 +1,73 @@
+"""
+Synthetic raw signal
+
+A block of signal is generated once for every channel and then repeated, like a ring buffer, so streaming it costs
+one slice per channel per chunk rather than any per-sample work.
+"""
+
+from __future__ import annotations
+
+import logging
+
+import numpy
+
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SignalBuffer:
+    """Preallocated int16 signal for all channels of a flow cell"""
+
+    def __init__(self, channel_count: int, sample_rate: int, seconds: float = None, chunk_samples: int = None,
+                 seed: int = None):
+        """
+        :param channel_count: Number of channels
+        :param sample_rate: Samples per second per channel
+        :param seconds: Length of the repeated block
+        :param chunk_samples: Samples per channel in each chunk
+        :param seed: Random seed
+        """
+        self.channel_count = channel_count
+        self.sample_rate = sample_rate
+        self.chunk_samples = chunk_samples or pyminknow.config.SIGNAL_CHUNK_SAMPLES
+
+        # Round the ring length to a whole number of chunks so chunks never wrap around
+        seconds = seconds or pyminknow.config.SIGNAL_RING_SECONDS
+        chunks = max(int(seconds * sample_rate) // self.chunk_samples, 1)
+        self.length = chunks * self.chunk_samples
+
+        # Channels are rows so each channel's chunk is contiguous in memory
+        self.data = self.generate(numpy.random.default_rng(seed))
+
+        LOGGER.debug("Allocated %.1f MB of signal for %s channels", self.data.nbytes / 1e6, channel_count)
+
+    def generate(self, rng: numpy.random.Generator) -> numpy.ndarray:
+        """Piecewise-constant current levels (events as strands pass through a pore) with Gaussian noise"""
+        shape = (self.channel_count, self.length)
+        mean_event_samples = pyminknow.config.SIGNAL_EVENT_SAMPLES
+
+        # Event boundaries are a Bernoulli process along each channel
+        boundaries = rng.random(shape) < 1 / mean_event_samples
+        event_index = numpy.cumsum(boundaries, axis=1)
+        levels = rng.normal(500, 80, size=(self.channel_count, int(event_index.max()) + 1))
+        signal = numpy.take_along_axis(levels, event_index, axis=1)
+        signal += rng.normal(0, 15, size=shape)
+
+        return signal.astype(numpy.int16)
+
+    @property
+    def chunk_count(self) -> int:
+        return self.length // self.chunk_samples
+
+    def chunk(self, index: int, first_channel: int, last_channel: int) -> numpy.ndarray:
+        """
+        View (not copy) of one chunk of signal
+
+        :param index: Chunk number since the start of acquisition
+        :param first_channel: First channel (1-based)
+        :param last_channel: Last channel (inclusive)
+        :returns: Array of shape (channels, samples)
+        """
+        start = (index % self.chunk_count) * self.chunk_samples
+        return self.data[first_channel - 1:last_channel, start:start + self.chunk_samples]
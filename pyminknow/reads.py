@@ -0,0 +1,68 @@
+"""
+Synthetic reads
+
+Reads are generated in batches as NumPy arrays of per-read properties.
+"""
+
+from __future__ import annotations
+
+import collections
+
+import numpy
+
+import pyminknow.config
+import pyminknow.throughput
+
+# Barcodes are indexes into the run's output bins
+ReadBatch = collections.namedtuple('ReadBatch', ('channels', 'lengths', 'qscores', 'passed', 'barcodes'))
+
+
+def batch_size(batch: ReadBatch) -> int:
+    """Bytes of memory taken by a batch"""
+    return sum(field.nbytes for field in batch)
+
+
+class ReadGenerator:
+    """Generate batches of reads at the rate given by a throughput model"""
+
+    def __init__(self, throughput: pyminknow.throughput.Throughput, seed: int = None,
+                 barcode_weights: numpy.ndarray = None):
+        """
+        :param throughput: Flow cell sequencing model
+        :param seed: Random seed
+        :param barcode_weights: Share of reads in each output bin (default: one bin)
+        """
+        self.throughput = throughput
+        self.random = numpy.random.default_rng(seed)
+        self.barcode_weights = barcode_weights
+        self.read_count = 0
+
+    def generate(self, count: int) -> ReadBatch:
+        """Generate a batch of reads"""
+        # Read lengths are right-skewed
+        shape = pyminknow.config.READ_LENGTH_SHAPE
+        lengths = self.random.gamma(shape, self.throughput.mean_read_length / shape, size=count).astype(numpy.int64)
+        lengths += 1
+
+        qscores = self.random.normal(pyminknow.config.QSCORE_MEAN, pyminknow.config.QSCORE_SD, size=count)
+        qscores = qscores.clip(0, pyminknow.config.QSCORE_MAX).astype(numpy.float32)
+
+        if self.barcode_weights is None or len(self.barcode_weights) == 1:
+            barcodes = numpy.zeros(count, dtype=numpy.int64)
+        else:
+            barcodes = self.random.choice(len(self.barcode_weights), size=count, p=self.barcode_weights)
+
+        return ReadBatch(
+            channels=self.random.integers(1, self.throughput.channel_count + 1, size=count),
+            lengths=lengths,
+            qscores=qscores,
+            passed=qscores >= pyminknow.config.QSCORE_THRESHOLD,
+            barcodes=barcodes,
+        )
+
+    def generate_until(self, elapsed: float) -> ReadBatch:
+        """Generate the reads produced since the previous batch, up to this time since acquisition started"""
+        total = self.throughput.read_count(elapsed)
+        count = max(total - self.read_count, 0)
+        self.read_count += count
+        return self.generate(count)
@@ -0,0 +1,356 @@
+"""
+Record and replay gRPC sessions
+
+Recording captures each RPC (request, responses, status and relative timing) into a compact binary log. Replay serves
+the recorded responses for matching requests (keyed by device, method and serialised request) with the recorded
+handler latency divided by a time-scale factor. A recorded session may also be re-sent to a server (see `drive`) at
+a multiple of its original pace for load testing.
+
+Log format: a magic header followed by records, each starting with a record type byte:
+
+* STRING: interned string (device or method name) so names are only written once
+* CALL: offset and duration of the call, device and method string IDs, status, request and responses
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import logging
+import struct
+import threading
+import time
+
+import grpc
+
+import pyminknow.bandwidth
+import pyminknow.config
+import pyminknow.interceptors
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b'PMKR\x01'
+
+# Record types
+STRING = 1
+CALL = 2
+
+# Record layouts (little-endian)
+STRING_HEADER = struct.Struct('<HH')  # string ID, length
+CALL_HEADER = struct.Struct('<ddHHB?HIH')  # offset, duration, device ID, method ID, code, streaming, details length,
+# request length, response count
+RESPONSE_HEADER = struct.Struct('<dI')  # offset (since start of call), length
+
+STATUS_CODES = {code.value[0]: code for code in grpc.StatusCode}
+
+Call = collections.namedtuple('Call', (
+    'offset', 'duration', 'device', 'method', 'code', 'streaming', 'details', 'request', 'responses'))
+
+
+class Recorder:
+    """Write RPCs to a binary log"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.origin = time.monotonic()
+        self.strings = dict()
+        self._lock = threading.Lock()
+
+        LOGGER.info("Recording RPCs to '%s'", path)
+
+    def _intern(self, value: str) -> int:
+        try:
+            return self.strings[value]
+        except KeyError:
+            string_id = self.strings[value] = len(self.strings)
+            data = value.encode()
+            self.file.write(bytes((STRING,)) + STRING_HEADER.pack(string_id, len(data)) + data)
+            return string_id
+
+    def write(self, call: Call):
+        details = call.details.encode()
+
+        with self._lock:
+            chunks = [bytes((CALL,)), CALL_HEADER.pack(
+                call.offset, call.duration, self._intern(call.device), self._intern(call.method), call.code,
+                call.streaming, len(details), len(call.request), len(call.responses)
+            ), details, call.request]
+
+            for offset, response in call.responses:
+                chunks.extend((RESPONSE_HEADER.pack(offset, len(response)), response))
+
+            data = b''.join(chunks)
+            pyminknow.bandwidth.GOVERNOR.acquire(None, len(data), priority=True)
+            self.file.write(data)
+
+    def flush(self):
+        with self._lock:
+            self.file.flush()
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+
+
+def read(path: str) -> iter:
+    """Iterate over the calls in a binary log"""
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("'{}' is not an RPC recording".format(path))
+
+        strings = dict()
+
+        while True:
+            record_type = file.read(1)
+
+            if not record_type:
+                break
+
+            if record_type[0] == STRING:
+                string_id, length = STRING_HEADER.unpack(file.read(STRING_HEADER.size))
+                strings[string_id] = file.read(length).decode()
+
+            elif record_type[0] == CALL:
+                offset, duration, device_id, method_id, code, streaming, details_length, request_length, count = \
+                    CALL_HEADER.unpack(file.read(CALL_HEADER.size))
+                details = file.read(details_length).decode()
+                request = file.read(request_length)
+
+                responses = list()
+                for _ in range(count):
+                    response_offset, length = RESPONSE_HEADER.unpack(file.read(RESPONSE_HEADER.size))
+                    responses.append((response_offset, file.read(length)))
+
+                yield Call(offset, duration, strings[device_id], strings[method_id], code, streaming, details,
+                           request, responses)
+
+            else:
+                raise ValueError("Corrupt RPC recording '{}'".format(path))
+
+
+class RecordingInterceptor(grpc.ServerInterceptor):
+    """Capture every RPC served for a device"""
+
+    def __init__(self, recorder: Recorder, device: dict = None):
+        self.recorder = recorder
+        self.device_name = device['name'] if device else ''
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method = handler_call_details.method
+        recorder = self.recorder
+
+        def finish(start, request, responses, context, error=None):
+            code = 0
+            details = ''
+            if error is not None:
+                status = context.code() if hasattr(context, 'code') else None
+                code = (status or grpc.StatusCode.UNKNOWN).value[0]
+                details = (context.details() if hasattr(context, 'details') else None) or str(error)
+                if isinstance(details, bytes):
+                    details = details.decode()
+
+            recorder.write(Call(
+                offset=start - recorder.origin,
+                duration=time.monotonic() - start,
+                device=self.device_name,
+                method=method,
+                code=code,
+                streaming=handler.response_streaming,
+                details=details,
+                # Client streams aren't recorded
+                request=b'' if handler.request_streaming else pyminknow.interceptors.serialise(request),
+                responses=responses,
+            ))
+
+        def wrapper(behaviour, response_streaming: bool):
+            def record(request, context):
+                start = time.monotonic()
+                try:
+                    response = behaviour(request, context)
+                except Exception as error:
+                    finish(start, request, list(), context, error=error)
+                    raise
+                finish(start, request, [(time.monotonic() - start, pyminknow.interceptors.serialise(response))],
+                       context)
+                return response
+
+            def record_stream(request, context):
+                start = time.monotonic()
+                responses = list()
+                try:
+                    for response in behaviour(request, context):
+                        responses.append((time.monotonic() - start, pyminknow.interceptors.serialise(response)))
+                        yield response
+                except Exception as error:
+                    finish(start, request, responses, context, error=error)
+                    raise
+                finish(start, request, responses, context)
+
+            return record_stream if response_streaming else record
+
+        return pyminknow.interceptors.wrap_handler(handler, wrapper)
+
+
+class Replayer:
+    """Recorded responses, keyed by device, method and request"""
+
+    def __init__(self, path: str, time_scale: float = 1.):
+        """
+        :param path: Binary log file
+        :param time_scale: Speed-up factor e.g. 10 means responses are served ten times faster than recorded
+        """
+        self.time_scale = float(time_scale)
+        self._lock = threading.Lock()
+
+        calls = collections.defaultdict(list)
+        for call in read(path):
+            calls[call.device, call.method, call.request].append(call)
+
+        # Serve repeated requests with the recorded responses in turn
+        self.calls = {key: itertools.cycle(values) for key, values in calls.items()}
+
+        LOGGER.info("Loaded %s distinct recorded requests from '%s'", len(self.calls), path)
+
+    def lookup(self, device: str, method: str, request: bytes) -> Call:
+        try:
+            calls = self.calls[device, method, request]
+        except KeyError:
+            return None
+
+        with self._lock:
+            return next(calls)
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds / self.time_scale)
+
+
+class ReplayInterceptor(grpc.ServerInterceptor):
+    """Serve recorded responses for matching requests; other requests are handled as usual"""
+
+    def __init__(self, replayer: Replayer, device: dict = None):
+        self.replayer = replayer
+        self.device_name = device['name'] if device else ''
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+
+        # Responses are keyed by a single request
+        if handler is None or handler.request_streaming:
+            return handler
+
+        method = handler_call_details.method
+        replayer = self.replayer
+
+        def abort(call, context):
+            if call.code:
+                context.abort(STATUS_CODES[call.code], call.details)
+
+        def wrapper(behaviour, response_streaming: bool):
+            def replay(request, context):
+                call = replayer.lookup(self.device_name, method, pyminknow.interceptors.serialise(request))
+                if call is None:
+                    return behaviour(request, context)
+
+                replayer.sleep(call.duration)
+                abort(call, context)
+                return call.responses[0][1]
+
+            def replay_stream(request, context):
+                call = replayer.lookup(self.device_name, method, pyminknow.interceptors.serialise(request))
+                if call is None:
+                    yield from behaviour(request, context)
+                    return
+
+                elapsed = 0.
+                for offset, response in call.responses:
+                    replayer.sleep(offset - elapsed)
+                    elapsed = offset
+                    yield response
+
+                replayer.sleep(call.duration - elapsed)
+                abort(call, context)
+
+            return replay_stream if response_streaming else replay
+
+        handler = pyminknow.interceptors.wrap_handler(handler, wrapper)
+
+        # Recorded responses are already serialised
+        return handler._replace(
+            response_serializer=pyminknow.interceptors.passthrough_serializer(handler.response_serializer))
+
+
+def drive(path: str, host: str = pyminknow.config.DEFAULT_HOST, time_scale: float = 1.) -> collections.Counter:
+    """
+    Re-send the recorded requests to a server at their recorded relative times, divided by the time-scale factor
+
+    :returns: Number of calls by status code
+    """
+    ports = {device['name']: device['ports']['insecure'] for device in pyminknow.config.DEVICES}
+    ports[''] = pyminknow.config.DEFAULT_PORT
+    results = collections.Counter()
+    results_lock = threading.Lock()
+
+    calls = sorted(read(path), key=lambda _call: _call.offset)
+
+    # One channel per device, shared by the threads sending its calls
+    channels = {device: grpc.insecure_channel('{}:{}'.format(host, ports[device]))
+                for device in {call.device for call in calls}}
+
+    def send(call: Call):
+        channel = channels[call.device]
+
+        try:
+            if call.streaming:
+                for _ in channel.unary_stream(call.method)(call.request):
+                    pass
+            else:
+                channel.unary_unary(call.method)(call.request)
+            code = grpc.StatusCode.OK
+        except grpc.RpcError as error:
+            code = error.code()
+
+        with results_lock:
+            results[code.name] += 1
+
+    start = time.monotonic()
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=pyminknow.config.REPLAY_MAX_WORKERS) as pool:
+            for call in calls:
+                delay = call.offset / time_scale - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, call)
+    finally:
+        for channel in channels.values():
+            channel.close()
+
+    LOGGER.info("Sent %s calls in %.1f seconds: %s", len(calls), time.monotonic() - start, dict(results))
+
+    return results
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Re-send a recorded RPC session to a server')
+
+    parser.add_argument('path', help='Binary log file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Debug logging')
+    parser.add_argument('-o', '--host', default=pyminknow.config.DEFAULT_HOST, help='Connect to this host')
+    parser.add_argument('-t', '--time_scale', type=float, default=1., help='Speed-up factor')
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    drive(args.path, host=args.host, time_scale=args.time_scale)
+
+
+if __name__ == '__main__':
+    main()
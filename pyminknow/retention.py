@@ -0,0 +1,207 @@
+"""
+Run history retention
+
+Finished runs are expired by age, by count or by the total size of their output data (oldest first). The metadata of
+expired runs is compacted into the device's run archive (so it stays available to `get_run_info`) and their output
+directories are deleted in bulk.
+"""
+
+import datetime
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import uuid
+
+import pyminknow.archive
+import pyminknow.clock
+import pyminknow.config
+import pyminknow.runcache
+import pyminknow.service.protocol
+import pyminknow.store
+
+LOGGER = logging.getLogger(__name__)
+
+# Output directories are moved here to be deleted together
+TRASH_DIR = '.trash'
+
+
+def tree_size(path: pathlib.Path) -> int:
+    """Total size (bytes) of the files in a directory tree"""
+    total = 0
+
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return 0
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            total += tree_size(entry.path)
+        else:
+            total += entry.stat(follow_symlinks=False).st_size
+
+    return total
+
+
+class RetentionPolicy:
+    """Limits on the run history kept for each device"""
+
+    def __init__(self, max_age: datetime.timedelta = None, max_count: int = None, max_bytes: int = None):
+        """
+        :param max_age: Expire runs that ended longer ago than this
+        :param max_count: Keep at most this many runs
+        :param max_bytes: Keep at most this much output data
+        """
+        self.max_age = max_age
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+
+    def __bool__(self):
+        return any(limit is not None for limit in (self.max_age, self.max_count, self.max_bytes))
+
+    def expired(self, runs: list, now: datetime.datetime = None) -> list:
+        """
+        Select the runs to expire
+
+        :param runs: Sequence of (run_id, end_time, size) in chronological order
+        :returns: Run IDs
+        """
+        now = now or pyminknow.clock.now()
+        runs = list(runs)
+        expired = list()
+
+        # Age
+        if self.max_age is not None:
+            while runs and now - runs[0][1] > self.max_age:
+                expired.append(runs.pop(0)[0])
+
+        # Count
+        if self.max_count is not None:
+            while len(runs) > self.max_count:
+                expired.append(runs.pop(0)[0])
+
+        # Size
+        if self.max_bytes is not None:
+            total = sum(size for _, _, size in runs)
+            while runs and total > self.max_bytes:
+                run_id, _, size = runs.pop(0)
+                expired.append(run_id)
+                total -= size
+
+        return expired
+
+
+class RetentionWorker(threading.Thread):
+    """Enforce a retention policy in the background"""
+
+    def __init__(self, policy: RetentionPolicy, devices: tuple = None, interval: float = None):
+        super().__init__(name='retention', daemon=True)
+        self.policy = policy
+        self.devices = devices or pyminknow.config.DEVICES
+        self.interval = interval or pyminknow.config.RETENTION_INTERVAL
+        self._stopped = threading.Event()
+
+        # Finished runs don't change size, so only measure them once
+        self._sizes = dict()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception:
+                LOGGER.exception('Run history retention failed')
+
+    def stop(self):
+        self._stopped.set()
+
+    def enforce(self):
+        for device in self.devices:
+            self.enforce_device(device)
+
+        self.empty_trash()
+
+    def size(self, run) -> int:
+        try:
+            return self._sizes[run.run_id]
+        except KeyError:
+            path = self.output_path(run)
+            size = self._sizes[run.run_id] = tree_size(path) if path else 0
+            return size
+
+    @staticmethod
+    def output_path(run) -> pathlib.Path:
+        try:
+            return run.output_path
+        except (ValueError, TypeError, AttributeError):
+            # No flow cell or incomplete metadata
+            return None
+
+    def enforce_device(self, device: dict):
+        Run = pyminknow.service.protocol.Run
+        archive = pyminknow.archive.RunArchive(Run.build_serialisation_dir(device=device))
+        archived = set(archive.run_ids)
+
+        # Finished runs that haven't been archived yet
+        runs = list()
+        for run_id in Run.get_run_ids(device=device):
+            if run_id in archived:
+                continue
+
+            run = Run(run_id=run_id, device=device)
+            try:
+                run.deserialise()
+            except FileNotFoundError:
+                continue
+
+            if run.is_finished and run._end_time:
+                runs.append(run)
+
+        runs_by_id = {run.run_id: run for run in runs}
+        expired = self.policy.expired([(run.run_id, run._end_time, self.size(run)) for run in runs])
+
+        if not expired:
+            return
+
+        LOGGER.info("Expiring %s runs for device %s", len(expired), device['name'])
+
+        # Compact metadata before removing the run files
+        archive.add({run_id: runs_by_id[run_id].as_dict for run_id in expired})
+
+        for run_id in expired:
+            run = runs_by_id[run_id]
+            run.path.unlink()
+            self.move_to_trash(self.output_path(run))
+            self._sizes.pop(run_id, None)
+            pyminknow.runcache.CACHE.discard((device['name'], run_id))
+
+    @staticmethod
+    def trash_dir() -> pathlib.Path:
+        return pathlib.Path(pyminknow.config.DATA_DIR).joinpath(TRASH_DIR)
+
+    def move_to_trash(self, path: pathlib.Path):
+        """Moving a directory is cheap, so removal can be done in one pass later"""
+        if path is None or not path.exists():
+            return
+
+        trash_dir = self.trash_dir()
+        trash_dir.mkdir(parents=True, exist_ok=True)
+        path.rename(trash_dir.joinpath(str(uuid.uuid4())))
+
+        # Remove empty sample and protocol group directories
+        for parent in (path.parent, path.parent.parent):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+
+    def empty_trash(self):
+        trash_dir = self.trash_dir()
+
+        if trash_dir.exists():
+            shutil.rmtree(trash_dir, ignore_errors=True)
+            LOGGER.debug("Deleted '%s'", trash_dir)
+
+            # Stored files that only expired runs used
+            pyminknow.store.STORE.collect()
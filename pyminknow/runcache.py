@@ -0,0 +1,86 @@
+"""
+Cache of completed run information
+
+Completed runs never change, so their ProtocolRunInfo is kept serialised, ready to be sent, in a least recently used
+cache with a memory budget. get_run_info then skips loading the run and building the message. Entries are keyed by
+device name and run ID, and are discarded when run history retention expires the run. Hit/miss statistics are logged
+every config.RUN_INFO_CACHE_LOG_INTERVAL seconds while the cache is in use.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RunInfoCache:
+    """Serialised ProtocolRunInfo keyed by (device name, run ID)"""
+
+    def __init__(self, max_bytes: int = None, log_interval: float = None):
+        """
+        :param max_bytes: Memory budget for cached messages
+        :param log_interval: Seconds between logging statistics
+        """
+        self.max_bytes = pyminknow.config.RUN_INFO_CACHE_MB * 2 ** 20 if max_bytes is None else max_bytes
+        self.log_interval = pyminknow.config.RUN_INFO_CACHE_LOG_INTERVAL if log_interval is None else log_interval
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._logged = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes:
+        """Serialised run info, or None if it isn't cached"""
+        with self._lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+
+            now = time.monotonic()
+            log = now - self._logged >= self.log_interval
+            if log:
+                self._logged = now
+
+        if log:
+            LOGGER.info("Run info cache: %s", self.stats())
+
+        return data
+
+    def put(self, key: tuple, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+            self.entries[key] = data
+            self.size += len(data)
+
+            # Evict least recently used
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, key: tuple):
+        with self._lock:
+            data = self.entries.pop(key, None)
+            if data is not None:
+                self.size -= len(data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, entries=len(self.entries), bytes=self.size)
+
+
+# Shared by all devices in this process
+CACHE = RunInfoCache()
@@ -0,0 +1,145 @@
+"""
+Protocol run scheduler
+
+Each position runs one protocol at a time. Runs started while the position is busy wait in a queue, highest priority
+first and then in the order they were started. The number of runs generating data at once is also capped across the
+host, so queued runs may wait for another position to finish even when their own position is free.
+
+A run's priority is given by its --priority argument (default: config.RUN_PRIORITY). Queued runs that are stopped, or
+dropped when the server stops, end as PROTOCOL_STOPPED_BY_USER without starting.
+"""
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+
+import minknow_api.protocol_pb2
+
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RunScheduler:
+    """Queue protocol runs and start them when their position and a host-wide slot are free"""
+
+    def __init__(self, max_active: int = None):
+        """
+        :param max_active: Runs allowed to generate data at once across all positions (None: one per position)
+        """
+        self.max_active = max_active
+
+        # Heap of (-priority, sequence, run)
+        self._queue = list()
+        self._sequence = itertools.count()
+
+        # Context (e.g. the trace) each queued run was started in, keyed by run ID
+        self._contexts = dict()
+
+        # Runs in progress, keyed by position name
+        self.active = dict()
+        self._lock = threading.Lock()
+
+    def submit(self, run, priority: int = 0):
+        """Queue a run, starting it straight away if possible"""
+        with self._lock:
+            heapq.heappush(self._queue, (-priority, next(self._sequence), run))
+            self._contexts[run.run_id] = contextvars.copy_context()
+            LOGGER.info("Queued run %s on %s (priority %s, %s queued)", run.run_id, run.device['name'], priority,
+                        len(self._queue))
+        self.dispatch()
+
+    def dispatch(self):
+        """Start the highest priority queued runs on free positions, up to the host-wide limit"""
+        with self._lock:
+            for entry in sorted(self._queue):
+                if self.max_active is not None and len(self.active) >= self.max_active:
+                    break
+
+                run = entry[2]
+                name = run.device['name']
+                if name in self.active:
+                    continue
+
+                self._queue.remove(entry)
+                self.active[name] = run
+                context = self._contexts.pop(run.run_id, None) or contextvars.copy_context()
+                threading.Thread(target=context.run, args=(self.execute, run), name='run-{}'.format(name),
+                                 daemon=True).start()
+
+            heapq.heapify(self._queue)
+
+    def execute(self, run):
+        try:
+            run.start()
+        except Exception:
+            LOGGER.exception("Run %s failed", run.run_id)
+        finally:
+            with self._lock:
+                self.active.pop(run.device['name'], None)
+            self.dispatch()
+
+    def running(self, device: dict):
+        """The run in progress on a position (None if it's free)"""
+        with self._lock:
+            return self.active.get(device['name'])
+
+    def cancel_queued(self, device: dict):
+        """
+        Stop the next run waiting to start on a position
+
+        :returns: The run (None if there are none)
+        """
+        with self._lock:
+            for entry in sorted(self._queue):
+                run = entry[2]
+                if run.device['name'] == device['name']:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._contexts.pop(run.run_id, None)
+                    break
+            else:
+                return None
+
+        LOGGER.info("Stopped queued run %s on %s", run.run_id, device['name'])
+        self.drop(run)
+        return run
+
+    @staticmethod
+    def drop(run):
+        """End a run that hasn't started"""
+        run.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_STOPPED_BY_USER
+        run.serialise()
+        run.stopped.set()
+        run.finished.set()
+
+    def queued(self, device: dict = None) -> list:
+        """Runs waiting to start, in the order they will start"""
+        with self._lock:
+            return [run for _, _, run in sorted(self._queue)
+                    if device is None or run.device['name'] == device['name']]
+
+    def shutdown(self, timeout: float = None):
+        """Drop queued runs and stop active ones"""
+        with self._lock:
+            queued = [run for _, _, run in self._queue]
+            self._queue.clear()
+            self._contexts.clear()
+            active = list(self.active.values())
+
+        for run in queued:
+            self.drop(run)
+
+        for run in active:
+            run.cancel()
+        for run in active:
+            run.finished.wait(timeout)
+
+        if queued or active:
+            LOGGER.info("Stopped %s runs and dropped %s queued runs", len(active), len(queued))
+
+
+# Shared by every position in this process
+SCHEDULER = RunScheduler(max_active=pyminknow.config.MAX_ACTIVE_RUNS)
@@ -1,64 +1,230 @@
 import concurrent.futures
 import logging
+import threading
+import time
 
 import grpc
 
+import pyminknow.accounting
+import pyminknow.bandwidth
 import pyminknow.config
+import pyminknow.generation
+import pyminknow.injection
+import pyminknow.interceptors
+import pyminknow.lazy
+import pyminknow.recording
+import pyminknow.retention
+import pyminknow.runcache
+import pyminknow.scheduler
+import pyminknow.service.acquisition
+import pyminknow.service.data
 import pyminknow.service.device
+import pyminknow.service.fleet
 import pyminknow.service.manager
 import pyminknow.service.protocol
+import pyminknow.service.statistics
+import pyminknow.startup
+import pyminknow.store
+import pyminknow.tracing
 
 LOGGER = logging.getLogger(__name__)
 
 MAX_WORKERS = 100
 
 
+def build_middleware(inject: list = None, inject_file: str = None, inject_seed: int = None, record: str = None,
+                     replay: str = None, replay_time_scale: float = 1., trace: str = None,
+                     trace_sample: float = None) -> dict:
+    """
+    Build the fault injection, recording, replay and tracing options for a server from command-line values
+
+    :returns: Keyword arguments for Server
+    """
+    injection = None
+    if inject or inject_file:
+        injection = pyminknow.injection.RuleSet(
+            rules=[pyminknow.injection.Rule.parse(spec) for spec in inject or ()],
+            path=inject_file,
+            seed=inject_seed,
+        )
+
+    return dict(
+        injection=injection,
+        recorder=pyminknow.recording.Recorder(record) if record else None,
+        replayer=pyminknow.recording.Replayer(replay, time_scale=replay_time_scale) if replay else None,
+        tracer=pyminknow.tracing.Tracer(trace, sample_rate=trace_sample) if trace else None,
+    )
+
+
 class Server:
     SERVICES = {
+        pyminknow.service.acquisition.AcquisitionService,
+        pyminknow.service.data.DataService,
         pyminknow.service.device.DeviceService,
         pyminknow.service.protocol.ProtocolService,
         pyminknow.service.manager.ManagerService,
+        pyminknow.service.statistics.StatisticsService,
     }
 
-    def __init__(self, port: int = None):
-        """minKNOW server"""
+    def __init__(self, port: int = None, injection: pyminknow.injection.RuleSet = None,
+                 recorder: pyminknow.recording.Recorder = None, replayer: pyminknow.recording.Replayer = None,
+                 retention: pyminknow.retention.RetentionPolicy = None, devices: tuple = None, manager: bool = True,
+                 tracer: pyminknow.tracing.Tracer = None, startup: pyminknow.startup.StartupReport = None):
+        """
+        minKNOW server
+
+        :param port: Manager port
+        :param injection: Latency and fault injection rules
+        :param recorder: Record RPCs to a binary log
+        :param replayer: Serve recorded responses
+        :param retention: Run history retention policy
+        :param devices: Serve these devices (default: all configured devices)
+        :param manager: Serve the manager
+        :param tracer: Trace sampled requests
+        :param startup: Time binding and starting the servers
+        """
         self.port = port or pyminknow.config.DEFAULT_PORT
+        self.injection = injection
+        self.recorder = recorder
+        self.replayer = replayer
+        self.tracer = pyminknow.tracing.TRACER = tracer
         self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
-        self.servers = list()
+        self.manager = manager
+        self.devices = tuple(pyminknow.config.DEVICES if devices is None else devices)
+        self.retention_worker = None
+        if retention and self.devices:
+            self.retention_worker = pyminknow.retention.RetentionWorker(retention, devices=self.devices)
+        self.startup = startup
+        self.warm_up_thread = None
+
+        # Runs saved before this were left behind by an earlier server
+        self.created = time.time()
+
+        # Bind the ports in parallel, on the request handler threads (idle until the servers start)
+        futures = [self.thread_pool.submit(self.add_manager)] if manager else list()
+        futures.extend(self.thread_pool.submit(self.add_device, device) for device in self.devices)
+        self.servers = [future.result() for future in futures]
+
+        if self.startup:
+            self.startup.mark('bind {} ports'.format(len(self.servers)))
+
+    def build_manager_service(self) -> pyminknow.service.manager.ManagerService:
+        return pyminknow.service.manager.ManagerService()
+
+    def resource_usage(self) -> dict:
+        """Resources used by the host and each position"""
+        return pyminknow.accounting.ACCOUNTS.stats()
 
+    def add_manager(self) -> grpc.Server:
         # Listen on main port
-        server = grpc.server(thread_pool=self.thread_pool)
-        server.add_insecure_port('[::]:{port}'.format(port=port))
+        server = grpc.server(thread_pool=self.thread_pool, interceptors=self.build_interceptors())
+        server.add_insecure_port('[::]:{port}'.format(port=self.port))
 
         # Create manager service
-        manager_servicer = pyminknow.service.manager.ManagerService()
+        manager_servicer = self.build_manager_service()
         manager_servicer.add_to_server(server)
-        self.servers.append(server)
+        fleet_servicer = pyminknow.service.fleet.FleetService(status=manager_servicer.status,
+                                                              usage=self.resource_usage, devices=self.devices)
+        fleet_servicer.add_to_server(server)
+        return server
 
-        # Devices
-        for device in pyminknow.config.DEVICES:
-            # Listen on specific port for each device
-            device_port = device['ports']['insecure']
-            server = grpc.server(thread_pool=self.thread_pool)
-            server.add_insecure_port('[::]:{port}'.format(port=device_port))
+    def add_device(self, device: dict) -> grpc.Server:
+        # Listen on specific port for each device
+        device_port = device['ports']['insecure']
+        server = grpc.server(thread_pool=self.thread_pool, interceptors=self.build_interceptors(device=device))
+        server.add_insecure_port('[::]:{port}'.format(port=device_port))
 
-            # Register services
-            pyminknow.service.protocol.ProtocolService(device=device).add_to_server(server)
-            device_servicer = pyminknow.service.device.DeviceService(device=device)
-            device_servicer.add_to_server(server)
-            self.servers.append(server)
+        # Register services
+        pyminknow.service.protocol.ProtocolService(device=device).add_to_server(server)
+        pyminknow.service.acquisition.AcquisitionService(device=device).add_to_server(server)
+        pyminknow.service.data.DataService(device=device).add_to_server(server)
+        pyminknow.service.statistics.StatisticsService(device=device).add_to_server(server)
+        device_servicer = pyminknow.service.device.DeviceService(device=device)
+        device_servicer.add_to_server(server)
 
-            LOGGER.info("Added insecure port %s for device %s", device_port, device['name'])
+        LOGGER.info("Added insecure port %s for device %s", device_port, device['name'])
+        return server
+
+    def build_interceptors(self, device: dict = None) -> list:
+        """Server-side middleware for the manager (no device) or a device"""
+        interceptors = list()
+
+        # Outermost, so spans include injected latency
+        if self.tracer:
+            interceptors.append(pyminknow.tracing.TracingInterceptor(self.tracer, device=device))
+
+        # Record what the client sees, including injected faults
+        if self.recorder:
+            interceptors.append(pyminknow.recording.RecordingInterceptor(self.recorder, device=device))
+
+        if self.injection:
+            interceptors.append(pyminknow.injection.InjectionInterceptor(self.injection, device=device))
+
+        if self.replayer:
+            interceptors.append(pyminknow.recording.ReplayInterceptor(self.replayer, device=device))
+
+        # Innermost, so services may return cached bytes
+        interceptors.append(pyminknow.interceptors.SerialisedResponseInterceptor())
+
+        return interceptors
 
     def start(self):
-        for server in self.servers:
-            server.start()
-        LOGGER.info("Listening on port %s", self.port)
+        for _ in self.thread_pool.map(lambda server: server.start(), self.servers):
+            pass
+        if self.startup:
+            self.startup.mark('start {} servers'.format(len(self.servers)))
+            self.startup.ready()
+        if self.manager:
+            LOGGER.info("Listening on port %s", self.port)
+
+        if self.retention_worker:
+            self.retention_worker.start()
+        self.warm_up_thread = threading.Thread(target=self.warm_up, name='warm-up', daemon=True)
+        self.warm_up_thread.start()
+
+    def warm_up(self):
+        """
+        Load deferred modules and start the record builders before the first run needs them, and end the runs that
+        were queued or running when the server last stopped
+        """
+        pyminknow.lazy.load_all()
+
+        for device in self.devices:
+            try:
+                pyminknow.service.protocol.Run.recover(device, before=self.created)
+            except Exception:
+                LOGGER.exception("Failed to recover runs on %s", device['name'])
+
+        start = time.perf_counter()
+        pool = pyminknow.generation.get_pool() if self.devices else None
+        if pool:
+            pool.start()
+
+        if self.startup:
+            for name, seconds in pyminknow.lazy.LOAD_TIMES.items():
+                self.startup.loaded('import {}'.format(name), seconds)
+            if pool:
+                self.startup.loaded('start {} record builders'.format(pool.workers), time.perf_counter() - start)
+            self.startup.complete()
 
     def stop(self, grace: float):
         LOGGER.info('Stopping server...')
+        if self.retention_worker:
+            self.retention_worker.stop()
+        if self.warm_up_thread:
+            self.warm_up_thread.join()
         for server in self.servers:
             server.stop(grace=grace)
+        pyminknow.scheduler.SCHEDULER.shutdown(timeout=grace)
+        pyminknow.generation.shutdown()
+        if self.recorder:
+            self.recorder.close()
+        if self.tracer:
+            self.tracer.close()
+        LOGGER.info("Run info cache: %s", pyminknow.runcache.CACHE.stats())
+        LOGGER.info("Disk writes: %s", pyminknow.bandwidth.GOVERNOR.stats())
+        LOGGER.info("Content store: %s", pyminknow.store.STORE.stats())
+        LOGGER.info("Resource usage: %s", pyminknow.accounting.ACCOUNTS.host.as_dict())
         LOGGER.info("Server stopped")
 
     def wait(self):
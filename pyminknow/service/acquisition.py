@@ -0,0 +1,150 @@
+import logging
+import time
+
+import grpc
+
+import minknow_api.acquisition_pb2
+import minknow_api.acquisition_pb2_grpc
+
+import pyminknow.config
+import pyminknow.throughput
+from pyminknow.service.protocol import Run
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AcquisitionService(minknow_api.acquisition_pb2_grpc.AcquisitionServiceServicer):
+    """
+    Acquisition service
+
+    Progress is derived from the device's current protocol run.
+
+    https://github.com/nanoporetech/minknow_lims_interface/blob/master/minknow/rpc/acquisition.proto
+    """
+    add_to_server = minknow_api.acquisition_pb2_grpc.add_AcquisitionServiceServicer_to_server
+
+    def __init__(self, *args, device: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.device = device
+        self.throughput = pyminknow.throughput.Throughput.for_device(device)
+
+    @property
+    def run(self) -> Run:
+        return Run.current(device=self.device)
+
+    @property
+    def is_running(self) -> bool:
+        run = self.run
+        return run is not None and not run.is_finished
+
+    def find_run(self, acquisition_run_id: str) -> Run:
+        """Get the protocol run that an acquisition belongs to"""
+        run = self.run
+        if run is not None and acquisition_run_id in run.acquisition_run_ids:
+            return run
+
+        # Search history, most recent first
+        for run_id in reversed(list(Run.get_run_ids(device=self.device))):
+            run = Run(run_id=run_id, device=self.device)
+            run.deserialise()
+            if acquisition_run_id in run.acquisition_run_ids:
+                return run
+
+    def build_info(self, run: Run, acquisition_run_id: str = None) -> minknow_api.acquisition_pb2.AcquisitionRunInfo:
+        acquisition_run_id = acquisition_run_id or run.acquisition_run_id
+
+        # Only the final acquisition (sequencing) produces reads
+        if acquisition_run_id == run.acquisition_run_id:
+            elapsed = run.elapsed
+            state = 'ACQUISITION_COMPLETED' if run.is_finished else 'ACQUISITION_RUNNING'
+        else:
+            elapsed = 0.
+            state = 'ACQUISITION_COMPLETED'
+
+        return minknow_api.acquisition_pb2.AcquisitionRunInfo(
+            run_id=acquisition_run_id,
+            state=minknow_api.acquisition_pb2.AcquisitionState.Value(state),
+            start_time=run.start_time,
+            data_read_start_time=run.start_time,
+            end_time=run.end_time if run.is_finished else None,
+            yield_summary=minknow_api.acquisition_pb2.AcquisitionYieldSummary(
+                **self.throughput.yield_summary(elapsed)),
+        )
+
+    def get_acquisition_info(self, request, context) -> minknow_api.acquisition_pb2.AcquisitionRunInfo:
+        if not request.run_id:
+            return self.get_current_acquisition_run(request, context)
+
+        run = self.find_run(request.run_id)
+
+        if run is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'Unknown acquisition run')
+
+        return self.build_info(run, acquisition_run_id=request.run_id)
+
+    def get_current_acquisition_run(self, request, context) -> minknow_api.acquisition_pb2.AcquisitionRunInfo:
+        if not self.is_running:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, 'No acquisition is running')
+
+        return self.build_info(self.run)
+
+    def list_acquisition_runs(self, request, context) -> minknow_api.acquisition_pb2.ListAcquisitionRunsResponse:
+        run_ids = list()
+
+        for run_id in Run.get_run_ids(device=self.device):
+            run = Run(run_id=run_id, device=self.device)
+            run.deserialise()
+            run_ids.extend(run.acquisition_run_ids)
+
+        return minknow_api.acquisition_pb2.ListAcquisitionRunsResponse(run_ids=run_ids)
+
+    def get_progress(self, request, context) -> minknow_api.acquisition_pb2.GetProgressResponse:
+        """Raw samples per channel acquired, and those basecalled (which may fall behind)"""
+        acquired = processed = 0
+        if self.is_running:
+            run = self.run
+            acquired = self.throughput.samples_per_channel(run.acquired_elapsed)
+            processed = acquired
+            if run.basecaller:
+                processed = min(self.throughput.samples_per_channel(run.basecaller.processed_elapsed), acquired)
+
+        return minknow_api.acquisition_pb2.GetProgressResponse(
+            raw_per_channel=minknow_api.acquisition_pb2.GetProgressResponse.RawPerChannel(
+                acquired=acquired,
+                processed=processed,
+            )
+        )
+
+    @property
+    def status(self) -> int:
+        status = 'PROCESSING' if self.is_running else 'READY'
+        return minknow_api.acquisition_pb2.MinknowStatus.Value(status)
+
+    def current_status(self, request, context) -> minknow_api.acquisition_pb2.CurrentStatusResponse:
+        return minknow_api.acquisition_pb2.CurrentStatusResponse(status=self.status)
+
+    def watch_for_status_change(self, request_iterator, context) -> iter:
+        """Stream the status whenever it changes"""
+        status = None
+
+        while context.is_active():
+            if self.status != status:
+                status = self.status
+                yield minknow_api.acquisition_pb2.WatchForStatusChangeResponse(status=status)
+
+            time.sleep(pyminknow.config.WATCH_INTERVAL)
+
+    def watch_current_acquisition_run(self, request, context) -> iter:
+        """Stream the progress of the current acquisition until it finishes"""
+        run = self.run
+
+        if not self.is_running:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, 'No acquisition is running')
+
+        while context.is_active():
+            yield self.build_info(run)
+
+            if run.is_finished:
+                break
+
+            time.sleep(pyminknow.config.WATCH_INTERVAL)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import grpc
+import numpy
+
+import minknow_api.data_pb2
+import minknow_api.data_pb2_grpc
+
+import pyminknow.channels
+import pyminknow.clock
+import pyminknow.config
+import pyminknow.rawsignal
+import pyminknow.throughput
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DataService(minknow_api.data_pb2_grpc.DataServiceServicer):
+    """
+    Data service
+
+    Raw signal is streamed in real time from a preallocated buffer. Each message is produced only when the previous
+    one has been sent, so a slow client holds back the stream (gRPC flow control) rather than growing a queue.
+
+    https://github.com/nanoporetech/minknow_lims_interface/blob/master/minknow/rpc/data.proto
+    """
+    add_to_server = minknow_api.data_pb2_grpc.add_DataServiceServicer_to_server
+
+    DataType = minknow_api.data_pb2.GetDataTypesResponse.DataType
+
+    def __init__(self, *args, device: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.device = device
+        self.throughput = pyminknow.throughput.Throughput.for_device(device)
+        self._signal = None
+        self._lock = threading.Lock()
+
+        # Acquisition clock (simulated seconds)
+        self.start_time = pyminknow.clock.monotonic()
+
+    @property
+    def signal(self) -> pyminknow.rawsignal.SignalBuffer:
+        """Allocate the signal buffer when it's first used"""
+        with self._lock:
+            if self._signal is None:
+                self._signal = pyminknow.rawsignal.SignalBuffer(
+                    channel_count=self.throughput.channel_count,
+                    sample_rate=self.throughput.sample_rate,
+                )
+            return self._signal
+
+    def get_data_types(self, request, context) -> minknow_api.data_pb2.GetDataTypesResponse:
+        return minknow_api.data_pb2.GetDataTypesResponse(
+            uncalibrated_signal=self.DataType(type=self.DataType.Type.Value('SIGNED_INTEGER'), size=2),
+            calibrated_signal=self.DataType(type=self.DataType.Type.Value('FLOATING_POINT'), size=4),
+            bias_voltages=self.DataType(type=self.DataType.Type.Value('FLOATING_POINT'), size=8),
+        )
+
+    @staticmethod
+    def calibrate(chunk: numpy.ndarray) -> numpy.ndarray:
+        """Convert ADC values to picoamps"""
+        scale = pyminknow.config.SIGNAL_RANGE / pyminknow.config.DIGITISATION
+        return ((chunk + pyminknow.config.SIGNAL_OFFSET) * scale).astype(numpy.float32)
+
+    def get_signal_bytes(self, request, context) -> iter:
+        """Stream raw signal for a range of channels at the acquisition sample rate (in simulated time)"""
+        sample_rate = self.throughput.sample_rate
+        first_channel = request.first_channel or 1
+        last_channel = request.last_channel or self.throughput.channel_count
+
+        if not 1 <= first_channel <= last_channel <= self.throughput.channel_count:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Invalid channel range')
+
+        total_samples = request.samples or int(request.seconds * sample_rate)
+        if total_samples <= 0:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Specify a duration in seconds or samples')
+
+        signal = self.signal
+        chunk_duration = signal.chunk_samples / sample_rate
+
+        # Align to the acquisition clock
+        index = int((pyminknow.clock.monotonic() - self.start_time) / chunk_duration)
+        sent = 0
+
+        while sent < total_samples and context.is_active():
+            # Wait until this chunk would have been acquired
+            pyminknow.clock.sleep(self.start_time + (index + 1) * chunk_duration - pyminknow.clock.monotonic())
+
+            chunk = signal.chunk(index, first_channel, last_channel)[:, :total_samples - sent]
+            if request.calibrated_data:
+                chunk = self.calibrate(chunk)
+
+            yield minknow_api.data_pb2.GetSignalBytesResponse(
+                samples_since_start=index * signal.chunk_samples,
+                seconds_since_start=index * chunk_duration,
+                channels=[minknow_api.data_pb2.GetSignalBytesResponse.ChannelData(data=row.tobytes())
+                          for row in chunk],
+            )
+
+            sent += chunk.shape[1]
+            index += 1
+
+    def get_channel_states(self, request, context) -> iter:
+        """Stream the states of a range of channels: all of them at first, then only those that change"""
+        channels = pyminknow.channels.ChannelStates.for_device(self.device)
+        first_channel = request.first_channel or 1
+        last_channel = request.last_channel or channels.channel_count
+        use_ids = request.use_channel_states_ids.value
+        heartbeat = request.heartbeat.ToTimedelta().total_seconds() if request.HasField('heartbeat') else None
+
+        if not 1 <= first_channel <= last_channel <= channels.channel_count:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Invalid channel range')
+
+        ChannelStateData = minknow_api.data_pb2.GetChannelStatesResponse.ChannelStateData
+        previous = None
+        last_sent = time.monotonic()
+
+        while context.is_active():
+            states = channels.snapshot(first_channel, last_channel)
+            changed = numpy.arange(len(states)) if previous is None else numpy.flatnonzero(states != previous)
+            previous = states
+
+            # Send changes, or an empty message to show that the stream is alive
+            if len(changed) or (heartbeat and time.monotonic() - last_sent >= heartbeat):
+                yield minknow_api.data_pb2.GetChannelStatesResponse(channel_states=[
+                    ChannelStateData(channel=int(index) + first_channel, state_id=int(states[index]))
+                    if use_ids else
+                    ChannelStateData(channel=int(index) + first_channel,
+                                     state_name=pyminknow.channels.STATES[states[index]])
+                    for index in changed
+                ])
+                last_sent = time.monotonic()
+
+            time.sleep(pyminknow.config.CHANNEL_STATES_INTERVAL)
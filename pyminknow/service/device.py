@@ -4,6 +4,8 @@ import random
 import minknow_api.device_pb2
 import minknow_api.device_pb2_grpc
 
+import pyminknow.channels
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -30,11 +32,12 @@ class DeviceService(minknow_api.device_pb2_grpc.DeviceServiceServicer):
 
     def get_flow_cell_info(self, request, context):
         if self.flow_cell:
+            channels = pyminknow.channels.ChannelStates.for_device(self.device)
             data = dict(
                 has_flow_cell=True,
                 flow_cell_id=self.flow_cell['flow_cell_id'],
-                channel_count=512,
-                wells_per_channel=4,
+                channel_count=channels.channel_count,
+                wells_per_channel=channels.wells_per_channel,
                 product_code="FLO-MIN106",
                 user_specified_flow_cell_id="?",
                 user_specified_product_code='?',
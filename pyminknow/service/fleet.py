@@ -0,0 +1,256 @@
+"""
+Fleet status (extension service, not part of the minKNOW API)
+
+A dashboard would otherwise call flow_cell_positions on the manager and then get_device_state, get_flow_cell_info
+and get_run_info on every position. This service answers with one snapshot of every position, built from the
+server's own state: runs served by this process are read from memory and runs served by shards from their saved
+metadata. Snapshots are kept for a short time (config.FLEET_STATUS_TTL) and concurrent requests for a stale snapshot
+wait for one rebuild rather than each building their own.
+
+Messages are google.protobuf.Struct, so no generated code is needed:
+
+    /pyminknow.fleet.FleetService/get_fleet_status      Empty -> Struct
+    /pyminknow.fleet.FleetService/watch_fleet_status    Empty -> stream Struct (sent when the snapshot changes)
+    /pyminknow.fleet.FleetService/get_resource_usage    Empty -> Struct (see pyminknow.accounting)
+"""
+
+import logging
+import threading
+import time
+
+import google.protobuf.empty_pb2
+import google.protobuf.json_format
+import google.protobuf.struct_pb2
+import grpc
+
+import minknow_api.protocol_pb2
+
+import pyminknow.accounting
+import pyminknow.config
+import pyminknow.interceptors
+import pyminknow.scheduler
+import pyminknow.service.protocol
+
+LOGGER = logging.getLogger(__name__)
+
+SERVICE_NAME = 'pyminknow.fleet.FleetService'
+
+
+class SnapshotCache:
+    """A value that is rebuilt when it's older than its time to live, once for all the threads waiting for it"""
+
+    def __init__(self, build, ttl: float = None):
+        """
+        :param build: Callable that returns a new value
+        :param ttl: Seconds a value may be reused
+        """
+        self.build = build
+        self.ttl = pyminknow.config.FLEET_STATUS_TTL if ttl is None else ttl
+        self.value = None
+        self.updated = None
+        self.building = False
+        self._condition = threading.Condition()
+
+        # Statistics
+        self.hits = 0
+        self.builds = 0
+        self.coalesced = 0
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.updated is not None and time.monotonic() - self.updated < self.ttl
+
+    def get(self):
+        with self._condition:
+            waited = False
+            while not self.is_fresh:
+                if not self.building:
+                    self.building = True
+                    break
+                waited = True
+                self._condition.wait()
+            else:
+                if waited:
+                    self.coalesced += 1
+                else:
+                    self.hits += 1
+                return self.value
+
+        try:
+            value = self.build()
+        except BaseException:
+            with self._condition:
+                self.building = False
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self.value = value
+            self.updated = time.monotonic()
+            self.building = False
+            self.builds += 1
+            self._condition.notify_all()
+
+        return value
+
+    def stats(self) -> dict:
+        with self._condition:
+            return dict(hits=self.hits, builds=self.builds, coalesced=self.coalesced)
+
+
+def isoformat(value) -> str:
+    return value.isoformat() if value else None
+
+
+class FleetService:
+    """Consolidated status of every position on the host"""
+
+    def __init__(self, status=None, devices: tuple = None, usage=None):
+        """
+        :param status: Callable that returns the state of each position {name: (state name, error info)} for
+        positions that aren't simply running
+        :param devices: Positions served by this process (others are read from saved run metadata)
+        :param usage: Callable that returns the resources used by the host and each position (see Accounts.stats)
+        """
+        self.status = status
+        self.usage = usage
+        self.local = {device['name'] for device in (pyminknow.config.DEVICES if devices is None else devices)}
+        self.cache = SnapshotCache(self.build_snapshot)
+
+    def add_to_server(self, server: grpc.Server):
+        handlers = dict(
+            get_fleet_status=grpc.unary_unary_rpc_method_handler(
+                self.get_fleet_status,
+                request_deserializer=google.protobuf.empty_pb2.Empty.FromString,
+                response_serializer=google.protobuf.struct_pb2.Struct.SerializeToString,
+            ),
+            watch_fleet_status=grpc.unary_stream_rpc_method_handler(
+                self.watch_fleet_status,
+                request_deserializer=google.protobuf.empty_pb2.Empty.FromString,
+                response_serializer=google.protobuf.struct_pb2.Struct.SerializeToString,
+            ),
+            get_resource_usage=grpc.unary_unary_rpc_method_handler(
+                self.get_resource_usage,
+                request_deserializer=google.protobuf.empty_pb2.Empty.FromString,
+                response_serializer=google.protobuf.struct_pb2.Struct.SerializeToString,
+            ),
+        )
+        server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE_NAME, handlers),))
+
+    def build_run(self, device: dict) -> dict:
+        """The current run on a position, or its most recent one"""
+        Run = pyminknow.service.protocol.Run
+        run = Run.current(device) if device['name'] in self.local else None
+
+        if run is None:
+            run_id = Run.latest_run_id(device)
+            if run_id is None:
+                return None
+            run = Run(run_id=run_id, device=device)
+            try:
+                run.deserialise()
+            except FileNotFoundError:
+                return None
+
+        data = dict(
+            run_id=run.run_id,
+            protocol_id=run.protocol_id,
+            state=minknow_api.protocol_pb2.ProtocolState.Name(run.state),
+            protocol_group_id=run.protocol_group_id,
+            sample_id=run.sample_id,
+            output_path=str(run.output_path) if run._start_time else '',
+            start_time=isoformat(run._start_time),
+            end_time=isoformat(run._end_time),
+            elapsed=run.elapsed,
+            usage=run.usage.as_dict(),
+        )
+        if run.statistics:
+            data.update({key: int(value) for key, value in run.statistics.totals.items()})
+        if run.basecaller:
+            data.update(acquired_elapsed=run.acquired_elapsed, basecalled_elapsed=run.basecaller.processed_elapsed,
+                        basecall_backlog=run.basecaller.backlog)
+
+        return data
+
+    def build_position(self, device: dict, status: dict) -> dict:
+        state, error_info = status.get(device['name'], ('STATE_RUNNING', ''))
+        flow_cell = device.get('flow_cell')
+
+        position = dict(
+            name=device['name'],
+            state=state,
+            error_info=error_info,
+            ports=dict(device['ports']),
+            location=dict(device['layout']),
+            flow_cell=dict(has_flow_cell=bool(flow_cell), **(flow_cell or dict())),
+            run=self.build_run(device),
+        )
+        if device['name'] in self.local:
+            position['queued_runs'] = len(pyminknow.scheduler.SCHEDULER.queued(device))
+
+        return position
+
+    def build_snapshot(self) -> bytes:
+        """Serialised snapshot of every position"""
+        status = self.status() if self.status else dict()
+        positions = [self.build_position(device, status) for device in pyminknow.config.DEVICES]
+
+        snapshot = dict(
+            product_code=pyminknow.config.PRODUCT_CODE,
+            serial=pyminknow.config.SERIAL,
+            positions=positions,
+            running=sum(1 for position in positions if position['run'] and position['run']['state'] in {
+                'PROTOCOL_RUNNING', 'PROTOCOL_WAITING_FOR_ACQUISITION'}),
+        )
+
+        message = google.protobuf.struct_pb2.Struct()
+        message.update(snapshot)
+        return pyminknow.interceptors.serialise(message)
+
+    def get_fleet_status(self, request, context) -> bytes:
+        return self.cache.get()
+
+    def get_resource_usage(self, request, context) -> bytes:
+        """Resources used by the host and each position since the server started"""
+        usage = self.usage() if self.usage else pyminknow.accounting.ACCOUNTS.stats()
+
+        message = google.protobuf.struct_pb2.Struct()
+        message.update(usage)
+        return pyminknow.interceptors.serialise(message)
+
+    def watch_fleet_status(self, request, context) -> iter:
+        """Stream the snapshot whenever it changes"""
+        previous = None
+
+        while context.is_active():
+            snapshot = self.cache.get()
+            if snapshot != previous:
+                previous = snapshot
+                yield snapshot
+
+            time.sleep(pyminknow.config.WATCH_INTERVAL)
+
+
+class FleetServiceStub:
+    """Client for the fleet status service"""
+
+    def __init__(self, channel: grpc.Channel):
+        self.get_fleet_status = channel.unary_unary(
+            '/{}/get_fleet_status'.format(SERVICE_NAME),
+            request_serializer=google.protobuf.empty_pb2.Empty.SerializeToString,
+            response_deserializer=google.protobuf.struct_pb2.Struct.FromString,
+        )
+        self.watch_fleet_status = channel.unary_stream(
+            '/{}/watch_fleet_status'.format(SERVICE_NAME),
+            request_serializer=google.protobuf.empty_pb2.Empty.SerializeToString,
+            response_deserializer=google.protobuf.struct_pb2.Struct.FromString,
+        )
+        self.get_resource_usage = channel.unary_unary(
+            '/{}/get_resource_usage'.format(SERVICE_NAME),
+            request_serializer=google.protobuf.empty_pb2.Empty.SerializeToString,
+            response_deserializer=google.protobuf.struct_pb2.Struct.FromString,
+        )
+
+
+def to_dict(message: google.protobuf.struct_pb2.Struct) -> dict:
+    return google.protobuf.json_format.MessageToDict(message)
@@ -16,15 +16,28 @@ class ManagerService(minknow_api.manager_pb2_grpc.ManagerServiceServicer):
     """
     add_to_server = minknow_api.manager_pb2_grpc.add_ManagerServiceServicer_to_server
 
+    def __init__(self, *args, status=None, **kwargs):
+        """
+        :param status: Callable that returns the state of each position {name: (state name, error info)} for
+        positions that aren't simply running
+        """
+        super().__init__(*args, **kwargs)
+        self.status = status
+
     def get_version_info(self, request, context):
         return minknow_api.manager_pb2.GetVersionInfoResponse()
 
     def describe_host(self, request, context):
+        # The host can only sequence if all its positions are up
+        status = self.status() if self.status else dict()
+        can_sequence_offline = all(state == 'STATE_RUNNING' for state, _ in status.values())
+
         return minknow_api.manager_pb2.DescribeHostResponse(
             product_code=pyminknow.config.PRODUCT_CODE,
             description=pyminknow.config.DESCRIPTION,
             serial=pyminknow.config.SERIAL,
             network_name=pyminknow.config.NETWORK_NAME,
+            can_sequence_offline=can_sequence_offline,
         )
 
     def flow_cell_positions(self, request, context) -> iter:
@@ -39,15 +52,18 @@ class ManagerService(minknow_api.manager_pb2_grpc.ManagerServiceServicer):
 
     @property
     def _flow_cell_positions(self) -> list:
-        state_name = 'STATE_RUNNING'
-        state = minknow_api.manager_pb2.FlowCellPosition.State.Value(state_name)
+        status = self.status() if self.status else dict()
 
-        return [
-            minknow_api.manager_pb2.FlowCellPosition(
+        positions = list()
+        for device in pyminknow.config.DEVICES:
+            state_name, error_info = status.get(device['name'], ('STATE_RUNNING', ''))
+
+            positions.append(minknow_api.manager_pb2.FlowCellPosition(
                 name=device['name'],
                 location=minknow_api.manager_pb2.FlowCellPosition.Location(**device['layout']),
-                state=state,
+                state=minknow_api.manager_pb2.FlowCellPosition.State.Value(state_name),
                 rpc_ports=minknow_api.manager_pb2.FlowCellPosition.RpcPorts(**device['ports']),
-                error_info='',
-            ) for device in pyminknow.config.DEVICES
-        ]
+                error_info=error_info,
+            ))
+
+        return positions
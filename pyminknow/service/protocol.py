@@ -1,31 +1,59 @@
+import collections
 import datetime
+import hashlib
+import io
 import logging
 import pathlib
 import pickle
+import threading
 import time
 import uuid
 import json
 
-from collections import Iterable
+from collections.abc import Iterable
 
 import google.protobuf.timestamp_pb2
 import google.protobuf.wrappers_pb2
+import grpc
 
+import minknow_api.acquisition_pb2
 import minknow_api.protocol_pb2
 import minknow_api.protocol_pb2_grpc
 import minknow_api.device_pb2
+import pyminknow.accounting
+import pyminknow.archive
+import pyminknow.bandwidth
+import pyminknow.basecaller
+import pyminknow.channels
+import pyminknow.clock
 import pyminknow.config
+import pyminknow.interceptors
+import pyminknow.manifest
+import pyminknow.options
+import pyminknow.output
+import pyminknow.reads
+import pyminknow.runcache
+import pyminknow.scheduler
+import pyminknow.stats
+import pyminknow.store
+import pyminknow.throughput
+import pyminknow.tracing
 
 LOGGER = logging.getLogger(__name__)
 
+DataAction = minknow_api.acquisition_pb2.StopRequest.DataAction
 
+
+@pyminknow.tracing.traced('build_timestamp')
 def build_timestamp(timestamp=None) -> google.protobuf.timestamp_pb2.Timestamp:
     """Convert Python datetime to Protobuf Timestamp"""
     # https://github.com/protocolbuffers/protobuf/issues/3986
     proto_timestamp = google.protobuf.timestamp_pb2.Timestamp()
-    return proto_timestamp.FromDatetime(timestamp or datetime.datetime.utcnow())
+    proto_timestamp.FromDatetime(timestamp or pyminknow.clock.now())
+    return proto_timestamp
 
 
+@pyminknow.tracing.traced('to_datetime')
 def to_datetime(timestamp: google.protobuf.timestamp_pb2.Timestamp) -> datetime.datetime:
     try:
         return timestamp.ToDateTime()
@@ -37,6 +65,9 @@ class Run:
     """Protocol run (dummy)"""
     SERIALISATION_EXT = 'pkl'
 
+    # The most recently started run on each device, keyed by device name
+    _current = dict()
+
     def __init__(self, run_id: str = None, protocol_id: str = None, user_info=None, args: list = None,
                  device: dict = None):
         self.run_id = run_id or self.make_run_id()
@@ -47,7 +78,31 @@ class Run:
         self._start_time = None
         self.end_time = None
         self.device = device
-        self._acquisition_run_ids = None
+
+        # A new run's acquisition run IDs are saved with it (a run being loaded gets its own)
+        self._acquisition_run_ids = None if run_id else self.build_acquisition_run_ids()
+        self.statistics = None
+        self.channels = None
+        self.output = None
+        self.basecaller = None
+        self._options = None
+
+        # Digest of the manifest of this run's output files, once it's written
+        self.manifest_digest = None
+
+        # Acquisition time (simulated seconds) of the reads generated so far
+        self.acquired_elapsed = 0.
+
+        # Resources used (counted towards the position's once the run starts)
+        self.usage = pyminknow.accounting.Usage()
+
+        # Cancellation token, checked between batches of reads
+        self.cancelled = threading.Event()
+        self.data_action = DataAction.STOP_DEFAULT
+
+        # Set when acquisition has stopped, and when the output has been saved
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
 
     @property
     def serialisation_dir(self) -> pathlib.Path:
@@ -65,7 +120,7 @@ class Run:
             state=self.state,
             run_id=self.run_id,
             protocol_id=self.protocol_id,
-            _acquisition_run_ids=self._acquisition_run_ids,
+            _acquisition_run_ids=self.acquisition_run_ids,
             user_info=dict(
                 protocol_group_id=self.user_info.protocol_group_id.value,
                 sample_id=self.user_info.sample_id.value,
@@ -74,6 +129,7 @@ class Run:
             _start_time=self._start_time,
             _end_time=self._end_time,
             device=self.device,
+            usage=self.usage.as_dict(),
         )
 
     @property
@@ -84,31 +140,66 @@ class Run:
     def build_serialisation_dir(cls, device: dict) -> pathlib.Path:
         return pathlib.Path(pyminknow.config.RUN_DIR).joinpath(device['name'])
 
+    @pyminknow.tracing.traced('serialise')
     def serialise(self):
         self.serialisation_dir.mkdir(parents=True, exist_ok=True)
 
+        data = pickle.dumps(self.as_dict)
+
+        # Run state is written ahead of bulk data
+        pyminknow.bandwidth.GOVERNOR.acquire(self.device['name'], len(data), priority=True)
+
         with self.path.open('wb') as file:
-            pickle.dump(self.as_dict, file)
+            file.write(data)
 
             LOGGER.info("Wrote '%s'", file.name)
 
+        self.usage.add(bytes_written=len(data))
+
     def from_dict(self, data: dict):
         self.user_info = self.build_user_info(**data.pop('user_info'))
+        self.usage = pyminknow.accounting.Usage.from_dict(data.pop('usage', dict()))
 
         for attr, value in data.items():
             setattr(self, attr, value)
 
     def load(self) -> dict:
-        with self.path.open('rb') as file:
-            data = pickle.load(file)
+        try:
+            with self.path.open('rb') as file:
+                data = pickle.load(file)
 
-            LOGGER.debug("Read '%s'", file.name)
+                LOGGER.debug("Read '%s'", file.name)
 
-            return data
+                return data
 
+        # Look for compacted run metadata
+        except FileNotFoundError:
+            archive = pyminknow.archive.RunArchive(self.serialisation_dir)
+            try:
+                return archive.get(self.run_id)
+            except KeyError:
+                raise FileNotFoundError(self.path)
+
+    @pyminknow.tracing.traced('deserialise')
     def deserialise(self):
         self.from_dict(self.load())
 
+    @property
+    def summary_filename(self) -> str:
+        """Sequencing summary (one row per read)"""
+        return 'sequencing_summary_{flow_cell_id}_{acq}.txt'.format(flow_cell_id=self.flow_cell_id,
+                                                                    acq=self.acq_id_short)
+
+    @property
+    def manifest_filename(self) -> str:
+        """Paths, sizes and checksums of the output files"""
+        return 'manifest_{flow_cell_id}_{acq}.json'.format(flow_cell_id=self.flow_cell_id, acq=self.acq_id_short)
+
+    @property
+    def marker_filename(self) -> str:
+        """Written when the run is finished"""
+        return 'complete_{flow_cell_id}_{acq}.json'.format(flow_cell_id=self.flow_cell_id, acq=self.acq_id_short)
+
     def build_filenames(self) -> iter:
         """Generate filenames for output data files"""
         templates = {
@@ -116,7 +207,6 @@ class Run:
             'duty_time_{flow_cell_id}_{acq}.csv',
             'final_summary_{flow_cell_id}_{acq}.txt',
             'mux_scan_data_{flow_cell_id}_{acq}.csv',
-            'sequencing_summary_{flow_cell_id}_{acq}.txt',
             'throughput_{flow_cell_id}_{acq}.csv',
         }
         for template in templates:
@@ -130,31 +220,46 @@ class Run:
             yield template.format(flow_cell_id=self.flow_cell_id, acq=self.acq_id_short, day=self.day,
                                   time=self.time, run_id_short=self.run_id_short)
 
+    @pyminknow.tracing.traced('save_data')
     def save_data(self):
-        """Write sequence data to disk"""
-
-        # Make subdirectories e.g. "fast5_fail"
-        for test in {'fast5', 'fastq'}:
-            for result in {'pass', 'fail'}:
-                subdir = self.output_path.joinpath("{}_{}".format(test, result))
-
-                # One folder per barcode containing an empty file
-                for i in range(25):
-                    barcode = "barcode" + str(i).zfill(2)
-
-                    subsubdir = subdir.joinpath(barcode)
-
-                    subsubdir.mkdir(parents=True, exist_ok=True)
-
-                    filename = self.run_code + '_0.' + test
-                    subsubdir.joinpath(filename).touch()
-
-        # Create data files
-        for filename in self.build_filenames():
-            path = self.output_path.joinpath(filename)
-            path.touch()
-
-            LOGGER.debug("Wrote '%s'", path)
+        """Finish writing sequence data and write the run reports"""
+        manifest = pyminknow.manifest.Manifest(self.output_path)
+        if self.output:
+            self.output.close()
+            for file in self.output.written:
+                manifest.add_file(file)
+
+        self.output_path.mkdir(parents=True, exist_ok=True)
+
+        # Create data files, sharing identical content with other runs
+        with self.usage.cpu():
+            for filename in self.build_filenames():
+                path = self.output_path.joinpath(filename)
+                content = io.StringIO(newline='')
+
+                if self.channels and filename.startswith('mux_scan_data_'):
+                    self.channels.write_mux_scan(content)
+                elif self.statistics and filename.startswith('duty_time_'):
+                    self.statistics.write_duty_time(content)
+                elif self.statistics and filename.startswith('throughput_'):
+                    self.statistics.write_throughput(content)
+
+                data = content.getvalue().encode()
+                self.usage.add(bytes_written=len(data), files_created=1)
+                if pyminknow.config.CONTENT_STORE:
+                    with pyminknow.store.STORE.lock():
+                        digest = pyminknow.store.STORE.put(data)
+                        pyminknow.store.STORE.materialise(digest, path, data=data)
+                else:
+                    digest = hashlib.sha256(data).hexdigest()
+                    path.write_bytes(data)
+
+                manifest.add(path, len(data), digest)
+                LOGGER.debug("Wrote '%s'", path)
+
+        self.manifest_digest = manifest.write(self.output_path.joinpath(self.manifest_filename), usage=self.usage,
+                                              run_id=self.run_id, run_code=self.run_code,
+                                              acquisition_run_id=self.acquisition_run_id)
 
     @property
     def acq_id_short(self) -> str:
@@ -174,30 +279,160 @@ class Run:
         self._state = state
         LOGGER.debug('Run %s changed state to %s', self.run_id, self.state)
 
+    @classmethod
+    def current(cls, device: dict):
+        """The most recently started run on this device (if any) since the server started"""
+        return cls._current.get(device['name'])
+
     def start(self):
-        self.start_time = datetime.datetime.utcnow()
+        self.start_time = pyminknow.clock.now()
         self.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_RUNNING
+        self.statistics = pyminknow.stats.RunStatistics(pyminknow.throughput.Throughput.for_device(self.device))
+        self.channels = pyminknow.channels.ChannelStates.for_device(self.device)
+        self.usage = pyminknow.accounting.ACCOUNTS.run(self.device['name'])
+        self.output = pyminknow.output.OutputWriter(self.output_path, run_code=self.run_code, run_id=self.run_id,
+                                                    options=self.options, throughput=self.statistics.throughput,
+                                                    summary_filename=self.summary_filename,
+                                                    position=self.device['name'], usage=self.usage)
+        self.basecaller = pyminknow.basecaller.Basecaller(self.statistics.throughput, write=self.output.write,
+                                                          rate=self.options.basecall_rate,
+                                                          min_qscore=self.options.min_qscore, name=self.device['name'],
+                                                          usage=self.usage, record=self.statistics.add_reads)
+        self._current[self.device['name']] = self
         self.serialise()
-        self.run()
-        self.stop()
+        try:
+            try:
+                self.run()
+            finally:
+                self.stopped.set()
+            self.stop()
+        except Exception:
+            self.fail()
+            raise
+        finally:
+            self.release()
+            self.finished.set()
+
+    def cancel(self, data_action: int = DataAction.STOP_DEFAULT):
+        """
+        Ask the run to stop after the current batch of reads
+
+        :param data_action: Whether to finish processing acquired data before the run is complete
+        """
+        LOGGER.info("Stopping run %s (%s)", self.run_id, DataAction.Name(data_action))
+        self.data_action = data_action
+        self.cancelled.set()
+
+        # Only basecall the backlog if asked to finish processing
+        if self.basecaller and data_action != DataAction.STOP_FINISH_PROCESSING:
+            self.basecaller.flush()
 
     def run(self):
+        """Generate reads in batches until the run duration (simulated time) has passed or the run is cancelled"""
         LOGGER.debug("Starting run ID: '%s'", self.run_id)
-        time.sleep(pyminknow.config.RUN_DURATION)
+        duration = self.options.duration
+        generator = pyminknow.reads.ReadGenerator(self.statistics.throughput,
+                                                  barcode_weights=self.options.barcode_weights())
+        previous = 0.
+
+        while True:
+            # Batches are produced at the same real rate whatever the clock speed. If writing falls behind (e.g. the
+            # disk bandwidth budget is used up) catch up one batch at a time rather than generating a huge batch.
+            batch = pyminknow.config.DATA_BATCH_INTERVAL * pyminknow.clock.CLOCK.speed
+            target = min(previous + batch, duration)
+            cancelled = pyminknow.clock.wait(self.cancelled, target - self.elapsed)
+
+            elapsed = min(self.elapsed, target)
+            with self.usage.cpu():
+                self.channels.advance(elapsed - previous)
+                reads = self.basecaller.classify(generator.generate_until(elapsed))
+                self.statistics.add_states(elapsed, self.channels.counts())
+            self.basecaller.submit(reads, elapsed)
+            previous = self.acquired_elapsed = elapsed
+
+            if cancelled or elapsed >= duration:
+                break
 
     def stop(self):
+        # Reads still waiting to be basecalled
+        if self.basecaller:
+            if self.cancelled.is_set() and self.data_action != DataAction.STOP_FINISH_PROCESSING:
+                self.basecaller.flush()
+            self.basecaller.close()
         self.save_data()
         self.finish()
         self.serialise()
+        self.cache_info()
+
+    def fail(self):
+        """Record that the run ended because of an error"""
+        self.end_time = pyminknow.clock.now()
+        self.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_FINISHED_WITH_ERROR
+        self.serialise()
+
+    def release(self):
+        """Stop the basecaller threads and close the output files, even if the run failed"""
+        if self.basecaller:
+            self.basecaller.flush()
+            try:
+                self.basecaller.close()
+            except Exception:
+                LOGGER.exception("Failed to basecall the reads of run %s", self.run_id)
+        if self.output:
+            try:
+                self.output.close()
+            except Exception:
+                LOGGER.exception("Failed to close the output of run %s", self.run_id)
+
+    def cache_info(self) -> bytes:
+        """Keep the serialised run info of a finished run"""
+        data = pyminknow.interceptors.serialise(self.info)
+        if self.is_finished:
+            pyminknow.runcache.CACHE.put((self.device['name'], self.run_id), data)
+        return data
 
     def finish(self):
-        self.end_time = datetime.datetime.utcnow()
-        self.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_COMPLETED
+        # Writing output may fall behind a fast clock, but the experiment lasts as long as the protocol says
+        end_time = self._start_time + datetime.timedelta(seconds=self.options.duration)
+        self.end_time = min(pyminknow.clock.now(), end_time)
+        if self.cancelled.is_set():
+            self.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_STOPPED_BY_USER
+        else:
+            self.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_COMPLETED
+
+        # Consumers can take the output once this is written
+        pyminknow.manifest.write_marker(
+            self.output_path.joinpath(self.marker_filename), usage=self.usage, run_id=self.run_id,
+            state=minknow_api.protocol_pb2.ProtocolState.Name(self.state), end_time=self._end_time.isoformat(),
+            manifest=self.manifest_filename, **{pyminknow.manifest.ALGORITHM: self.manifest_digest})
+
+    @property
+    def options(self) -> pyminknow.options.RunOptions:
+        """Outputs, barcodes and experiment time from the protocol and its arguments"""
+        if self._options is None:
+            self._options = pyminknow.options.RunOptions.from_protocol(self.protocol_id, self.args)
+        return self._options
+
+    @property
+    def elapsed(self) -> float:
+        """Duration of the run so far (simulated seconds)"""
+        if not self._start_time:
+            return 0.
+        return ((self._end_time or pyminknow.clock.now()) - self._start_time).total_seconds()
 
     @property
     def is_complete(self) -> bool:
         return self.state == minknow_api.protocol_pb2.ProtocolState.PROTOCOL_COMPLETED
 
+    @property
+    def is_finished(self) -> bool:
+        """The run has ended, whether or not it was successful"""
+        return self.state not in {
+            minknow_api.protocol_pb2.ProtocolState.PROTOCOL_RUNNING,
+            minknow_api.protocol_pb2.ProtocolState.PROTOCOL_WAITING_FOR_TEMPERATURE,
+            minknow_api.protocol_pb2.ProtocolState.PROTOCOL_WAITING_FOR_ACQUISITION,
+        }
+
     @property
     def protocol_group_id(self) -> str:
         return self.user_info.protocol_group_id.value
@@ -272,7 +507,9 @@ class Run:
 
     @property
     def end_time(self):
-        return build_timestamp(self._end_time)
+        # Not set until the run has ended
+        if self._end_time is not None:
+            return build_timestamp(self._end_time)
 
     @end_time.setter
     def end_time(self, value) -> google.protobuf.timestamp_pb2.Timestamp:
@@ -284,9 +521,10 @@ class Run:
             run_id=self.run_id,
             protocol_id=self.protocol_id,
             args=self.args,
-            output_path=str(self.output_path),
+            # Queued runs haven't started
+            output_path=str(self.output_path) if self._start_time else '',
             state=self.state,
-            start_time=self.start_time,
+            start_time=self.start_time if self._start_time else None,
             end_time=self.end_time,
             user_info=self.user_info,
             acquisition_run_ids=self.acquisition_run_ids,
@@ -295,10 +533,10 @@ class Run:
                 flow_cell_id=self.flow_cell_id,
                 asic_id_str="2004156",
                 asic_version="IA02C",
-                channel_count=512,
+                channel_count=self.flow_cell.get('channel_count', pyminknow.config.THROUGHPUT['channel_count']),
                 user_specified_flow_cell_id=self.flow_cell_id,
                 user_specified_product_code="FLO-MIN106",
-                wells_per_channel=4,
+                wells_per_channel=self.flow_cell.get('wells_per_channel', pyminknow.config.WELLS_PER_CHANNEL),
             )
         )
 
@@ -324,6 +562,10 @@ class Run:
     def get_run_ids(cls, device: dict):
         """Chronological order (by start time ascending)"""
         directory = cls.build_serialisation_dir(device=device)
+
+        # Archived runs are older than any remaining run files
+        yield from pyminknow.archive.RunArchive(directory).run_ids
+
         paths = pathlib.Path(directory).glob('*.{}'.format(cls.SERIALISATION_EXT))
         yield from (
             # Remove file extension
@@ -332,9 +574,49 @@ class Run:
             sorted(paths, key=lambda _path: _path.stat().st_ctime)
         )
 
+    @classmethod
+    def recover(cls, device: dict, before: float) -> int:
+        """
+        End the runs that were queued or running when the server last stopped
+
+        Queued runs end as stopped by the user (as they do when the server stops cleanly) and runs that were
+        interrupted end with an error.
+
+        :param before: Only check runs saved before this time (seconds since the epoch), so runs started since the
+                       server started are left alone
+        :returns: Number of runs ended
+        """
+        ProtocolState = minknow_api.protocol_pb2.ProtocolState
+        count = 0
+
+        # Archived runs are finished
+        for path in pathlib.Path(cls.build_serialisation_dir(device)).glob('*.{}'.format(cls.SERIALISATION_EXT)):
+            try:
+                if path.stat().st_mtime >= before:
+                    continue
+                run = cls(run_id=path.stem, device=device)
+                run.deserialise()
+            except FileNotFoundError:
+                continue
+
+            if run.is_finished:
+                continue
+
+            if run.state == ProtocolState.PROTOCOL_WAITING_FOR_ACQUISITION:
+                run.state = ProtocolState.PROTOCOL_STOPPED_BY_USER
+            else:
+                run.state = ProtocolState.PROTOCOL_FINISHED_WITH_ERROR
+            run.serialise()
+            count += 1
+
+        if count:
+            LOGGER.info("Ended %s runs on %s left over from the last time the server ran", count, device['name'])
+        return count
+
     @classmethod
     def latest_run_id(cls, device: dict) -> str:
-        return next(cls.get_run_ids(device))
+        run_ids = collections.deque(cls.get_run_ids(device), maxlen=1)
+        return run_ids[0] if run_ids else None
 
 
 class ProtocolService(minknow_api.protocol_pb2_grpc.ProtocolServiceServicer):
@@ -406,17 +688,25 @@ class ProtocolService(minknow_api.protocol_pb2_grpc.ProtocolServiceServicer):
         ]
 
     def _start_protocol(self, identifier, user_info, args):
-        """Emulate a real process running"""
+        """Queue the run to start when this position is free"""
         LOGGER.info("Starting protocol %s (Args: %s)", identifier, args)
 
         run = Run(protocol_id=identifier, user_info=user_info, args=args, device=self.device.copy())
-        run.start()
+        # Check the arguments before the run is saved
+        options = run.options
+        run.state = minknow_api.protocol_pb2.ProtocolState.PROTOCOL_WAITING_FOR_ACQUISITION
+        run.serialise()
+        pyminknow.scheduler.SCHEDULER.submit(run, priority=options.priority)
 
         return run.run_id
 
     def start_protocol(self, request, context):
 
-        run_id = self._start_protocol(identifier=request.identifier, user_info=request.user_info, args=request.args)
+        try:
+            run_id = self._start_protocol(identifier=request.identifier, user_info=request.user_info,
+                                          args=request.args)
+        except ValueError as error:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Invalid protocol arguments: {}'.format(error))
 
         return minknow_api.protocol_pb2.StartProtocolResponse(run_id=run_id)
 
@@ -424,11 +714,24 @@ class ProtocolService(minknow_api.protocol_pb2_grpc.ProtocolServiceServicer):
         """
         Stops the currently running protocol script instance.
 
+        With STOP_FINISH_PROCESSING, wait until the acquired data has been written. Otherwise return as soon as
+        acquisition has stopped.
+
         https://github.com/nanoporetech/minknow_lims_interface/blob/master/minknow/rpc/protocol.proto#L17
         """
+        run = pyminknow.scheduler.SCHEDULER.running(self.device) or Run.current(self.device)
+        if run is None or run.is_finished:
+            # A run waiting for this position or for a host-wide slot
+            if pyminknow.scheduler.SCHEDULER.cancel_queued(self.device) is None:
+                context.abort(grpc.StatusCode.FAILED_PRECONDITION, 'No protocol is running')
+            return minknow_api.protocol_pb2.StopProtocolResponse()
+
+        run.cancel(request.data_action_on_stop)
 
-        run = Run(Run.latest_run_id)
-        run.stop()
+        if request.data_action_on_stop == DataAction.STOP_FINISH_PROCESSING:
+            run.finished.wait(pyminknow.config.STOP_TIMEOUT)
+        else:
+            run.stopped.wait(pyminknow.config.STOP_TIMEOUT)
 
         return minknow_api.protocol_pb2.StopProtocolResponse()
 
@@ -441,27 +744,39 @@ class ProtocolService(minknow_api.protocol_pb2_grpc.ProtocolServiceServicer):
     def run_ids(self) -> list:
         return list(Run.get_run_ids(device=self.device))
 
-    def get_run_info(self, request, context) -> minknow_api.protocol_pb2.ProtocolRunInfo:
-        run_id = request.run_id
-
+    def get_run_info(self, request, context) -> bytes:
+        """Run information, already serialised"""
         # If no run ID is provided, information about the most recently started protocol run is provided
-        run = Run(run_id=run_id or self.latest_run_id, device=self.device)
-        run.deserialise()
+        run_id = request.run_id or self.latest_run_id
+
+        data = pyminknow.runcache.CACHE.get((self.device['name'], run_id))
+        if data is not None:
+            return data
+
+        run = Run(run_id=run_id, device=self.device)
+        try:
+            run.deserialise()
+        except FileNotFoundError:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'Unknown protocol run')
 
-        return run.info
+        return run.cache_info()
 
     def list_protocol_runs(self, request, context):
         """List previously started protocol run ids (including any current protocol), in order of starting."""
         return minknow_api.protocol_pb2.ListProtocolRunsResponse(run_ids=self.run_ids)
 
     def wait_for_finished(self, request, context) -> minknow_api.protocol_pb2.ProtocolRunInfo:
-
-        run = Run(run_id=request.run_id, device=self.device)
-        run.deserialise()
+        """Wait for a run to finish, or until the timeout (simulated seconds) has passed"""
+        deadline = pyminknow.clock.monotonic() + request.timeout if request.timeout else None
 
         while True:
+            run = Run(run_id=request.run_id, device=self.device)
+            run.deserialise()
+
+            if run.is_finished or not context.is_active():
+                return run.info
 
-            if run.is_complete:
+            if deadline is not None and pyminknow.clock.monotonic() >= deadline:
                 return run.info
 
-            time.sleep(1)
+            time.sleep(pyminknow.config.WATCH_INTERVAL)
@@ -0,0 +1,132 @@
+import logging
+import time
+
+import grpc
+
+import minknow_api.acquisition_pb2
+import minknow_api.statistics_pb2
+import minknow_api.statistics_pb2_grpc
+
+import pyminknow.config
+from pyminknow.service.protocol import Run
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StatisticsService(minknow_api.statistics_pb2_grpc.StatisticsServiceServicer):
+    """
+    Statistics service
+
+    Reports the incrementally maintained statistics of the device's current run. The data selection options in
+    requests are ignored; the whole run is reported in fixed time buckets.
+
+    https://github.com/nanoporetech/minknow_lims_interface/blob/master/minknow/rpc/statistics.proto
+    """
+    add_to_server = minknow_api.statistics_pb2_grpc.add_StatisticsServiceServicer_to_server
+
+    def __init__(self, *args, device: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.device = device
+
+    def find_run(self, acquisition_run_id: str, context) -> Run:
+        """Get the current run, which must include the specified acquisition"""
+        run = Run.current(device=self.device)
+
+        if run is None or run.statistics is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, 'No acquisition has run')
+
+        if acquisition_run_id and acquisition_run_id not in run.acquisition_run_ids:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'Statistics are only available for the current acquisition')
+
+        return run
+
+    @staticmethod
+    def watch(run: Run, build, poll_time: float = None) -> iter:
+        """Send updates until the run finishes"""
+        while True:
+            finished = run.is_finished
+            yield build()
+
+            if finished:
+                break
+
+            time.sleep(poll_time or pyminknow.config.WATCH_INTERVAL)
+
+    def get_read_length_types(self, request, context) -> minknow_api.statistics_pb2.GetReadLengthTypesResponse:
+        ReadLengthType = minknow_api.statistics_pb2.ReadLengthType
+        return minknow_api.statistics_pb2.GetReadLengthTypesResponse(
+            available_types=[ReadLengthType.Value('EstimatedBases'), ReadLengthType.Value('BasecalledBases')])
+
+    def stream_read_length_histogram(self, request, context) -> iter:
+        run = self.find_run(request.acquisition_run_id, context)
+        statistics = run.statistics
+        Response = minknow_api.statistics_pb2.StreamReadLengthHistogramResponse
+        read_lengths = request.bucket_value_type == minknow_api.statistics_pb2.BucketValueType.Value('ReadLengths')
+
+        def build():
+            edges, values, n50 = statistics.read_length_histogram(read_lengths=read_lengths)
+            return Response(
+                read_length_type=request.read_length_type,
+                bucket_value_type=request.bucket_value_type,
+                bucket_ranges=[Response.BucketRange(start=start, end=end) for start, end in zip(edges, edges[1:])],
+                source_data_end=statistics.throughput.samples_per_channel(statistics.processed_elapsed),
+                histogram_data=[Response.ReadLengthHistogramData(bucket_values=values.tolist(), n50=n50)],
+            )
+
+        yield from self.watch(run, build, request.poll_time_seconds)
+
+    def stream_duty_time(self, request, context) -> iter:
+        run = self.find_run(request.acquisition_run_id, context)
+        statistics = run.statistics
+        Response = minknow_api.statistics_pb2.StreamDutyTimeResponse
+
+        def build():
+            duty_time = statistics.duty_time()
+            return Response(
+                bucket_ranges=[Response.BucketRange(**dict(zip(('start', 'end'), statistics.bucket_range(i))))
+                               for i in range(statistics.bucket_count)],
+                channel_states={state: Response.ChannelStateData(state_times=samples.tolist())
+                                for state, samples in duty_time.items()},
+            )
+
+        yield from self.watch(run, build)
+
+    def stream_acquisition_output(self, request, context) -> iter:
+        run = self.find_run(request.acquisition_run_id, context)
+        statistics = run.statistics
+
+        def build():
+            buckets = list()
+            for index, row in enumerate(statistics.cumulative()):
+                read_count, pass_read_count, fail_read_count, pass_bases, fail_bases = row.tolist()
+                buckets.append(minknow_api.statistics_pb2.AcquisitionOutputBucket(
+                    bucket=statistics.bucket_range(index)[1],
+                    yield_summary=minknow_api.acquisition_pb2.AcquisitionYieldSummary(
+                        read_count=read_count,
+                        basecalled_pass_read_count=pass_read_count,
+                        basecalled_fail_read_count=fail_read_count,
+                        basecalled_pass_bases=pass_bases,
+                        basecalled_fail_bases=fail_bases,
+                    ),
+                ))
+
+            return minknow_api.statistics_pb2.StreamAcquisitionOutputResponse(
+                buckets=[minknow_api.statistics_pb2.StreamAcquisitionOutputResponse.FilteredBuckets(
+                    buckets=buckets)])
+
+        yield from self.watch(run, build)
+
+    def stream_basecall_boxplots(self, request, context) -> iter:
+        if request.data_type != minknow_api.statistics_pb2.StreamBoxplotRequest.BoxplotType.Value('QSCORE'):
+            context.abort(grpc.StatusCode.UNIMPLEMENTED, 'Only q-score boxplots are available')
+
+        run = self.find_run(request.acquisition_run_id, context)
+        statistics = run.statistics
+        Response = minknow_api.statistics_pb2.BoxplotResponse
+
+        def build():
+            minimum, q25, q50, q75, maximum = statistics.qscore_quantiles()
+            return Response(datasets=[Response.BoxplotDataset(
+                min=minimum, q25=q25, q50=q50, q75=q75, max=maximum, count=statistics.totals['read_count'])])
+
+        yield from self.watch(run, build, request.poll_time)
@@ -0,0 +1,413 @@
+"""
+Multi-process device sharding
+
+The configured devices are split between worker processes (shards), each serving its own device ports, so that data
+generation and request handling for different devices don't compete for one interpreter lock. The parent process
+serves the manager and asks each shard for the state of its positions over a pipe. Shards that exit are restarted.
+
+To compare request throughput with single-process mode, run:
+
+    python -m pyminknow.shard --shards 4
+"""
+
+import argparse
+import itertools
+import logging
+import multiprocessing
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import grpc
+
+import minknow_api.acquisition_pb2
+import minknow_api.acquisition_pb2_grpc
+import minknow_api.device_pb2
+import minknow_api.device_pb2_grpc
+
+import pyminknow.accounting
+import pyminknow.bandwidth
+import pyminknow.clock
+import pyminknow.config
+import pyminknow.jsonlog
+import pyminknow.retention
+import pyminknow.scheduler
+import pyminknow.server
+import pyminknow.service.manager
+
+LOGGER = logging.getLogger(__name__)
+
+# Use fresh interpreters because gRPC doesn't support forking after it has started
+CONTEXT = multiprocessing.get_context('spawn')
+
+# IPC messages (requests are sent as (sequence number, message) and answered with (sequence number, reply))
+STATUS = 'status'
+USAGE = 'usage'
+STOP = 'stop'
+
+
+def serve_shard(index: int, devices: tuple, middleware: dict, connection, verbose: bool = False,
+                clock: pyminknow.clock.Clock = None, log_format: str = None, max_runs: int = None,
+                disk_mb: float = None, retention: pyminknow.retention.RetentionPolicy = None):
+    """Shard process: serve some devices and answer status requests from the parent"""
+    listener = pyminknow.jsonlog.configure(verbose=verbose, log_format=log_format)
+
+    # Share the parent's simulated time
+    if clock is not None:
+        pyminknow.clock.CLOCK = clock
+
+    # This shard's part of the host-wide limit on active runs
+    pyminknow.scheduler.SCHEDULER.max_active = max_runs
+    pyminknow.bandwidth.GOVERNOR.rate_mb = disk_mb
+
+    # Shards are daemon processes, which can't start record builders of their own; each shard builds its records
+    pyminknow.config.GENERATION_WORKERS = 0
+
+    # Each shard records and traces to its own files
+    middleware = dict(middleware)
+    if middleware.get('record'):
+        middleware['record'] = '{}.{}'.format(middleware['record'], index)
+    if middleware.get('trace'):
+        middleware['trace'] = '{}.{}'.format(middleware['trace'], index)
+
+    # Each shard expires its own devices' runs, so it can drop them from its run info cache
+    server = pyminknow.server.Server(devices=devices, manager=False, retention=retention,
+                                     **pyminknow.server.build_middleware(**middleware))
+    server.start()
+
+    try:
+        while True:
+            sequence, message = connection.recv()
+
+            if message == STATUS:
+                connection.send((sequence, {device['name']: ('STATE_RUNNING', '') for device in devices}))
+            elif message == USAGE:
+                connection.send((sequence, pyminknow.accounting.ACCOUNTS.stats()))
+            elif message == STOP:
+                break
+
+    # The parent has gone away or we were interrupted along with it
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+    finally:
+        server.stop(grace=pyminknow.config.GRACE)
+        listener.stop()
+
+
+class Shard:
+    """A worker process serving some of the devices"""
+
+    def __init__(self, index: int, devices: tuple, middleware: dict = None, verbose: bool = False,
+                 log_format: str = None, max_runs: int = None, disk_mb: float = None,
+                 retention: pyminknow.retention.RetentionPolicy = None):
+        self.index = index
+        self.devices = tuple(devices)
+        self.middleware = middleware or dict()
+        self.verbose = verbose
+        self.log_format = log_format
+        self.max_runs = max_runs
+        self.disk_mb = disk_mb
+        self.retention = retention
+        self.process = None
+        self.connection = None
+        self.restarts = 0
+        self._lock = threading.Lock()
+
+        # Numbers requests so that a late reply isn't taken for the answer to a later request
+        self._sequence = itertools.count()
+
+    def start(self):
+        with self._lock:
+            self.connection, child_connection = CONTEXT.Pipe()
+            self.process = CONTEXT.Process(
+                target=serve_shard,
+                args=(self.index, self.devices, self.middleware, child_connection, self.verbose,
+                      pyminknow.clock.CLOCK, self.log_format, self.max_runs, self.disk_mb, self.retention),
+                name='shard-{}'.format(self.index),
+                daemon=True,
+            )
+            self.process.start()
+            child_connection.close()
+
+        LOGGER.info("Started shard %s (PID %s) for devices %s", self.index, self.process.pid,
+                    ', '.join(device['name'] for device in self.devices))
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def request(self, message: str, timeout: float = None):
+        """
+        Ask the shard process something
+
+        :returns: Reply (None if the shard isn't running or doesn't answer in time)
+        """
+        deadline = time.monotonic() + (timeout or pyminknow.config.SHARD_STATUS_TIMEOUT)
+
+        with self._lock:
+            if not self.is_alive:
+                return None
+
+            sequence = next(self._sequence)
+            try:
+                self.connection.send((sequence, message))
+                # Skip late replies to earlier requests
+                while self.connection.poll(max(deadline - time.monotonic(), 0)):
+                    reply_to, reply = self.connection.recv()
+                    if reply_to == sequence:
+                        return reply
+            except (EOFError, OSError):
+                pass
+
+        return None
+
+    def status(self, timeout: float = None) -> dict:
+        """Get the state of each position in this shard"""
+        if not self.is_alive:
+            return {device['name']: ('STATE_INITIALISING', 'Restarting') for device in self.devices}
+
+        status = self.request(STATUS, timeout=timeout)
+        if status is None:
+            return {device['name']: ('STATE_SOFTWARE_ERROR', 'Not responding') for device in self.devices}
+        return status
+
+    def usage(self, timeout: float = None) -> dict:
+        """Resources used by the host process and each position in this shard (None if it doesn't answer)"""
+        return self.request(USAGE, timeout=timeout)
+
+    def stop(self, timeout: float = None):
+        with self._lock:
+            if self.is_alive:
+                try:
+                    self.connection.send((next(self._sequence), STOP))
+                except OSError:
+                    pass
+                self.process.join(timeout)
+
+                if self.process.is_alive():
+                    self.process.terminate()
+
+
+def share_out(total: int, weights: list) -> list:
+    """Split a whole number in proportion to weights so that the parts add up to it (largest remainder first)"""
+    quotas = [total * weight / sum(weights) for weight in weights]
+    parts = [int(quota) for quota in quotas]
+    for index in sorted(range(len(quotas)), key=lambda i: parts[i] - quotas[i])[:total - sum(parts)]:
+        parts[index] += 1
+    return parts
+
+
+class ShardPool:
+    """Worker processes, restarted if they exit"""
+
+    def __init__(self, shards: int, devices: tuple = None, middleware: dict = None, verbose: bool = False,
+                 log_format: str = None, max_runs: int = None, disk_mb: float = None,
+                 retention: pyminknow.retention.RetentionPolicy = None):
+        """
+        :param max_runs: Host-wide limit on active runs, shared between shards in proportion to their devices (each
+                         shard needs at least one)
+        :param disk_mb: Host-wide disk write budget (MB/s), shared in proportion to their devices
+        :param retention: Run history retention policy, enforced by each shard for its devices
+        """
+        devices = tuple(pyminknow.config.DEVICES if devices is None else devices)
+        shards = max(min(shards, len(devices)), 1)
+
+        # Deal devices out in turn
+        partition = [devices[index::shards] for index in range(shards)]
+
+        # Every shard can run something, and the shards' limits add up to the host's
+        shard_runs = [None] * shards
+        if max_runs:
+            if max_runs < shards:
+                raise ValueError("A limit of {} active runs can't be shared between {} shards".format(max_runs, shards))
+            extra = share_out(max_runs - shards, [len(shard_devices) for shard_devices in partition])
+            shard_runs = [1 + runs for runs in extra]
+
+        self.shards = list()
+        for index, shard_devices in enumerate(partition):
+            share = len(shard_devices) / len(devices)
+            self.shards.append(Shard(index, shard_devices, middleware=middleware, verbose=verbose,
+                                     log_format=log_format, max_runs=shard_runs[index],
+                                     disk_mb=disk_mb * share if disk_mb else None, retention=retention))
+        self._stopped = threading.Event()
+        self._supervisor = threading.Thread(target=self.supervise, name='shard-supervisor', daemon=True)
+
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+        self._supervisor.start()
+
+    def supervise(self):
+        """Restart crashed shards"""
+        while not self._stopped.wait(pyminknow.config.SHARD_CHECK_INTERVAL):
+            for shard in self.shards:
+                if not shard.is_alive and not self._stopped.is_set():
+                    LOGGER.warning("Shard %s exited with code %s; restarting", shard.index, shard.process.exitcode)
+                    shard.restarts += 1
+                    shard.start()
+
+    def status(self) -> dict:
+        """State of every position across all shards"""
+        status = dict()
+        for shard in self.shards:
+            status.update(shard.status())
+        return status
+
+    def usage(self) -> dict:
+        """Resources used by every shard and each of their positions"""
+        stats = [usage for usage in (shard.usage() for shard in self.shards) if usage]
+        positions = dict()
+        for usage in stats:
+            positions.update(usage['positions'])
+        return dict(host=pyminknow.accounting.total(usage['host'] for usage in stats), positions=positions)
+
+    def stop(self, timeout: float = None):
+        self._stopped.set()
+        for shard in self.shards:
+            shard.stop(timeout=timeout)
+
+
+class ShardedServer(pyminknow.server.Server):
+    """Serve the manager in this process and devices in worker processes"""
+
+    def __init__(self, shards: int, port: int = None, middleware: dict = None, verbose: bool = False,
+                 log_format: str = None, max_runs: int = None, disk_mb: float = None,
+                 retention: pyminknow.retention.RetentionPolicy = None, **kwargs):
+        """
+        :param shards: Number of worker processes
+        :param port: Manager port
+        :param middleware: Command-line options for fault injection, recording and replay
+        :param verbose: Debug logging in worker processes
+        :param log_format: Log output format in worker processes
+        :param max_runs: Host-wide limit on active runs
+        :param disk_mb: Host-wide disk write budget (MB/s)
+        :param retention: Run history retention policy (enforced in the worker processes)
+        """
+        middleware = middleware or dict()
+        self.pool = ShardPool(shards, middleware=middleware, verbose=verbose, log_format=log_format,
+                              max_runs=max_runs, disk_mb=disk_mb, retention=retention)
+
+        super().__init__(port=port, devices=(), manager=True, **pyminknow.server.build_middleware(**middleware),
+                         **kwargs)
+
+    def build_manager_service(self) -> pyminknow.service.manager.ManagerService:
+        return pyminknow.service.manager.ManagerService(status=self.pool.status)
+
+    def resource_usage(self) -> dict:
+        return self.pool.usage()
+
+    def start(self):
+        self.pool.start()
+        super().start()
+
+    def stop(self, grace: float):
+        super().stop(grace=grace)
+        self.pool.stop(timeout=grace)
+
+
+def load(host: str, duration: float, results: list):
+    """Send requests to every device in turn for a while, recording the latency of each"""
+    stubs = list()
+    for device in pyminknow.config.DEVICES:
+        channel = grpc.insecure_channel('{}:{}'.format(host, device['ports']['insecure']))
+        stubs.append((minknow_api.device_pb2_grpc.DeviceServiceStub(channel),
+                      minknow_api.acquisition_pb2_grpc.AcquisitionServiceStub(channel)))
+
+    end = time.monotonic() + duration
+    i = 0
+    while time.monotonic() < end:
+        device_stub, acquisition_stub = stubs[i % len(stubs)]
+        start = time.monotonic()
+        device_stub.get_flow_cell_info(minknow_api.device_pb2.GetFlowCellInfoRequest())
+        acquisition_stub.get_progress(minknow_api.acquisition_pb2.GetProgressRequest())
+        results.append(time.monotonic() - start)
+        i += 1
+
+
+def benchmark(shards: int = None, duration: float = 10, clients: int = 8, host: str = 'localhost') -> dict:
+    """
+    Start a server in a subprocess and measure request throughput and latency while runs generate data
+
+    :param shards: Number of shards (None for single-process mode)
+    :returns: Requests per second, median and 99th percentile latency (seconds)
+    """
+    command = [sys.executable, '-m', 'pyminknow']
+    if shards:
+        command.extend(('--shards', str(shards)))
+
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        # Wait for the devices to be ready
+        for device in pyminknow.config.DEVICES:
+            channel = grpc.insecure_channel('{}:{}'.format(host, device['ports']['insecure']))
+            grpc.channel_ready_future(channel).result(timeout=30)
+
+        # Keep a run going on every position with a flow cell
+        stop = threading.Event()
+
+        def sequence(device: dict):
+            import pyminknow.client
+            with pyminknow.client.connect(host=host, port=device['ports']['insecure']) as channel:
+                client = pyminknow.client.ProtocolClient(channel)
+                while not stop.is_set():
+                    response = client.start_protocol(
+                        identifier=pyminknow.config.PROTOCOLS[0]['identifier'],
+                        user_info=dict(protocol_group_id='benchmark', sample_id='benchmark'))
+                    client.wait_for_finished(response.run_id)
+
+        runners = [threading.Thread(target=sequence, args=(device,), daemon=True)
+                   for device in pyminknow.config.DEVICES if device['flow_cell']]
+        for runner in runners:
+            runner.start()
+
+        # Measure latency from several client processes
+        with CONTEXT.Manager() as manager:
+            results = manager.list()
+            processes = [CONTEXT.Process(target=load, args=(host, duration, results)) for _ in range(clients)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            latencies = sorted(results)
+
+        stop.set()
+        for runner in runners:
+            runner.join()
+
+    finally:
+        server.terminate()
+        server.wait()
+
+    return dict(
+        requests_per_second=2 * len(latencies) / duration,
+        median_latency=statistics.median(latencies),
+        p99_latency=latencies[int(len(latencies) * 0.99)],
+    )
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Compare request throughput in single-process and sharded modes')
+
+    parser.add_argument('-s', '--shards', type=int, default=len(pyminknow.config.DEVICES), help='Number of shards')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Seconds to run each benchmark')
+    parser.add_argument('-c', '--clients', type=int, default=8, help='Client processes')
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    logging.basicConfig(level=logging.INFO)
+
+    for label, shards in (('single-process', None), ('{} shards'.format(args.shards), args.shards)):
+        result = benchmark(shards=shards, duration=args.duration, clients=args.clients)
+        print("{label}: {requests_per_second:.0f} requests/s, median latency {median_latency:.4f} s, "
+              "p99 latency {p99_latency:.4f} s".format(label=label, **result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Server startup timing
+
+Test fleets start and stop many servers, so the time from launching the process until its ports are listening is
+tracked: the report breaks it down into interpreter start-up, importing each group of modules, binding the ports and
+starting the servers, followed by what's loaded in the background afterwards (deferred modules, see pyminknow.lazy,
+and the record builders). A warning is logged when the server takes longer than config.STARTUP_BUDGET to listen.
+"""
+
+import importlib
+import logging
+import os
+import time
+
+import pyminknow.config
+import pyminknow.lazy
+
+LOGGER = logging.getLogger(__name__)
+
+
+def process_age() -> float:
+    """Seconds since this process started (0 if that isn't known)"""
+    try:
+        with open('/proc/self/stat') as file:
+            # The command name may contain spaces, so count fields from the end of it
+            start_ticks = int(file.read().rpartition(')')[2].split()[19])
+        return max(time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK'), 0.)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.
+
+
+def defer_imports():
+    """Register the modules the server doesn't need until it's listening (see config.DEFERRED_IMPORTS)"""
+    for name in pyminknow.config.DEFERRED_IMPORTS:
+        pyminknow.lazy.defer(name)
+    for name in pyminknow.config.DEFERRED_PACKAGE_INIT:
+        pyminknow.lazy.defer(name, submodules=True)
+
+
+class StartupReport:
+    """Time each stage of starting the server"""
+
+    def __init__(self, budget: float = None, show: bool = False):
+        """
+        :param budget: Seconds allowed from process start until the server is listening
+        :param show: Print the report once startup is complete
+        """
+        self.budget = pyminknow.config.STARTUP_BUDGET if budget is None else budget
+        self.show = show
+        self.phases = [('interpreter start-up', process_age())]
+        self.background = list()
+        self.listening = None
+        self._last = time.perf_counter()
+
+    def mark(self, name: str):
+        """Record a stage that has just finished"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def import_modules(self, *names: str):
+        """Import modules in turn, timing each (modules imported earlier in the list aren't counted again)"""
+        for name in names:
+            importlib.import_module(name)
+            self.mark('import {}'.format(name))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def ready(self):
+        """The server is listening"""
+        self.listening = self.total
+        if self.listening > self.budget:
+            LOGGER.warning("Server took %.3f s to start (budget %.3f s)", self.listening, self.budget)
+        else:
+            LOGGER.info("Server started in %.3f s", self.listening)
+
+    def loaded(self, name: str, seconds: float):
+        """Something loaded in the background after the server started listening"""
+        self.background.append((name, seconds))
+
+    def complete(self):
+        """Everything the server loads in the background has been loaded"""
+        if self.show:
+            print(self.format(), flush=True)
+
+    def format(self) -> str:
+        lines = ['{:<40} {:8.3f} s'.format(name, seconds) for name, seconds in self.phases]
+        lines.append('{:<40} {:8.3f} s (budget {:.3f} s)'.format('listening after', self.total, self.budget))
+        if self.background:
+            lines.append('loaded in the background:')
+            lines.extend('  {:<38} {:8.3f} s'.format(name, seconds) for name, seconds in self.background)
+        return '\n'.join(lines)
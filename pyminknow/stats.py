@@ -0,0 +1,208 @@
+"""
+Run statistics
+
+Fixed-bin histograms and per-time-bucket aggregates are updated incrementally, so queries never rescan the output
+data. Channel states are counted as data is acquired and reads once they've been basecalled. The duty time and
+throughput reports written to the output directory are produced from the same figures.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import threading
+
+import numpy
+
+import pyminknow.channels
+import pyminknow.config
+import pyminknow.reads
+import pyminknow.throughput
+
+# Counters kept for each time bucket
+COUNTERS = ('read_count', 'pass_read_count', 'fail_read_count', 'pass_bases', 'fail_bases')
+
+# Channel states reported in duty time
+STATES = pyminknow.channels.STATES
+
+
+def open_csv(file):
+    """Open a path for CSV output, or use a text file that's already open"""
+    if hasattr(file, 'write'):
+        return contextlib.nullcontext(file)
+    return open(file, 'w', newline='')
+
+
+class RunStatistics:
+    """Histograms and aggregates for one protocol run"""
+
+    def __init__(self, throughput: pyminknow.throughput.Throughput, bucket_seconds: float = None):
+        """
+        :param throughput: Flow cell sequencing model
+        :param bucket_seconds: Duration of each time bucket
+        """
+        self.throughput = throughput
+        self.bucket_seconds = bucket_seconds or pyminknow.config.STATISTICS_BUCKET_SECONDS
+        self._lock = threading.Lock()
+
+        # Read length histograms (the last bin collects everything longer)
+        self.length_bin_width = pyminknow.config.READ_LENGTH_BIN_WIDTH
+        bins = pyminknow.config.READ_LENGTH_BINS
+        self.length_counts = numpy.zeros(bins, dtype=numpy.int64)
+        self.length_bases = numpy.zeros(bins, dtype=numpy.int64)
+
+        # Mean q-score histogram, one bin per integer score
+        self.qscore_counts = numpy.zeros(pyminknow.config.QSCORE_MAX + 1, dtype=numpy.int64)
+
+        # Running totals
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+        # Time series: one row per bucket
+        self.buckets = numpy.zeros((0, len(COUNTERS)), dtype=numpy.int64)
+        self.state_samples = numpy.zeros((0, len(STATES)), dtype=numpy.int64)
+
+        # Acquisition time covered by the channel states, and by the reads counted so far
+        self.elapsed = 0.
+        self.processed_elapsed = 0.
+
+    def _bucket(self, elapsed: float) -> int:
+        """Get the time bucket index, adding buckets as required"""
+        index = int(elapsed // self.bucket_seconds)
+
+        if index >= len(self.buckets):
+            extra = index + 1 - len(self.buckets)
+            self.buckets = numpy.vstack((self.buckets, numpy.zeros((extra, len(COUNTERS)), dtype=numpy.int64)))
+            self.state_samples = numpy.vstack((self.state_samples, numpy.zeros((extra, len(STATES)),
+                                                                               dtype=numpy.int64)))
+
+        return index
+
+    def add(self, batch: pyminknow.reads.ReadBatch, elapsed: float, state_counts: numpy.ndarray):
+        """
+        Update the statistics with a batch of reads and the channel states while it was acquired
+
+        :param batch: Reads produced since the previous batch
+        :param elapsed: Acquisition time (seconds) at the end of this batch
+        :param state_counts: Number of channels in each state during this batch
+        """
+        self.add_states(elapsed, state_counts)
+        self.add_reads(batch, elapsed)
+
+    def add_states(self, elapsed: float, state_counts: numpy.ndarray):
+        """
+        Count the time spent in each channel state, as data is acquired
+
+        :param elapsed: Acquisition time (seconds) at the end of this batch
+        :param state_counts: Number of channels in each state since the previous call
+        """
+        with self._lock:
+            samples = (elapsed - self.elapsed) * self.throughput.sample_rate
+            bucket = self._bucket(elapsed)
+            self.state_samples[bucket] += (state_counts * samples).astype(numpy.int64)
+            self.elapsed = elapsed
+
+    def add_reads(self, batch: pyminknow.reads.ReadBatch, elapsed: float):
+        """
+        Count a batch of reads once it's been basecalled (batches may arrive out of order)
+
+        :param batch: Reads acquired in one batch
+        :param elapsed: Acquisition time (seconds) at the end of this batch
+        """
+        length_bins = numpy.minimum(batch.lengths // self.length_bin_width, len(self.length_counts) - 1)
+        pass_bases = int(batch.lengths[batch.passed].sum())
+        bases = int(batch.lengths.sum())
+        pass_read_count = int(batch.passed.sum())
+        read_count = len(batch.lengths)
+
+        counters = (read_count, pass_read_count, read_count - pass_read_count, pass_bases, bases - pass_bases)
+
+        with self._lock:
+            self.length_counts += numpy.bincount(length_bins, minlength=len(self.length_counts))
+            self.length_bases += numpy.bincount(length_bins, weights=batch.lengths,
+                                                minlength=len(self.length_bases)).astype(numpy.int64)
+            self.qscore_counts += numpy.bincount(batch.qscores.astype(numpy.int64),
+                                                 minlength=len(self.qscore_counts))
+
+            for key, value in zip(COUNTERS, counters):
+                self.totals[key] += value
+
+            bucket = self._bucket(elapsed)
+            self.buckets[bucket] += counters
+            self.processed_elapsed = max(self.processed_elapsed, elapsed)
+
+    @property
+    def bucket_count(self) -> int:
+        return len(self.buckets)
+
+    def bucket_range(self, index: int) -> tuple:
+        """Start and end of a bucket (seconds)"""
+        return int(index * self.bucket_seconds), int((index + 1) * self.bucket_seconds)
+
+    def cumulative(self) -> numpy.ndarray:
+        """Running totals at the end of each time bucket"""
+        with self._lock:
+            return self.buckets.cumsum(axis=0)
+
+    def duty_time(self) -> dict:
+        """Samples spent in each channel state, per time bucket"""
+        with self._lock:
+            return {state: self.state_samples[:, i].copy() for i, state in enumerate(STATES)}
+
+    def read_length_histogram(self, read_lengths: bool = False) -> tuple:
+        """
+        :param read_lengths: Sum of read lengths in each bin (rather than read counts)
+        :returns: Bin edges, values, N50
+        """
+        with self._lock:
+            values = (self.length_bases if read_lengths else self.length_counts).copy()
+            n50 = self.n50()
+
+        edges = numpy.arange(len(values) + 1) * self.length_bin_width
+        return edges, values, n50
+
+    def n50(self) -> float:
+        """Read length (bin midpoint) at which half of the bases are in reads at least that long"""
+        total = self.length_bases.sum()
+
+        if not total:
+            return 0.
+
+        cumulative = self.length_bases[::-1].cumsum()
+        index = len(self.length_bases) - 1 - int(numpy.searchsorted(cumulative, total / 2))
+        return (index + 0.5) * self.length_bin_width
+
+    def qscore_quantiles(self, quantiles=(0, 0.25, 0.5, 0.75, 1)) -> list:
+        """Estimate mean q-score quantiles from the histogram"""
+        with self._lock:
+            counts = self.qscore_counts.copy()
+
+        total = counts.sum()
+        if not total:
+            return [0.] * len(quantiles)
+
+        cumulative = counts.cumsum()
+        return [float(numpy.searchsorted(cumulative, max(q * total, 1))) for q in quantiles]
+
+    def write_throughput(self, path):
+        """Cumulative yield per time bucket (to a path or text file)"""
+        cumulative = self.cumulative()
+
+        with open_csv(path) as file:
+            writer = csv.writer(file)
+            writer.writerow(('Experiment Time (minutes)', 'Reads', 'Basecalled Reads Passed',
+                             'Basecalled Reads Failed', 'Basecalled Bases Passed', 'Basecalled Bases Failed'))
+            for index, row in enumerate(cumulative):
+                minutes = self.bucket_range(index)[1] / 60
+                writer.writerow((round(minutes, 2), *row))
+
+    def write_duty_time(self, path):
+        """Time spent in each channel state per time bucket (to a path or text file)"""
+        duty_time = self.duty_time()
+
+        with open_csv(path) as file:
+            writer = csv.writer(file)
+            writer.writerow(('Experiment Time (minutes)', 'Channel State', 'State Time (samples)'))
+            for index in range(len(next(iter(duty_time.values())))):
+                minutes = self.bucket_range(index)[0] / 60
+                for state, samples in duty_time.items():
+                    writer.writerow((round(minutes, 2), state, samples[index]))
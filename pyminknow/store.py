@@ -0,0 +1,208 @@
+"""
+Content-addressed file store
+
+Runs write many identical files: empty placeholders, reports and the channel tables of the same device. Each file's
+content is stored once under DATA_DIR/.store, named by its SHA-256 digest, and placed in a run's output tree as a hard
+link. Where a hard link can't be made (another file system or too many links) the blob is cloned (reflink), copied
+in the kernel with copy_file_range or, failing all of those, copied normally.
+
+Stored files are shared between runs, so they must be replaced rather than rewritten in place. Blobs that no run
+links to any more are removed by collect(). A stored blob has no links until it's placed, so storing and placing a
+file is done under a shared lock, which collect() takes exclusively. The lock is a file lock, as shard processes share
+the store.
+"""
+
+import contextlib
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import uuid
+
+import pyminknow.config
+
+LOGGER = logging.getLogger(__name__)
+
+STORE_DIR = '.store'
+LOCK_FILE = '.lock'
+
+# linux/fs.h: clone a file's extents (btrfs, xfs)
+FICLONE = 0x40049409
+
+
+class ContentStore:
+    """Files stored once by content and linked into run output directories"""
+
+    def __init__(self, root: pathlib.Path = None):
+        """
+        :param root: Store directory (default: in DATA_DIR)
+        """
+        self._root = root
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.stored = 0
+        self.reused = 0
+        self.bytes_saved = 0
+        self.methods = dict()
+
+    @property
+    def root(self) -> pathlib.Path:
+        return pathlib.Path(self._root or pathlib.Path(pyminknow.config.DATA_DIR).joinpath(STORE_DIR))
+
+    def blob_path(self, digest: str) -> pathlib.Path:
+        return self.root.joinpath(digest[:2], digest)
+
+    @contextlib.contextmanager
+    def lock(self, exclusive: bool = False):
+        """
+        Hold the store's lock (shared by threads and processes placing files, exclusive while collecting)
+
+        Call put() and materialise() inside the shared lock so that a blob isn't collected before it's placed.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root.joinpath(LOCK_FILE), 'a') as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def put(self, data: bytes) -> str:
+        """
+        Store some content, unless it's stored already
+
+        :returns: Digest
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+
+        if path.exists():
+            with self._lock:
+                self.reused += 1
+                self.bytes_saved += len(data)
+            return digest
+
+        # Write to a temporary name so a partial blob is never linked
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name('.{}.tmp'.format(uuid.uuid4()))
+        temp_path.write_bytes(data)
+        temp_path.chmod(0o444)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self.stored += 1
+        LOGGER.debug("Stored blob %s (%s bytes)", digest, len(data))
+
+        return digest
+
+    def materialise(self, digest: str, path: pathlib.Path, data: bytes = None) -> str:
+        """
+        Place a stored file at a path, replacing any file there
+
+        :param data: The file's content, to store again if the blob has been removed
+        :returns: Method used: link, reflink, copy_file_range or copy
+        """
+        source = self.blob_path(digest)
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Never write through an existing link into a blob
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.link(source, path)
+            method = 'link'
+        except FileNotFoundError:
+            if data is None:
+                raise
+            LOGGER.warning("Blob %s was removed before it was placed; storing it again", digest)
+            self.put(data)
+            return self.materialise(digest, path)
+        except OSError as error:
+            if error.errno not in {errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOTSUP}:
+                raise
+            method = copy(source, path)
+
+        with self._lock:
+            self.methods[method] = self.methods.get(method, 0) + 1
+
+        return method
+
+    def write(self, path: pathlib.Path, data: bytes) -> str:
+        """Write a file through the store"""
+        with self.lock():
+            return self.materialise(self.put(data), path, data=data)
+
+    def collect(self) -> int:
+        """
+        Remove blobs that are no longer linked from any run
+
+        :returns: Number of blobs removed
+        """
+        removed = 0
+
+        if not self.root.exists():
+            return 0
+
+        with self.lock(exclusive=True):
+            for directory in os.scandir(self.root):
+                if not directory.is_dir(follow_symlinks=False):
+                    continue
+                for entry in os.scandir(directory.path):
+                    # Blobs being written have temporary names
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.stat(follow_symlinks=False).st_nlink == 1:
+                        os.unlink(entry.path)
+                        removed += 1
+
+        if removed:
+            LOGGER.info("Removed %s unused blobs from '%s'", removed, self.root)
+
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(stored=self.stored, reused=self.reused, bytes_saved=self.bytes_saved, **self.methods)
+
+
+def copy(source: pathlib.Path, path: pathlib.Path) -> str:
+    """
+    Copy a file as cheaply as the file system allows
+
+    :returns: Method used: reflink, copy_file_range or copy
+    """
+    with open(source, 'rb') as source_file, open(path, 'wb') as file:
+        try:
+            fcntl.ioctl(file.fileno(), FICLONE, source_file.fileno())
+            return 'reflink'
+        except OSError:
+            pass
+
+        try:
+            size = os.fstat(source_file.fileno()).st_size
+            offset = 0
+            while offset < size:
+                copied = os.copy_file_range(source_file.fileno(), file.fileno(), size - offset)
+                if not copied:
+                    break
+                offset += copied
+            else:
+                return 'copy_file_range'
+        except (OSError, AttributeError):
+            pass
+
+        source_file.seek(0)
+        file.seek(0)
+        file.truncate()
+        shutil.copyfileobj(source_file, file)
+        return 'copy'
+
+
+# Shared by every position in this process
+STORE = ContentStore()
@@ -0,0 +1,55 @@
+import time
+import unittest
+
+import minknow_api.acquisition_pb2
+
+import pyminknow.client
+import pyminknow.config
+
+DEVICE = pyminknow.config.DEVICES[0]
+PORT = DEVICE['ports']['insecure']
+
+
+class TestAcquisitionService(unittest.TestCase):
+    """Test acquisition service"""
+
+    def setUp(self) -> None:
+        """Initialise server"""
+
+        self.channel = pyminknow.client.connect(port=PORT)
+        self.client = pyminknow.client.AcquisitionClient(self.channel)
+        self.protocol_client = pyminknow.client.ProtocolClient(self.channel)
+
+    def start_protocol(self) -> str:
+        response = self.protocol_client.start_protocol(
+            identifier=pyminknow.config.PROTOCOLS[0]['identifier'],
+            user_info=dict(protocol_group_id='test', sample_id='test_acquisition'),
+        )
+        time.sleep(0.5)
+        return response.run_id
+
+    def test_get_progress(self):
+        run_id = self.start_protocol()
+
+        progress = self.client.get_progress()
+        self.assertGreater(progress.raw_per_channel.acquired, 0)
+
+        info = self.client.get_acquisition_info()
+        self.assertEqual(info.state, minknow_api.acquisition_pb2.AcquisitionState.Value('ACQUISITION_RUNNING'))
+        self.assertGreater(info.yield_summary.read_count, 0)
+
+        self.protocol_client.wait_for_finished(run_id)
+
+        # Completed acquisition
+        info = self.client.get_acquisition_info(info.run_id)
+        self.assertEqual(info.state, minknow_api.acquisition_pb2.AcquisitionState.Value('ACQUISITION_COMPLETED'))
+
+    def test_watch_current_acquisition_run(self):
+        run_id = self.start_protocol()
+
+        updates = list(self.client.watch_current_acquisition_run())
+        self.assertEqual(updates[-1].state,
+                         minknow_api.acquisition_pb2.AcquisitionState.Value('ACQUISITION_COMPLETED'))
+        self.assertGreaterEqual(updates[-1].yield_summary.read_count, updates[0].yield_summary.read_count)
+
+        self.protocol_client.wait_for_finished(run_id)
@@ -0,0 +1,46 @@
+import time
+import unittest
+
+import numpy
+
+import pyminknow.channels
+import pyminknow.client
+import pyminknow.config
+
+PORT = pyminknow.config.DEVICES[0]['ports']['insecure']
+
+
+class TestDataService(unittest.TestCase):
+    """Test data service"""
+
+    def setUp(self) -> None:
+        """Initialise server"""
+
+        self.channel = pyminknow.client.connect(port=PORT)
+        self.client = pyminknow.client.DataClient(self.channel)
+
+    def test_get_signal_bytes(self):
+        start = time.monotonic()
+        samples = numpy.zeros(4, dtype=int)
+
+        for response in self.client.get_signal_bytes(seconds=0.5, first_channel=10, last_channel=13):
+            self.assertEqual(len(response.channels), 4)
+            for i, channel in enumerate(response.channels):
+                samples[i] += len(numpy.frombuffer(channel.data, dtype=numpy.int16))
+
+        # Real time
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+        self.assertTrue((samples == pyminknow.config.THROUGHPUT['sample_rate'] / 2).all())
+
+    def test_calibrated_data(self):
+        response = next(self.client.get_signal_bytes(seconds=0.1, last_channel=1, calibrated_data=True))
+        data = numpy.frombuffer(response.channels[0].data, dtype=numpy.float32)
+        self.assertGreater(data.mean(), 0)
+
+    def test_get_channel_states(self):
+        response = next(self.client.get_channel_states(first_channel=1, last_channel=100))
+
+        # Initially, every channel is reported
+        self.assertEqual([state.channel for state in response.channel_states], list(range(1, 101)))
+        for state in response.channel_states:
+            self.assertIn(state.state_name, pyminknow.channels.STATES)
@@ -0,0 +1,34 @@
+import unittest
+
+import pyminknow.client
+import pyminknow.config
+
+
+class TestFleetService(unittest.TestCase):
+    """Test fleet status extension service"""
+
+    def setUp(self) -> None:
+        self.channel = pyminknow.client.connect()
+        self.client = pyminknow.client.FleetClient(self.channel)
+
+    def test_get_fleet_status(self):
+        status = self.client.get_fleet_status()
+
+        self.assertEqual(status['serial'], pyminknow.config.SERIAL)
+        self.assertEqual([position['name'] for position in status['positions']],
+                         [device['name'] for device in pyminknow.config.DEVICES])
+
+        for position, device in zip(status['positions'], pyminknow.config.DEVICES):
+            self.assertEqual(position['ports']['insecure'], device['ports']['insecure'])
+            self.assertEqual(position['flow_cell']['has_flow_cell'], bool(device['flow_cell']))
+
+    def test_watch_fleet_status(self):
+        for status in self.client.watch_fleet_status():
+            self.assertEqual(len(status['positions']), len(pyminknow.config.DEVICES))
+            break
+
+    def test_get_resource_usage(self):
+        usage = self.client.get_resource_usage()
+
+        self.assertIn('bytes_written', usage['host'])
+        self.assertLessEqual(set(usage['positions']), {device['name'] for device in pyminknow.config.DEVICES})
@@ -0,0 +1,57 @@
+import time
+import unittest
+
+import pyminknow.accounting
+
+
+class TestAccounting(unittest.TestCase):
+    """Test resource accounting"""
+
+    def test_roll_up(self):
+        accounts = pyminknow.accounting.Accounts()
+        first = accounts.run('X1')
+        second = accounts.run('X1')
+        other = accounts.run('X2')
+
+        first.add(bytes_written=100, files_created=1)
+        second.add(bytes_written=50, files_created=2)
+        other.add(cpu_seconds=1.5)
+
+        stats = accounts.stats()
+        self.assertEqual(stats['positions']['X1']['bytes_written'], 150)
+        self.assertEqual(stats['positions']['X1']['files_created'], 3)
+        self.assertEqual(stats['host']['cpu_seconds'], 1.5)
+        self.assertEqual(first.as_dict()['bytes_written'], 100)
+
+    def test_peak(self):
+        accounts = pyminknow.accounting.Accounts()
+        first = accounts.run('X1')
+        second = accounts.run('X2')
+
+        with first.buffer(1000):
+            with second.buffer(500):
+                pass
+        with second.buffer(2000):
+            pass
+
+        self.assertEqual(first.peak_buffer_bytes, 1000)
+        self.assertEqual(second.peak_buffer_bytes, 2000)
+        self.assertEqual(accounts.host.peak_buffer_bytes, 2000)
+        self.assertEqual(accounts.host.buffer_bytes, 0)
+
+    def test_cpu(self):
+        usage = pyminknow.accounting.Usage()
+        with usage.cpu():
+            time.sleep(0.05)
+        self.assertLess(usage.cpu_seconds, 0.05)
+
+        with usage.cpu():
+            sum(range(10 ** 6))
+        self.assertGreater(usage.cpu_seconds, 0)
+
+    def test_total(self):
+        usage = pyminknow.accounting.Usage()
+        usage.add(bytes_written=10)
+        restored = pyminknow.accounting.Usage.from_dict(usage.as_dict())
+
+        self.assertEqual(pyminknow.accounting.total([usage.as_dict(), restored.as_dict()])['bytes_written'], 20)
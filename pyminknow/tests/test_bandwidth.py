@@ -0,0 +1,58 @@
+import threading
+import time
+import unittest
+
+import pyminknow.bandwidth
+
+CHUNK = 100000
+
+
+class TestDiskGovernor(unittest.TestCase):
+    """Test the disk bandwidth budget"""
+
+    def test_rate(self):
+        governor = pyminknow.bandwidth.DiskGovernor(rate_mb=10, burst=0.1)
+        governor.register('X1')
+
+        # 1 MB burst, then 10 MB/s
+        start = time.monotonic()
+        for _ in range(30):
+            governor.acquire('X1', CHUNK)
+        self.assertGreater(time.monotonic() - start, 0.15)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_fair_share(self):
+        governor = pyminknow.bandwidth.DiskGovernor(rate_mb=20, burst=0.05)
+        written = dict(X1=0, X2=0)
+        stop = threading.Event()
+
+        def write(position: str):
+            governor.register(position)
+            while not stop.is_set():
+                governor.acquire(position, CHUNK)
+                written[position] += CHUNK
+            governor.unregister(position)
+
+        threads = [threading.Thread(target=write, args=(position,)) for position in written]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        # Each position gets about half of 20 MB/s
+        for size in written.values():
+            self.assertAlmostEqual(size / 1e6, 5, delta=2)
+
+    def test_priority(self):
+        governor = pyminknow.bandwidth.DiskGovernor(rate_mb=1, burst=0.1)
+        governor.register('X1')
+        governor.acquire('X1', 10 * CHUNK)
+
+        # In debt for about a second, but metadata doesn't wait
+        start = time.monotonic()
+        governor.acquire('X1', 1000, priority=True)
+        governor.acquire(None, 1000, priority=True)
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(governor.stats()['priority'], 2000)
@@ -0,0 +1,101 @@
+import time
+import unittest
+import unittest.mock
+
+import pyminknow.basecaller
+import pyminknow.clock
+import pyminknow.config
+import pyminknow.reads
+import pyminknow.stats
+import pyminknow.throughput
+
+
+class TestBasecaller(unittest.TestCase):
+    """Test the simulated basecalling stage"""
+
+    def setUp(self) -> None:
+        self.throughput = pyminknow.throughput.Throughput.for_device(pyminknow.config.DEVICES[0])
+        self.generator = pyminknow.reads.ReadGenerator(self.throughput, seed=0)
+        self.written = list()
+
+    def build(self, **kwargs) -> pyminknow.basecaller.Basecaller:
+        basecaller = pyminknow.basecaller.Basecaller(self.throughput, write=self.written.append, **kwargs)
+        self.addCleanup(basecaller.close)
+        return basecaller
+
+    def test_classify(self):
+        basecaller = self.build(min_qscore=12)
+        batch = basecaller.classify(self.generator.generate(100))
+
+        self.assertTrue((batch.passed == (batch.qscores >= 12)).all())
+
+    def test_keep_up(self):
+        basecaller = self.build()
+        for elapsed in range(1, 6):
+            basecaller.submit(self.generator.generate(10), elapsed)
+        basecaller.close()
+
+        self.assertEqual(sum(len(batch.lengths) for batch in self.written), 50)
+        self.assertEqual(basecaller.processed_elapsed, 5)
+
+    def test_backlog(self):
+        """A slow basecaller falls behind acquisition, and catches up when flushed"""
+        batch = self.generator.generate(10)
+        seconds = 0.2
+        samples = int(batch.lengths.sum() * self.throughput.samples_per_base)
+        basecaller = self.build(workers=1, rate=samples / seconds)
+
+        with unittest.mock.patch.object(pyminknow.clock, 'CLOCK', pyminknow.clock.Clock(speed=1)):
+            start = time.monotonic()
+            for elapsed in range(1, 4):
+                basecaller.submit(batch, elapsed)
+            time.sleep(seconds / 2)
+
+            self.assertLess(basecaller.processed_elapsed, 3)
+            self.assertGreater(basecaller.backlog, 0)
+
+            basecaller.flush()
+            basecaller.close()
+
+        self.assertLess(time.monotonic() - start, 3 * seconds)
+        self.assertEqual(basecaller.processed_elapsed, 3)
+        self.assertEqual(len(self.written), 3)
+
+    def test_record(self):
+        """Statistics count reads once they've been basecalled, not when they're acquired"""
+        statistics = pyminknow.stats.RunStatistics(self.throughput)
+        batch = self.generator.generate(10)
+        seconds = 0.2
+        samples = int(batch.lengths.sum() * self.throughput.samples_per_base)
+        basecaller = self.build(workers=1, rate=samples / seconds, record=statistics.add_reads)
+
+        with unittest.mock.patch.object(pyminknow.clock, 'CLOCK', pyminknow.clock.Clock(speed=1)):
+            for elapsed in range(1, 3):
+                basecaller.submit(batch, elapsed)
+            time.sleep(seconds / 2)
+            self.assertEqual(statistics.totals['read_count'], 0)
+
+            basecaller.close()
+
+        self.assertEqual(statistics.totals['read_count'], 20)
+        self.assertEqual(statistics.processed_elapsed, 2)
+
+    def test_write_error(self):
+        """A batch that fails to be written stops basecalling and is reported"""
+        def write(batch):
+            if self.written:
+                raise OSError('disk full')
+            self.written.append(batch)
+
+        basecaller = pyminknow.basecaller.Basecaller(self.throughput, write=write, workers=1)
+        for elapsed in range(1, 4):
+            basecaller.submit(self.generator.generate(10), elapsed)
+
+        with self.assertRaises(OSError):
+            basecaller.close()
+
+        # The batches after the one that failed are dropped
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual(basecaller.processed_elapsed, 3)
+        with self.assertRaises(OSError):
+            basecaller.submit(self.generator.generate(10), 4)
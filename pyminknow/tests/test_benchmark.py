@@ -0,0 +1,39 @@
+import unittest
+import unittest.mock
+
+import pyminknow.benchmark
+import pyminknow.config
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test the microbenchmark suite"""
+
+    def test_run(self):
+        run_dir = pyminknow.config.RUN_DIR
+        results = pyminknow.benchmark.run_benchmarks(names=['run.info', 'get_run_ids'], history_sizes=(10,),
+                                                     min_time=0.01, rounds=2)
+
+        # Runs are written to a temporary directory
+        self.assertEqual(pyminknow.config.RUN_DIR, run_dir)
+
+        self.assertEqual(set(results['results']), {'run.info', 'run.get_run_ids[10]'})
+        for result in results['results'].values():
+            self.assertGreater(result['median'], 0)
+            self.assertEqual(result['rounds'], 2)
+
+    def test_history(self):
+        """Run history is only written for the benchmarks selected"""
+        with unittest.mock.patch.object(pyminknow.benchmark, 'build_history') as build_history:
+            pyminknow.benchmark.run_benchmarks(names=['run.info', 'get_run_ids[10]'], history_sizes=(10, 100000),
+                                               min_time=0.01, rounds=1)
+
+        self.assertEqual([call.args[1] for call in build_history.call_args_list], [10])
+
+    def test_compare(self):
+        baseline = dict(results={'a': dict(median=1.), 'b': dict(median=1.), 'c': dict(median=1.)})
+        results = dict(results={'a': dict(median=1.1), 'b': dict(median=1.5), 'd': dict(median=1.)})
+
+        comparison = pyminknow.benchmark.compare(results, baseline, threshold=0.2)
+
+        self.assertEqual(set(comparison['ratios']), {'a', 'b'})
+        self.assertEqual(comparison['regressions'], ['b'])
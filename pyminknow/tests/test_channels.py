@@ -0,0 +1,56 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy
+
+import pyminknow.channels
+
+
+class TestChannelStates(unittest.TestCase):
+    """Test channel and well state simulation"""
+
+    def test_advance(self):
+        channels = pyminknow.channels.ChannelStates(channel_count=512, wells_per_channel=4, seed=0)
+        alive = channels.alive.sum()
+
+        for _ in range(100):
+            channels.advance(60)
+
+        counts = channels.counts()
+        self.assertEqual(counts.sum(), 512)
+        self.assertGreater(counts[pyminknow.channels.STRAND], 0)
+
+        # Pores die over time
+        self.assertLess(channels.alive.sum(), alive)
+
+        # Channels with a selected well use a live one
+        selected = channels.mux > 0
+        self.assertTrue(channels.alive[numpy.flatnonzero(selected), channels.mux[selected] - 1].all())
+        self.assertTrue((channels.state[~selected] == pyminknow.channels.UNAVAILABLE).all())
+
+    def test_mux_scan(self):
+        channels = pyminknow.channels.ChannelStates(channel_count=8, wells_per_channel=4, seed=0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mux_scan_data.csv')
+            channels.write_mux_scan(path)
+
+            with open(path) as file:
+                lines = file.read().splitlines()
+
+        self.assertEqual(lines[0], 'channel,mux,well_state')
+        self.assertEqual(len(lines), 1 + 8 * 4)
+
+    def test_promethion(self):
+        """48 positions with 3000 channels each"""
+        positions = [pyminknow.channels.ChannelStates(channel_count=3000, wells_per_channel=4, seed=i)
+                     for i in range(48)]
+
+        start = time.monotonic()
+        for _ in range(10):
+            for channels in positions:
+                channels.advance(1)
+
+        self.assertLess(time.monotonic() - start, 5)
@@ -0,0 +1,44 @@
+import datetime
+import threading
+import time
+import unittest
+
+import pyminknow.clock
+
+
+class TestClock(unittest.TestCase):
+    """Test the simulated clock"""
+
+    def test_speed(self):
+        clock = pyminknow.clock.Clock(speed=1000)
+        origin = clock.now()
+
+        # An hour of simulated time passes in a few seconds
+        start = time.monotonic()
+        clock.sleep(3600)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertGreaterEqual(clock.monotonic(), 3600)
+        self.assertGreaterEqual(clock.now() - origin, datetime.timedelta(hours=1))
+
+    def test_change_speed(self):
+        clock = pyminknow.clock.Clock(speed=100)
+        clock.sleep(10)
+        before = clock.monotonic()
+
+        # Simulated time doesn't jump when the speed changes
+        clock.speed = 1
+        self.assertAlmostEqual(clock.monotonic(), before, delta=1)
+
+        with self.assertRaises(ValueError):
+            clock.speed = 0
+
+    def test_wait(self):
+        clock = pyminknow.clock.Clock(speed=1)
+        event = threading.Event()
+        self.assertFalse(clock.wait(event, 0.01))
+
+        # Setting the event ends the wait early
+        threading.Timer(0.05, event.set).start()
+        start = time.monotonic()
+        self.assertTrue(clock.wait(event, 3600))
+        self.assertLess(time.monotonic() - start, 1)
@@ -0,0 +1,86 @@
+import gzip
+import os
+import struct
+import tempfile
+import unittest
+import unittest.mock
+import zlib
+
+import pyminknow.compression
+
+
+class TestCompressedFile(unittest.TestCase):
+    """Test parallel block compression"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.data = b''.join(b'@read%d\nACGTTGCA\n+\n%d\n' % (i, i) for i in range(50000))
+
+        # Small budget so writers have to wait for blocks to be written
+        self.compressor = pyminknow.compression.Compressor(level=1, workers=2,
+                                                           budget=2 * pyminknow.compression.BLOCK_SIZE)
+
+    def tearDown(self) -> None:
+        self.compressor.shutdown()
+        self.directory.cleanup()
+
+    def write(self, mode: str, files: int = 1) -> list:
+        paths = [os.path.join(self.directory.name, '{}.{}.gz'.format(mode, i)) for i in range(files)]
+        outputs = [pyminknow.compression.CompressedFile(path, mode=mode, compressor=self.compressor)
+                   for path in paths]
+
+        # Interleave writes to several files
+        for i in range(0, len(self.data), 10000):
+            for output in outputs:
+                output.write(self.data[i:i + 10000])
+        for output in outputs:
+            output.close()
+
+        return paths
+
+    def test_gzip(self):
+        for path in self.write('gzip', files=3):
+            with gzip.open(path) as file:
+                self.assertEqual(file.read(), self.data)
+
+    def test_bgzf(self):
+        path, = self.write('bgzf')
+
+        with open(path, 'rb') as file:
+            compressed = file.read()
+
+        self.assertEqual(gzip.decompress(compressed), self.data)
+        self.assertTrue(compressed.endswith(pyminknow.compression.BGZF_EOF))
+
+        # Walk the blocks using the size in each header
+        offset = blocks = 0
+        while offset < len(compressed):
+            self.assertEqual(compressed[offset + 12:offset + 14], b'BC')
+            offset += struct.unpack_from('<H', compressed, offset + 16)[0] + 1
+            blocks += 1
+
+        self.assertEqual(offset, len(compressed))
+        self.assertGreater(blocks, 2)
+
+    def test_error(self):
+        """A block that fails to compress is reported once, when the file is closed, and frees its memory"""
+        submit = self.compressor.submit
+        blocks = list()
+
+        def fail_third_block(data: bytes, mode: str):
+            blocks.append(data)
+            if len(blocks) == 3:
+                return self.compressor.pool.submit(zlib.compressobj, 'invalid level')
+            return submit(data, mode)
+
+        path = os.path.join(self.directory.name, 'error.gz')
+        output = pyminknow.compression.CompressedFile(path, compressor=self.compressor)
+        with unittest.mock.patch.object(self.compressor, 'submit', fail_third_block):
+            output.write(self.data)
+            with self.assertRaises(TypeError):
+                output.close()
+        output.close()
+
+        # Every permit is returned, so other files can still be written
+        self.assertEqual(self.compressor.budget._value, 2)
+        self.write('bgzf', files=2)
@@ -0,0 +1,36 @@
+import threading
+import time
+import unittest
+
+import pyminknow.service.fleet
+
+
+class TestSnapshotCache(unittest.TestCase):
+    """Test the fleet status snapshot cache"""
+
+    def test_coalesce(self):
+        calls = list()
+
+        def build():
+            calls.append(None)
+            time.sleep(0.2)
+            return len(calls)
+
+        cache = pyminknow.service.fleet.SnapshotCache(build, ttl=10)
+        results = list()
+        threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # One build for all the concurrent requests
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(cache.stats(), dict(hits=0, builds=1, coalesced=4))
+
+        self.assertEqual(cache.get(), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_expiry(self):
+        cache = pyminknow.service.fleet.SnapshotCache(time.monotonic, ttl=0)
+        self.assertNotEqual(cache.get(), cache.get())
@@ -0,0 +1,83 @@
+import glob
+import operator
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import pyminknow.config
+import pyminknow.generation
+import pyminknow.options
+import pyminknow.output
+import pyminknow.reads
+import pyminknow.throughput
+
+
+class TestGeneration(unittest.TestCase):
+    """Test building output records in worker processes"""
+
+    def setUp(self):
+        self.throughput = pyminknow.throughput.Throughput.for_device(pyminknow.config.DEVICES[0])
+        self.batch = pyminknow.reads.ReadGenerator(self.throughput, seed=0).generate(500)
+
+    def test_split(self):
+        parts = pyminknow.generation.split(self.batch, 3)
+        self.assertEqual([len(part.lengths) for part in parts], [166, 167, 167])
+        self.assertEqual(sum(part.lengths.sum() for part in parts), self.batch.lengths.sum())
+
+        # Small batches aren't worth splitting
+        self.assertEqual(len(pyminknow.generation.split(self.batch, 100)), 5)
+
+    def test_layout(self):
+        size, segments = pyminknow.generation.layout({'a': [b'xy', b'z'], 'b': [], 'c': [b'0123']})
+
+        self.assertEqual(size, 7)
+        self.assertEqual(segments['a'][0], 0)
+        self.assertEqual(list(segments['a'][1]), [2, 3])
+        self.assertEqual(list(segments['c'][1]), [7])
+
+    def test_pool(self):
+        options = pyminknow.options.RunOptions(outputs=('fast5', 'fastq'), barcodes=('barcode01',))
+        pool = pyminknow.generation.GenerationPool(workers=2)
+        self.addCleanup(pool.shutdown)
+
+        with tempfile.TemporaryDirectory() as directory:
+            writer = pyminknow.output.OutputWriter(directory, run_code='run', run_id='id', options=options,
+                                                   throughput=self.throughput, summary_filename='summary.txt',
+                                                   pool=pool)
+            writer.write(self.batch)
+            writer.close()
+
+            with open(os.path.join(directory, 'summary.txt')) as file:
+                self.assertEqual(len(file.readlines()), 501)
+
+            fastq = 0
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if name.endswith('.fastq'):
+                        with open(os.path.join(root, name)) as file:
+                            fastq += len(file.readlines()) // 4
+
+            self.assertEqual(fastq, 500)
+
+    def test_pool_error(self):
+        """If part of a batch fails, the shared memory made for the other parts is freed"""
+        pool = pyminknow.generation.GenerationPool(workers=2)
+        self.addCleanup(pool.shutdown)
+        blocks = set(glob.glob('/dev/shm/*'))
+
+        submit = pool.executor.submit
+        calls = list()
+
+        def fail_second_part(func, *args):
+            calls.append(func)
+            if len(calls) == 2:
+                return submit(operator.truediv, 1, 0)
+            return submit(func, *args)
+
+        with unittest.mock.patch.object(pool.executor, 'submit', fail_second_part):
+            with self.assertRaises(ZeroDivisionError):
+                pool.render(('fastq',), self.throughput, self.batch, ('',), 'id', 0)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(set(glob.glob('/dev/shm/*')) - blocks, set())
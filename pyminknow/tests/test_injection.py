@@ -0,0 +1,83 @@
+import json
+import random
+import tempfile
+import unittest
+
+import grpc
+
+import pyminknow.injection
+
+
+class TestInjection(unittest.TestCase):
+    """Test latency and fault injection rules"""
+
+    def test_parse(self):
+        rule = pyminknow.injection.Rule.parse('method=get_*,device=X1,latency=uniform:0.1:0.5,error=unavailable')
+
+        self.assertEqual(rule.method, 'get_*')
+        self.assertEqual(rule.error, grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(rule.error_rate, 1.)
+        self.assertEqual(rule.latency.params, (0.1, 0.5))
+
+    def test_matches(self):
+        rule = pyminknow.injection.Rule(method='get_*', device='X1')
+
+        self.assertTrue(rule.matches('get_run_info', 'X1'))
+        self.assertFalse(rule.matches('get_run_info', 'X2'))
+        self.assertFalse(rule.matches('start_protocol', 'X1'))
+
+        # Manager
+        self.assertFalse(rule.matches('get_run_info'))
+        self.assertTrue(pyminknow.injection.Rule().matches('describe_host'))
+
+    def test_distribution(self):
+        rng = random.Random(0)
+
+        for spec in ('fixed:1', 'uniform:0:1', 'normal:0:1', 'exponential:1', 'lognormal:0:1', 'pareto:1:2'):
+            value = pyminknow.injection.Distribution(spec).sample(rng)
+            self.assertGreaterEqual(value, 0)
+
+        with self.assertRaises(ValueError):
+            pyminknow.injection.Distribution('magic:1')
+
+    def test_rules_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump([dict(method='describe_host', error='INTERNAL')], file)
+            file.flush()
+
+            rule_set = pyminknow.injection.RuleSet(path=file.name)
+            rule_set.update([pyminknow.injection.Rule(method='get_*')])
+
+            self.assertEqual(len(rule_set.match('describe_host')), 1)
+            self.assertEqual(len(rule_set.match('get_version_info')), 1)
+            self.assertEqual(len(rule_set.match('flow_cell_positions')), 0)
+
+    def test_invalid_rules_file(self):
+        for rules in ([dict(error='NOT_A_CODE')], [dict(error=14)], [dict(latency='magic:1')], {'error': 'INTERNAL'}):
+            with self.subTest(rules=rules), tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+                json.dump(rules, file)
+                file.flush()
+
+                with self.assertRaises((ValueError, TypeError)):
+                    pyminknow.injection.RuleSet(path=file.name)
+
+        with self.assertRaises(ValueError):
+            pyminknow.injection.Rule(error='NOT_A_CODE')
+
+        # A rules file that becomes invalid is reported, and the rules loaded before are kept
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump([dict(method='describe_host', error='INTERNAL')], file)
+            file.flush()
+            rule_set = pyminknow.injection.RuleSet(path=file.name)
+
+            file.seek(0)
+            file.truncate()
+            json.dump([dict(method='describe_host', error='NOT_A_CODE')], file)
+            file.flush()
+            rule_set._mtime = None
+            rule_set._checked = 0.
+
+            with self.assertLogs('pyminknow.injection', 'ERROR'):
+                rules = rule_set.match('describe_host')
+            self.assertEqual(len(rules), 1)
+            self.assertEqual(rules[0].error, grpc.StatusCode.INTERNAL)
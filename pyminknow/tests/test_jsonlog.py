@@ -0,0 +1,87 @@
+import io
+import json
+import logging
+import queue
+import unittest
+
+import pyminknow.config
+import pyminknow.jsonlog
+
+
+class TestJsonLogging(unittest.TestCase):
+    """Test the structured logging pipeline"""
+
+    def setUp(self) -> None:
+        self.root = logging.getLogger()
+        self.handlers = list(self.root.handlers)
+        self.level = self.root.level
+        self.stream = io.StringIO()
+        self.listener = pyminknow.jsonlog.configure(verbose=True, log_format='json', stream=self.stream)
+        self.logger = logging.getLogger('pyminknow.tests.jsonlog')
+
+    def tearDown(self) -> None:
+        self.stop()
+        for handler in list(self.root.handlers):
+            self.root.removeHandler(handler)
+        for handler in self.handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.level)
+
+    def stop(self):
+        # Flush the queue (only once)
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def records(self) -> list:
+        self.stop()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json(self):
+        self.logger.info("Wrote '%s'", 'file.pkl', extra=dict(run_id='abc'))
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            self.logger.exception('Failed')
+
+        info, error = self.records()
+        self.assertEqual(info['message'], "Wrote 'file.pkl'")
+        self.assertEqual(info['level'], 'INFO')
+        self.assertEqual(info['run_id'], 'abc')
+        self.assertIn('ValueError: oops', error['exception'])
+
+    def test_rate_limit(self):
+        for i in range(1000):
+            self.logger.debug('Batch %s', i)
+        self.logger.warning('Warnings are not limited')
+
+        records = self.records()
+        self.assertLessEqual(len(records), 2 * pyminknow.config.LOG_RATE_LIMIT + 1)
+        self.assertEqual(records[-1]['level'], 'WARNING')
+
+    def test_dropped(self):
+        """Records dropped because the queue is full are reported"""
+        queue_handler = pyminknow.jsonlog.DroppingQueueHandler(queue.Queue(maxsize=1))
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(pyminknow.jsonlog.JsonFormatter())
+        listener = pyminknow.jsonlog.DroppingQueueListener(queue_handler, handler)
+
+        logger = logging.getLogger('pyminknow.tests.jsonlog.dropped')
+        logger.propagate = False
+        logger.addHandler(queue_handler)
+        self.addCleanup(logger.removeHandler, queue_handler)
+
+        # Nothing is taking records off the queue yet
+        for i in range(3):
+            logger.warning('Record %s', i)
+        queue_handler.queue.get_nowait()
+        logger.warning('Record 3')
+
+        listener.start()
+        listener.stop()
+
+        first, last = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(first['message'], 'Record 3')
+        self.assertEqual(first['dropped'], 2)
+        self.assertEqual(last['message'], 'Dropped 2 log records (queue full)')
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import pyminknow.accounting
+import pyminknow.config
+import pyminknow.options
+import pyminknow.output
+import pyminknow.reads
+import pyminknow.throughput
+
+DNA = 'sequencing/sequencing_MIN106_DNA:FLO-MIN106:SQK-LSK109:True'
+RNA = 'sequencing/sequencing_MIN106_MIN107_RNA:FLO-MIN106:SQK-RNA002:True'
+
+
+class TestRunOptions(unittest.TestCase):
+    """Test protocol arguments"""
+
+    def test_parse_args(self):
+        options = pyminknow.options.parse_args(
+            ['--fast5=on', '--barcoding_kits', 'EXP-NBD114', 'EXP-NBD104', '--experiment_time=24', '--verbose'])
+
+        self.assertEqual(options, {'fast5': 'on', 'barcoding_kits': ['EXP-NBD114', 'EXP-NBD104'],
+                                   'experiment_time': '24', 'verbose': True})
+
+    def test_from_protocol(self):
+        args = ['--fastq=off', '--barcoding_kits', 'EXP-NBD114', 'EXP-NBD104', '--experiment_time=24']
+        options = pyminknow.options.RunOptions.from_protocol(DNA, args)
+
+        self.assertEqual(options.outputs, ('fast5',))
+        self.assertEqual(options.barcodes[0], 'barcode01')
+        self.assertEqual(len(options.barcodes), 24)
+        self.assertEqual(options.duration, 24 * 3600)
+
+        # This kit doesn't support multiplexing
+        options = pyminknow.options.RunOptions.from_protocol(RNA, args)
+        self.assertEqual(options.barcodes, ())
+        self.assertEqual(options.bins, ('',))
+
+        # Options given more than once take the last value
+        options = pyminknow.options.RunOptions.from_protocol(DNA, ['--experiment_time', '1', '2', '--priority=1',
+                                                                   '--priority=3'])
+        self.assertEqual(options.duration, 2 * 3600)
+        self.assertEqual(options.priority, 3)
+
+        weights = pyminknow.options.RunOptions(barcodes=('barcode01', 'barcode02')).barcode_weights(seed=0)
+        self.assertAlmostEqual(weights.sum(), 1)
+        self.assertAlmostEqual(weights[-1], pyminknow.config.UNCLASSIFIED_FRACTION)
+
+
+class TestOutputWriter(unittest.TestCase):
+    """Test sequencing output files"""
+
+    def write(self, options: pyminknow.options.RunOptions, count: int = 200) -> list:
+        throughput = pyminknow.throughput.Throughput.for_device(pyminknow.config.DEVICES[0])
+        generator = pyminknow.reads.ReadGenerator(throughput, seed=0, barcode_weights=options.barcode_weights(0))
+
+        with tempfile.TemporaryDirectory() as directory:
+            writer = pyminknow.output.OutputWriter(directory, run_code='run', run_id='id', options=options,
+                                                   throughput=throughput, summary_filename='summary.txt', seed=0)
+            writer.write(generator.generate(count))
+            writer.close()
+
+            return sorted(os.path.relpath(os.path.join(root, name), directory)
+                          for root, _, names in os.walk(directory) for name in names)
+
+    def test_barcodes(self):
+        paths = self.write(pyminknow.options.RunOptions(outputs=('fastq',), barcodes=('barcode01', 'barcode02')))
+
+        self.assertIn(os.path.join('fastq_pass', 'barcode01', 'run_0.fastq'), paths)
+        self.assertIn(os.path.join('fastq_pass', 'unclassified', 'run_0.fastq'), paths)
+        self.assertFalse(any(path.startswith('fast5') for path in paths))
+
+    def test_no_barcodes(self):
+        paths = self.write(pyminknow.options.RunOptions(outputs=('fast5', 'fastq')))
+
+        self.assertEqual(paths, [os.path.join(directory, 'run_0.' + output)
+                                 for directory, output in (('fast5_fail', 'fast5'), ('fast5_pass', 'fast5'),
+                                                           ('fastq_fail', 'fastq'), ('fastq_pass', 'fastq'))]
+                         + ['summary.txt'])
+
+        # No outputs
+        self.assertEqual(self.write(pyminknow.options.RunOptions(outputs=())), ['summary.txt'])
+
+    def test_compression(self):
+        options = pyminknow.options.RunOptions.from_protocol(DNA, ['--fastq_data', 'compress', 'raw'])
+        self.assertEqual(options.compression, 'bgzf')
+
+        paths = self.write(options)
+        self.assertIn(os.path.join('fastq_pass', 'run_0.fastq.gz'), paths)
+        self.assertIn('summary.txt.gz', paths)
+        self.assertIn(os.path.join('fast5_pass', 'run_0.fast5'), paths)
+
+    def test_reads_per_file(self):
+        with unittest.mock.patch.object(pyminknow.config, 'READS_PER_FILE', 10):
+            paths = self.write(pyminknow.options.RunOptions(outputs=('fastq',)))
+
+        # Enough files for every read
+        self.assertGreaterEqual((len(paths) - 1) * 10, 200)
+
+    def test_checksums(self):
+        """Files are hashed as they're written, after compression"""
+        options = pyminknow.options.RunOptions.from_protocol(DNA, ['--fastq_data', 'compress', 'raw'])
+        throughput = pyminknow.throughput.Throughput.for_device(pyminknow.config.DEVICES[0])
+        generator = pyminknow.reads.ReadGenerator(throughput, seed=0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            writer = pyminknow.output.OutputWriter(directory, run_code='run', run_id='id', options=options,
+                                                   throughput=throughput, summary_filename='summary.txt', seed=0)
+            writer.write(generator.generate(200))
+            writer.close()
+
+            self.assertIn('summary.txt.gz', {file.path.name for file in writer.written})
+            for file in writer.written:
+                data = file.path.read_bytes()
+                self.assertEqual(file.size, len(data))
+                self.assertEqual(file.digest, hashlib.sha256(data).hexdigest())
+
+    def test_usage(self):
+        """Every file and byte written is counted"""
+        options = pyminknow.options.RunOptions.from_protocol(DNA, ['--fastq_data', 'compress', 'raw'])
+        throughput = pyminknow.throughput.Throughput.for_device(pyminknow.config.DEVICES[0])
+        generator = pyminknow.reads.ReadGenerator(throughput, seed=0)
+        usage = pyminknow.accounting.Usage()
+
+        with tempfile.TemporaryDirectory() as directory:
+            writer = pyminknow.output.OutputWriter(directory, run_code='run', run_id='id', options=options,
+                                                   throughput=throughput, summary_filename='summary.txt', seed=0,
+                                                   usage=usage)
+            writer.write(generator.generate(200))
+            writer.close()
+
+            sizes = [os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory)
+                     for name in names]
+
+        self.assertEqual(usage.files_created, len(sizes))
+        self.assertEqual(usage.bytes_written, sum(sizes))
+        self.assertGreater(usage.cpu_seconds, 0)
+        self.assertGreater(usage.peak_buffer_bytes, 0)
+        self.assertEqual(usage.buffer_bytes, 0)
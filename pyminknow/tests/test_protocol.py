@@ -1,11 +1,21 @@
+import json
 import logging
+import pathlib
+import tempfile
+import time
 import unittest
+import unittest.mock
 
 import google.protobuf.internal.containers
+import grpc
 import minknow_api.tools.protocols
 import minknow_api.protocol_pb2
 
 import pyminknow.config
+import pyminknow.manifest
+import pyminknow.output
+import pyminknow.scheduler
+import pyminknow.service.protocol
 
 # Use the first device
 PORT = pyminknow.config.DEVICES[0]['ports']['insecure']
@@ -76,5 +86,176 @@ class TestProtocolService(unittest.TestCase):
             self.assertIsInstance(run_id, str)
 
 
+class TestStopProtocol(unittest.TestCase):
+    """Test stopping a run in progress"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = unittest.mock.patch.multiple(pyminknow.config, RUN_DIR=pathlib.Path(directory.name),
+                                               DATA_DIR=directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.device = dict(pyminknow.config.DEVICES[0], name='stop-test')
+        self.service = pyminknow.service.protocol.ProtocolService(device=self.device)
+        self.context = unittest.mock.Mock(abort=unittest.mock.Mock(side_effect=RuntimeError))
+
+    def start(self) -> pyminknow.service.protocol.Run:
+        user_info = pyminknow.service.protocol.Run.build_user_info(protocol_group_id='test', sample_id='test')
+        request = minknow_api.protocol_pb2.StartProtocolRequest(
+            identifier=pyminknow.config.PROTOCOLS[0]['identifier'], user_info=user_info,
+            args=['--experiment_time=1', '--fast5=off', '--fastq=off'])
+        run_id = self.service.start_protocol(request, self.context).run_id
+
+        # Wait for the run to start
+        while getattr(pyminknow.service.protocol.Run.current(self.device), 'run_id', None) != run_id:
+            time.sleep(0.01)
+        return pyminknow.service.protocol.Run.current(self.device)
+
+    def test_stop(self):
+        run = self.start()
+
+        start = time.monotonic()
+        data_action = pyminknow.service.protocol.DataAction.STOP_FINISH_PROCESSING
+        self.service.stop_protocol(minknow_api.protocol_pb2.StopProtocolRequest(data_action_on_stop=data_action),
+                                   self.context)
+
+        # The run ends well before the hour is up
+        self.assertTrue(run.finished.wait(1))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(run.state, minknow_api.protocol_pb2.ProtocolState.PROTOCOL_STOPPED_BY_USER)
+        self.assertEqual(self.service.latest_run_id, run.run_id)
+        self.assertTrue(run.output_path.exists())
+
+        # Every output file is listed in the manifest, which the completion marker points to
+        marker = json.loads(run.output_path.joinpath(run.marker_filename).read_text())
+        self.assertEqual(marker['state'], 'PROTOCOL_STOPPED_BY_USER')
+        manifest = run.output_path.joinpath(marker['manifest'])
+        self.assertEqual(pyminknow.manifest.verify(manifest), [])
+        paths = {entry['path'] for entry in json.loads(manifest.read_text())['files']}
+        on_disk = {path.relative_to(run.output_path).as_posix() for path in run.output_path.rglob('*')
+                   if path.is_file()}
+        self.assertIn(run.summary_filename, paths)
+        self.assertEqual(on_disk - paths, {run.manifest_filename, run.marker_filename})
+
+        # Resources used are saved with the run
+        usage = run.load()['usage']
+        self.assertEqual(usage['files_created'], len(on_disk))
+        self.assertGreater(usage['bytes_written'], 0)
+
+        # Nothing left to stop
+        with self.assertRaises(RuntimeError):
+            self.service.stop_protocol(minknow_api.protocol_pb2.StopProtocolRequest(), self.context)
+
+    def test_stop_queued(self):
+        # No run may start
+        with unittest.mock.patch.object(pyminknow.scheduler.SCHEDULER, 'max_active', 0):
+            user_info = pyminknow.service.protocol.Run.build_user_info(protocol_group_id='test', sample_id='test')
+            request = minknow_api.protocol_pb2.StartProtocolRequest(
+                identifier=pyminknow.config.PROTOCOLS[0]['identifier'], user_info=user_info)
+            run_id = self.service.start_protocol(request, self.context).run_id
+
+            self.service.stop_protocol(minknow_api.protocol_pb2.StopProtocolRequest(), self.context)
+
+        run = pyminknow.service.protocol.Run(run_id=run_id, device=self.device)
+        run.deserialise()
+        self.assertEqual(run.state, minknow_api.protocol_pb2.ProtocolState.PROTOCOL_STOPPED_BY_USER)
+        self.assertEqual(pyminknow.scheduler.SCHEDULER.queued(self.device), [])
+
+    def test_queued_acquisition_run_ids(self):
+        """A queued run has the same acquisition run IDs each time it's loaded"""
+        Run = pyminknow.service.protocol.Run
+        with unittest.mock.patch.object(pyminknow.scheduler.SCHEDULER, 'max_active', 0):
+            request = minknow_api.protocol_pb2.StartProtocolRequest(
+                identifier=pyminknow.config.PROTOCOLS[0]['identifier'],
+                user_info=Run.build_user_info(protocol_group_id='test', sample_id='test'))
+            run_id = self.service.start_protocol(request, self.context).run_id
+            self.addCleanup(self.service.stop_protocol, minknow_api.protocol_pb2.StopProtocolRequest(), self.context)
+
+            acquisition_run_ids = list()
+            for _ in range(2):
+                run = Run(run_id=run_id, device=self.device)
+                run.deserialise()
+                acquisition_run_ids.append(run.acquisition_run_ids)
+
+        self.assertEqual(acquisition_run_ids[0], acquisition_run_ids[1])
+
+    def test_recover(self):
+        """Runs left queued or running by a server that stopped are ended when the next one starts"""
+        Run = pyminknow.service.protocol.Run
+        ProtocolState = minknow_api.protocol_pb2.ProtocolState
+        user_info = Run.build_user_info(protocol_group_id='test', sample_id='test')
+        runs = dict()
+        for state in (ProtocolState.PROTOCOL_WAITING_FOR_ACQUISITION, ProtocolState.PROTOCOL_RUNNING,
+                      ProtocolState.PROTOCOL_COMPLETED):
+            run = Run(protocol_id=pyminknow.config.PROTOCOLS[0]['identifier'], user_info=user_info,
+                      device=self.device)
+            run.state = state
+            run.serialise()
+            runs[state] = run.run_id
+
+        # Runs saved since the server started are left alone
+        self.assertEqual(Run.recover(self.device, before=0), 0)
+        self.assertEqual(Run.recover(self.device, before=time.time() + 1), 2)
+
+        states = dict()
+        for state, run_id in runs.items():
+            run = Run(run_id=run_id, device=self.device)
+            run.deserialise()
+            states[state] = run.state
+        self.assertEqual(states, {
+            ProtocolState.PROTOCOL_WAITING_FOR_ACQUISITION: ProtocolState.PROTOCOL_STOPPED_BY_USER,
+            ProtocolState.PROTOCOL_RUNNING: ProtocolState.PROTOCOL_FINISHED_WITH_ERROR,
+            ProtocolState.PROTOCOL_COMPLETED: ProtocolState.PROTOCOL_COMPLETED,
+        })
+
+    def test_run_error(self):
+        """The basecaller and output files are closed when a run fails"""
+        Run = pyminknow.service.protocol.Run
+        run = Run(protocol_id=pyminknow.config.PROTOCOLS[0]['identifier'],
+                  user_info=Run.build_user_info(protocol_group_id='test', sample_id='test'),
+                  args=['--experiment_time=1', '--fast5=off', '--fastq=off'], device=self.device)
+
+        with unittest.mock.patch.object(Run, 'run', side_effect=OSError('disk failed')):
+            with self.assertRaises(OSError):
+                run.start()
+
+        self.assertTrue(run.finished.is_set())
+        self.assertEqual(run.basecaller._threads, [])
+        self.assertTrue(run.output.closed)
+
+        # The run is saved as failed
+        run = Run(run_id=run.run_id, device=self.device)
+        run.deserialise()
+        self.assertEqual(run.state, minknow_api.protocol_pb2.ProtocolState.PROTOCOL_FINISHED_WITH_ERROR)
+
+    def test_write_error(self):
+        """A run whose reads can't be written fails rather than completing"""
+        Run = pyminknow.service.protocol.Run
+        run = Run(protocol_id=pyminknow.config.PROTOCOLS[0]['identifier'],
+                  user_info=Run.build_user_info(protocol_group_id='test', sample_id='test'),
+                  args=['--experiment_time=1', '--fast5=off', '--fastq=off'], device=self.device)
+        run.cancel(pyminknow.service.protocol.DataAction.STOP_FINISH_PROCESSING)
+
+        with unittest.mock.patch.object(pyminknow.output.OutputWriter, 'write', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                run.start()
+
+        self.assertEqual(run.state, minknow_api.protocol_pb2.ProtocolState.PROTOCOL_FINISHED_WITH_ERROR)
+        self.assertFalse(run.output_path.joinpath(run.marker_filename).exists())
+
+    def test_invalid_args(self):
+        request = minknow_api.protocol_pb2.StartProtocolRequest(
+            identifier=pyminknow.config.PROTOCOLS[0]['identifier'], args=['--experiment_time=soon'])
+
+        with self.assertRaises(RuntimeError):
+            self.service.start_protocol(request, self.context)
+        self.assertEqual(self.context.abort.call_args.args[0], grpc.StatusCode.INVALID_ARGUMENT)
+
+        # Nothing was queued or saved
+        self.assertEqual(self.service.run_ids, [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import concurrent.futures
+import os
+import tempfile
+import time
+import unittest
+
+import grpc
+
+import pyminknow.client
+import pyminknow.recording
+
+PORT = 9598
+METHOD = '/pyminknow.test.Echo/echo'
+
+
+class TestRecording(unittest.TestCase):
+    """Test the binary RPC log"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'session.bin')
+
+        recorder = pyminknow.recording.Recorder(self.path)
+        for i in range(3):
+            recorder.write(pyminknow.recording.Call(
+                offset=float(i), duration=0.5, device='X1', method='/minknow_api.device.DeviceService/get_device_state',
+                code=0, streaming=False, details='', request=b'', responses=[(0.5, bytes((i,)))],
+            ))
+        recorder.write(pyminknow.recording.Call(
+            offset=3., duration=0.1, device='', method='/minknow_api.manager.ManagerService/describe_host',
+            code=14, streaming=False, details='Unavailable', request=b'\x01', responses=list(),
+        ))
+        recorder.close()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_read(self):
+        calls = list(pyminknow.recording.read(self.path))
+
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(calls[1].responses, [(0.5, b'\x01')])
+        self.assertEqual(calls[3].device, '')
+        self.assertEqual(calls[3].code, 14)
+        self.assertEqual(calls[3].details, 'Unavailable')
+
+    def test_lookup(self):
+        replayer = pyminknow.recording.Replayer(self.path, time_scale=10)
+        method = '/minknow_api.device.DeviceService/get_device_state'
+
+        # Repeated requests get the recorded responses in turn
+        responses = [replayer.lookup('X1', method, b'').responses[0][1] for _ in range(4)]
+        self.assertEqual(responses, [b'\x00', b'\x01', b'\x02', b'\x00'])
+
+        self.assertIsNone(replayer.lookup('X2', method, b''))
+
+    def test_replay(self):
+        """Recorded calls are served with their recorded responses, faster by the time-scale factor"""
+        path = os.path.join(self.directory.name, 'echo.bin')
+        recorder = pyminknow.recording.Recorder(path)
+        recorder.write(pyminknow.recording.Call(
+            offset=0., duration=1., device='', method=METHOD, code=0, streaming=False, details='',
+            request=b'hello', responses=[(1., b'recorded')],
+        ))
+        recorder.close()
+        replayer = pyminknow.recording.Replayer(path, time_scale=10)
+
+        server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=2),
+                             interceptors=[pyminknow.recording.ReplayInterceptor(replayer)])
+        server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler('pyminknow.test.Echo', dict(
+            echo=grpc.unary_unary_rpc_method_handler(lambda request, context: request))),))
+        server.add_insecure_port('[::]:{}'.format(PORT))
+        server.start()
+        self.addCleanup(server.stop, None)
+
+        with pyminknow.client.connect(port=PORT) as channel:
+            call = channel.unary_unary(METHOD)
+
+            start = time.monotonic()
+            self.assertEqual(call(b'hello'), b'recorded')
+            elapsed = time.monotonic() - start
+            self.assertGreaterEqual(elapsed, 0.1)
+            self.assertLess(elapsed, 1.)
+
+            # Requests that weren't recorded are handled as usual
+            self.assertEqual(call(b'other'), b'other')
@@ -0,0 +1,80 @@
+import datetime
+import tempfile
+import unittest
+import unittest.mock
+
+import pyminknow.config
+import pyminknow.retention
+import pyminknow.runcache
+import pyminknow.service.protocol
+
+DEVICE = pyminknow.config.DEVICES[0]
+
+
+class TestRetention(unittest.TestCase):
+    """Test run history retention and compaction"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.patches = [
+            unittest.mock.patch.object(pyminknow.config, 'RUN_DIR', self.directory.name + '/runs'),
+            unittest.mock.patch.object(pyminknow.config, 'DATA_DIR', self.directory.name + '/data'),
+            unittest.mock.patch.object(pyminknow.config, 'RUN_DURATION', 0),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+        self.directory.cleanup()
+
+    def start_run(self, sample_id: str) -> pyminknow.service.protocol.Run:
+        run = pyminknow.service.protocol.Run(
+            protocol_id=pyminknow.config.PROTOCOLS[0]['identifier'],
+            user_info=pyminknow.service.protocol.Run.build_user_info(protocol_group_id='group', sample_id=sample_id),
+            device=DEVICE,
+        )
+        run.start()
+        return run
+
+    def test_expired(self):
+        now = datetime.datetime.utcnow()
+        runs = [(str(i), now - datetime.timedelta(days=10 - i), 100) for i in range(10)]
+
+        policy = pyminknow.retention.RetentionPolicy(max_age=datetime.timedelta(days=5))
+        self.assertEqual(policy.expired(runs, now=now), ['0', '1', '2', '3', '4'])
+
+        policy = pyminknow.retention.RetentionPolicy(max_count=8)
+        self.assertEqual(policy.expired(runs, now=now), ['0', '1'])
+
+        policy = pyminknow.retention.RetentionPolicy(max_bytes=750)
+        self.assertEqual(policy.expired(runs, now=now), ['0', '1', '2'])
+
+        self.assertFalse(pyminknow.retention.RetentionPolicy())
+
+    def test_enforce(self):
+        runs = [self.start_run(sample_id='sample{}'.format(i)) for i in range(3)]
+
+        worker = pyminknow.retention.RetentionWorker(pyminknow.retention.RetentionPolicy(max_count=1),
+                                                     devices=(DEVICE,))
+        worker.enforce()
+
+        # Run files and output data were removed
+        self.assertFalse(runs[0].path.exists())
+        self.assertFalse(runs[0].output_path.exists())
+        self.assertTrue(runs[2].path.exists())
+        self.assertTrue(runs[2].output_path.exists())
+
+        # Expired runs aren't served from the run info cache
+        self.assertIsNone(pyminknow.runcache.CACHE.get((DEVICE['name'], runs[0].run_id)))
+        self.assertIsNotNone(pyminknow.runcache.CACHE.get((DEVICE['name'], runs[2].run_id)))
+
+        # Archived runs are still available
+        run_ids = list(pyminknow.service.protocol.Run.get_run_ids(device=DEVICE))
+        self.assertEqual(run_ids, [run.run_id for run in runs])
+
+        run = pyminknow.service.protocol.Run(run_id=runs[0].run_id, device=DEVICE)
+        run.deserialise()
+        self.assertEqual(run.info.run_id, runs[0].run_id)
+        self.assertEqual(run.sample_id, 'sample0')
@@ -0,0 +1,51 @@
+import unittest
+
+import pyminknow.runcache
+
+
+class TestRunInfoCache(unittest.TestCase):
+    """Test the cache of serialised run information"""
+
+    def test_lru(self):
+        cache = pyminknow.runcache.RunInfoCache(max_bytes=30)
+        cache.put('a', b'x' * 10)
+        cache.put('b', b'x' * 10)
+        cache.put('c', b'x' * 10)
+
+        # Use "a" so that "b" is the least recently used
+        self.assertEqual(cache.get('a'), b'x' * 10)
+        cache.put('d', b'x' * 10)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats(), dict(hits=2, misses=1, entries=3, bytes=30))
+
+    def test_budget(self):
+        cache = pyminknow.runcache.RunInfoCache(max_bytes=30)
+
+        # Too big to cache
+        cache.put('a', b'x' * 31)
+        self.assertIsNone(cache.get('a'))
+
+        # Replacing an entry doesn't count it twice
+        cache.put('b', b'x' * 20)
+        cache.put('b', b'x' * 20)
+        self.assertEqual(cache.size, 20)
+
+        cache.discard('b')
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_devices(self):
+        cache = pyminknow.runcache.RunInfoCache(max_bytes=30)
+        cache.put(('X1', 'a'), b'x1')
+
+        # Another device doesn't have the run
+        self.assertIsNone(cache.get(('X2', 'a')))
+        self.assertEqual(cache.get(('X1', 'a')), b'x1')
+
+    def test_log(self):
+        cache = pyminknow.runcache.RunInfoCache(log_interval=0)
+
+        with self.assertLogs('pyminknow.runcache', 'INFO') as logs:
+            cache.get(('X1', 'a'))
+        self.assertIn("'misses': 1", logs.output[0])
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+
+import pyminknow.scheduler
+
+
+class FakeRun:
+    """Run that lasts until it's released"""
+
+    def __init__(self, run_id: str, device: str, started: list):
+        self.run_id = run_id
+        self.device = dict(name=device)
+        self.release = threading.Event()
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
+        self.started = started
+        self.state = None
+        self.saved = 0
+
+    def start(self):
+        self.started.append(self.run_id)
+        self.release.wait(5)
+        self.finished.set()
+
+    def cancel(self):
+        self.release.set()
+
+    def serialise(self):
+        self.saved += 1
+
+
+class TestRunScheduler(unittest.TestCase):
+    """Test the protocol run queue"""
+
+    def setUp(self):
+        self.started = list()
+        self.scheduler = pyminknow.scheduler.RunScheduler(max_active=2)
+        self.addCleanup(self.scheduler.shutdown, timeout=5)
+
+    def run_(self, run_id: str, device: str) -> FakeRun:
+        return FakeRun(run_id, device, self.started)
+
+    def finish(self, run: FakeRun):
+        run.release.set()
+        run.finished.wait(5)
+
+    def wait_for(self, count: int):
+        for _ in range(500):
+            if len(self.started) >= count:
+                return
+            time.sleep(0.01)
+
+    def test_position_queue(self):
+        first = self.run_('a', 'X1')
+        self.scheduler.submit(first)
+        low = self.run_('low', 'X1')
+        self.scheduler.submit(low, priority=0)
+        high = self.run_('high', 'X1')
+        self.scheduler.submit(high, priority=5)
+        self.wait_for(1)
+
+        # One run at a time on a position, highest priority next
+        self.assertEqual(self.started, ['a'])
+        self.assertEqual([run.run_id for run in self.scheduler.queued()], ['high', 'low'])
+
+        self.finish(first)
+        self.wait_for(2)
+        self.assertEqual(self.started, ['a', 'high'])
+        self.finish(high)
+        self.wait_for(3)
+        self.finish(low)
+        self.assertEqual(self.started, ['a', 'high', 'low'])
+
+    def test_host_limit(self):
+        runs = [self.run_(name, name) for name in ('X1', 'X2', 'X3')]
+        for run in runs:
+            self.scheduler.submit(run)
+        self.wait_for(2)
+
+        # The third position waits for a free slot
+        self.assertEqual(self.started, ['X1', 'X2'])
+        self.assertEqual(len(self.scheduler.queued()), 1)
+
+        self.finish(runs[0])
+        self.wait_for(3)
+        self.assertEqual(self.started, ['X1', 'X2', 'X3'])
+
+    def test_cancel_queued(self):
+        first = self.run_('a', 'X1')
+        self.scheduler.submit(first)
+        queued = [self.run_('b', 'X1'), self.run_('c', 'X1')]
+        for run in queued:
+            self.scheduler.submit(run)
+        self.wait_for(1)
+
+        # The next run to start is dropped without starting
+        self.assertIs(self.scheduler.cancel_queued(dict(name='X1')), queued[0])
+        self.assertTrue(queued[0].finished.is_set())
+        self.assertEqual(queued[0].saved, 1)
+        self.assertIsNone(self.scheduler.cancel_queued(dict(name='X2')))
+
+        self.assertIs(self.scheduler.running(dict(name='X1')), first)
+        self.finish(first)
+        self.wait_for(2)
+        self.finish(queued[1])
+        self.assertEqual(self.started, ['a', 'c'])
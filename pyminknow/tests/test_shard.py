@@ -0,0 +1,72 @@
+import multiprocessing
+import threading
+import unittest
+import unittest.mock
+
+import pyminknow.config
+import pyminknow.shard
+
+
+class TestShardPool(unittest.TestCase):
+    """Test how devices are split between worker processes"""
+
+    def test_partition(self):
+        pool = pyminknow.shard.ShardPool(shards=2)
+        names = [device['name'] for shard in pool.shards for device in shard.devices]
+
+        # Every device is served exactly once
+        self.assertEqual(sorted(names), sorted(device['name'] for device in pyminknow.config.DEVICES))
+
+        # No more shards than devices
+        pool = pyminknow.shard.ShardPool(shards=100)
+        self.assertEqual(len(pool.shards), len(pyminknow.config.DEVICES))
+
+    def test_status(self):
+        # Shards that aren't running are reported as initialising
+        pool = pyminknow.shard.ShardPool(shards=2)
+        status = pool.status()
+
+        self.assertEqual(set(status), {device['name'] for device in pyminknow.config.DEVICES})
+        self.assertTrue(all(state == 'STATE_INITIALISING' for state, _ in status.values()))
+
+    def test_max_runs(self):
+        devices = pyminknow.config.DEVICES
+
+        # The shards' limits add up to the host-wide limit
+        for shards in range(1, len(devices) + 1):
+            for max_runs in range(shards, 2 * len(devices)):
+                pool = pyminknow.shard.ShardPool(shards=shards, max_runs=max_runs)
+                limits = [shard.max_runs for shard in pool.shards]
+                self.assertEqual(sum(limits), max_runs)
+                self.assertGreaterEqual(min(limits), 1)
+
+        # Fewer runs than shards would leave some positions unable to run
+        if len(devices) > 1:
+            with self.assertRaises(ValueError):
+                pyminknow.shard.ShardPool(shards=2, max_runs=1)
+
+        self.assertEqual(pyminknow.shard.share_out(5, [3, 2, 2]), [2, 2, 1])
+        self.assertEqual(pyminknow.shard.share_out(0, [1, 1]), [0, 0])
+
+
+class TestShard(unittest.TestCase):
+    """Test requests to a shard process"""
+
+    def test_late_reply(self):
+        """A reply that arrives after its request timed out isn't taken as the answer to the next one"""
+        shard = pyminknow.shard.Shard(index=0, devices=pyminknow.config.DEVICES[:1])
+        shard.connection, connection = multiprocessing.Pipe()
+        shard.process = unittest.mock.Mock(is_alive=unittest.mock.Mock(return_value=True))
+
+        self.assertIsNone(shard.request(pyminknow.shard.STATUS, timeout=0.01))
+        sequence, message = connection.recv()
+        connection.send((sequence, 'late'))
+
+        def answer():
+            sequence, message = connection.recv()
+            connection.send((sequence, 'current'))
+
+        thread = threading.Thread(target=answer)
+        thread.start()
+        self.assertEqual(shard.request(pyminknow.shard.STATUS, timeout=5), 'current')
+        thread.join()
@@ -0,0 +1,105 @@
+import json
+import pathlib
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import pyminknow.config
+import pyminknow.lazy
+
+# Modules written by the tests append to this when they're loaded
+LOADS = list()
+
+SLOW_MODULE = """
+import time
+
+import pyminknow.tests.test_startup
+
+time.sleep(0.1)
+VALUE = 'loaded'
+pyminknow.tests.test_startup.LOADS.append(__name__)
+"""
+
+# Imports the server's modules as the entry point does and reports what's still deferred
+STARTUP = """
+import json
+import pyminknow.__main__
+import pyminknow.config
+import pyminknow.lazy
+import pyminknow.startup
+
+report = pyminknow.startup.StartupReport()
+pyminknow.startup.defer_imports()
+report.import_modules(*pyminknow.__main__.SERVER_MODULES)
+names = pyminknow.config.DEFERRED_IMPORTS + pyminknow.config.DEFERRED_PACKAGE_INIT
+print(json.dumps(dict(total=report.total, deferred=[name for name in names if pyminknow.lazy.is_deferred(name)])))
+"""
+
+
+class TestDeferredImports(unittest.TestCase):
+    """Test deferred module loading"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = pathlib.Path(directory.name)
+
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+        LOADS.clear()
+
+    def forget(self, *names):
+        for name in names:
+            self.addCleanup(sys.modules.pop, name, None)
+
+    def test_defer(self):
+        self.path.joinpath('lazy_slow.py').write_text(SLOW_MODULE)
+        self.forget('lazy_slow')
+
+        module = pyminknow.lazy.defer('lazy_slow')
+        import lazy_slow
+        self.assertIs(lazy_slow, module)
+        self.assertTrue(pyminknow.lazy.is_deferred('lazy_slow'))
+        self.assertEqual(LOADS, [])
+
+        # Threads that use the module at once wait for one of them to load it
+        values = list()
+        threads = [threading.Thread(target=lambda: values.append(module.VALUE)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(values, ['loaded'] * 4)
+        self.assertEqual(LOADS, ['lazy_slow'])
+        self.assertFalse(pyminknow.lazy.is_deferred('lazy_slow'))
+
+    def test_submodules(self):
+        package = self.path.joinpath('lazy_package')
+        package.mkdir()
+        package.joinpath('__init__.py').write_text(SLOW_MODULE)
+        package.joinpath('messages.py').write_text('MESSAGE = 1\n')
+        self.forget('lazy_package', 'lazy_package.messages')
+
+        pyminknow.lazy.defer('lazy_package', submodules=True)
+        import lazy_package.messages
+        from lazy_package import messages
+
+        # The package's own code hasn't run
+        self.assertEqual(messages.MESSAGE, 1)
+        self.assertTrue(pyminknow.lazy.is_deferred('lazy_package'))
+
+        self.assertEqual(lazy_package.VALUE, 'loaded')
+        self.assertEqual(LOADS, ['lazy_package'])
+
+    def test_budget(self):
+        """The server's modules import within the startup budget, without the deferred ones"""
+        output = subprocess.run([sys.executable, '-c', STARTUP], check=True, capture_output=True, text=True,
+                                cwd=pathlib.Path(pyminknow.__file__).parent.parent).stdout
+        result = json.loads(output)
+
+        self.assertEqual(result['deferred'], list(pyminknow.config.DEFERRED_IMPORTS +
+                                                  pyminknow.config.DEFERRED_PACKAGE_INIT))
+        self.assertLess(result['total'], pyminknow.config.STARTUP_BUDGET)
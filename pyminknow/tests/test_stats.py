@@ -0,0 +1,68 @@
+import csv
+import os
+import tempfile
+import unittest
+
+import pyminknow.channels
+import pyminknow.config
+import pyminknow.reads
+import pyminknow.stats
+import pyminknow.throughput
+
+
+class TestRunStatistics(unittest.TestCase):
+    """Test incrementally maintained run statistics"""
+
+    def setUp(self) -> None:
+        throughput = pyminknow.throughput.Throughput.for_device(pyminknow.config.DEVICES[0])
+        self.statistics = pyminknow.stats.RunStatistics(throughput, bucket_seconds=10)
+        generator = pyminknow.reads.ReadGenerator(throughput, seed=0)
+        channels = pyminknow.channels.ChannelStates(seed=0)
+
+        # Simulate 35 seconds of acquisition
+        for elapsed in range(1, 36):
+            channels.advance(1)
+            self.statistics.add(generator.generate_until(elapsed), elapsed, channels.counts())
+
+    def test_totals(self):
+        totals = self.statistics.totals
+
+        self.assertEqual(totals['read_count'], 35 * pyminknow.config.THROUGHPUT['reads_per_second'])
+        self.assertEqual(totals['read_count'], self.statistics.length_counts.sum())
+        self.assertEqual(totals['read_count'], self.statistics.qscore_counts.sum())
+        self.assertEqual(totals['pass_bases'] + totals['fail_bases'], self.statistics.length_bases.sum())
+        self.assertEqual(self.statistics.bucket_count, 4)
+
+        # All channels are accounted for in duty time
+        samples = sum(states.sum() for states in self.statistics.duty_time().values())
+        throughput = self.statistics.throughput
+        self.assertEqual(samples, 35 * throughput.sample_rate * throughput.channel_count)
+
+    def test_histogram(self):
+        edges, values, n50 = self.statistics.read_length_histogram()
+
+        self.assertEqual(len(edges), len(values) + 1)
+        self.assertGreater(n50, 0)
+
+        quantiles = self.statistics.qscore_quantiles()
+        self.assertEqual(quantiles, sorted(quantiles))
+
+    def test_reports(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'throughput.csv')
+            self.statistics.write_throughput(path)
+
+            with open(path) as file:
+                rows = list(csv.reader(file))
+
+            # Cumulative totals match
+            self.assertEqual(int(rows[-1][1]), self.statistics.totals['read_count'])
+            self.assertEqual(int(rows[-1][4]), self.statistics.totals['pass_bases'])
+
+            path = os.path.join(directory, 'duty_time.csv')
+            self.statistics.write_duty_time(path)
+
+            with open(path) as file:
+                rows = list(csv.reader(file))
+
+            self.assertEqual(len(rows), 1 + self.statistics.bucket_count * len(pyminknow.stats.STATES))
@@ -0,0 +1,91 @@
+import errno
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import pyminknow.store
+
+
+class TestContentStore(unittest.TestCase):
+    """Test the content-addressed file store"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = pathlib.Path(self.directory.name)
+        self.store = pyminknow.store.ContentStore(root=self.path.joinpath('store'))
+
+    def test_write(self):
+        first = self.path.joinpath('run1', 'report.md')
+        second = self.path.joinpath('run2', 'report.md')
+
+        self.assertEqual(self.store.write(first, b'report'), 'link')
+        self.assertEqual(self.store.write(second, b'report'), 'link')
+
+        # One copy on disk
+        self.assertEqual(second.read_bytes(), b'report')
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(self.store.stats()['stored'], 1)
+        self.assertEqual(self.store.stats()['reused'], 1)
+
+        # Replacing a file doesn't change the other runs
+        self.store.write(second, b'other')
+        self.assertEqual(first.read_bytes(), b'report')
+
+    def test_copy(self):
+        """Fall back to copying when a link can't be made"""
+        path = self.path.joinpath('run', 'mux_scan.csv')
+
+        with unittest.mock.patch('os.link', side_effect=OSError(errno.EXDEV, 'Cross-device link')):
+            method = self.store.write(path, b'channel,mux\n' * 1000)
+
+        self.assertIn(method, {'reflink', 'copy_file_range', 'copy'})
+        self.assertEqual(path.read_bytes(), b'channel,mux\n' * 1000)
+        self.assertEqual(os.stat(path).st_nlink, 1)
+
+    def test_collect(self):
+        path = self.path.joinpath('run', 'final_summary.txt')
+        self.store.write(path, b'summary')
+        self.store.write(self.path.joinpath('run', 'empty'), b'')
+
+        self.assertEqual(self.store.collect(), 0)
+
+        path.unlink()
+        self.assertEqual(self.store.collect(), 1)
+
+    def test_collect_while_placing(self):
+        """A blob that has been stored but not placed yet isn't collected"""
+        path = self.path.joinpath('run', 'report.md')
+        collected = list()
+
+        with self.store.lock():
+            digest = self.store.put(b'report')
+            collector = threading.Thread(target=lambda: collected.append(self.store.collect()))
+            collector.start()
+
+            # Collection waits for the file to be placed
+            collector.join(0.2)
+            self.assertTrue(collector.is_alive())
+            self.store.materialise(digest, path, data=b'report')
+
+        collector.join(5)
+        self.assertEqual(collected, [0])
+        self.assertEqual(path.read_bytes(), b'report')
+
+    def test_collected_before_placing(self):
+        """A blob removed before it's placed is stored again"""
+        path = self.path.joinpath('run', 'report.md')
+        digest = self.store.put(b'report')
+        self.assertEqual(self.store.collect(), 1)
+
+        self.assertEqual(self.store.materialise(digest, path, data=b'report'), 'link')
+        self.assertEqual(path.read_bytes(), b'report')
+
+        # Without the content, it can't be stored again
+        digest = self.store.put(b'other')
+        self.store.collect()
+        with self.assertRaises(FileNotFoundError):
+            self.store.materialise(digest, self.path.joinpath('run', 'other.md'))
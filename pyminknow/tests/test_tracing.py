@@ -0,0 +1,90 @@
+import concurrent.futures
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import grpc
+
+import pyminknow.client
+import pyminknow.tracing
+
+PORT = 9599
+METHOD = '/pyminknow.test.Echo/echo'
+
+
+class TestTracing(unittest.TestCase):
+    """Test request tracing"""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'traces.jsonl')
+
+        self.tracer = pyminknow.tracing.Tracer(self.path, sample_rate=0)
+        patch = unittest.mock.patch.object(pyminknow.tracing, 'TRACER', self.tracer)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def spans(self) -> list:
+        self.tracer.close()
+        with open(self.path) as file:
+            return [span for line in file for resource in json.loads(line)['resourceSpans']
+                    for scope in resource['scopeSpans'] for span in scope['spans']]
+
+    def test_traceparent(self):
+        context = pyminknow.tracing.SpanContext('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', True)
+        value = pyminknow.tracing.format_traceparent(context)
+
+        self.assertEqual(value, '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01')
+        self.assertEqual(pyminknow.tracing.parse_traceparent(value), context)
+        self.assertIsNone(pyminknow.tracing.parse_traceparent('00-xyz-00f067aa0ba902b7-01'))
+
+    def test_span(self):
+        # Outside a trace
+        with pyminknow.tracing.span('ignored') as span:
+            self.assertIsNone(span)
+
+        with pyminknow.tracing.trace() as context:
+            with pyminknow.tracing.span('outer', run_id='abc'):
+                with pyminknow.tracing.span('inner'):
+                    pass
+
+        inner, outer = self.spans()
+        self.assertEqual(outer['traceId'], context.trace_id)
+        self.assertEqual(outer['parentSpanId'], context.span_id)
+        self.assertEqual(inner['parentSpanId'], outer['spanId'])
+        self.assertEqual(outer['attributes'], [dict(key='run_id', value=dict(stringValue='abc'))])
+
+    def test_propagation(self):
+        """The client's trace context is carried to the server"""
+
+        def echo(request, context):
+            with pyminknow.tracing.span('stage'):
+                return request
+
+        server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=2),
+                             interceptors=[pyminknow.tracing.TracingInterceptor(self.tracer)])
+        server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler('pyminknow.test.Echo', dict(
+            echo=grpc.unary_unary_rpc_method_handler(echo))),))
+        server.add_insecure_port('[::]:{}'.format(PORT))
+        server.start()
+        self.addCleanup(server.stop, None)
+
+        with pyminknow.client.connect(port=PORT) as channel:
+            call = channel.unary_unary(METHOD)
+            self.assertEqual(call(b'hello'), b'hello')
+
+            with pyminknow.tracing.trace(sampled=False):
+                call(b'not sampled')
+
+            with pyminknow.tracing.trace() as context:
+                call(b'sampled')
+
+        stage, handler = self.spans()
+        self.assertEqual(handler['name'], METHOD.lstrip('/'))
+        self.assertEqual(handler['traceId'], context.trace_id)
+        self.assertEqual(handler['parentSpanId'], context.span_id)
+        self.assertEqual(handler['kind'], pyminknow.tracing.KIND_SERVER)
+        self.assertEqual(stage['parentSpanId'], handler['spanId'])
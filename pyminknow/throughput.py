@@ -0,0 +1,67 @@
+"""
+Sequencing yield model
+
+Read and base counts are calculated in closed form from the elapsed acquisition time, so progress queries cost the
+same however long a run has been going.
+"""
+
+import pyminknow.config
+
+
+class Throughput:
+    """Constant-rate sequencing yield"""
+
+    def __init__(self, reads_per_second: float, mean_read_length: float, pass_fraction: float,
+                 sample_rate: int, channel_count: int, samples_per_base: float):
+        """
+        :param reads_per_second: Reads produced by the whole flow cell
+        :param mean_read_length: Bases per read
+        :param pass_fraction: Proportion of reads that pass basecalling quality filters
+        :param sample_rate: Raw samples per second per channel
+        :param channel_count: Number of channels
+        :param samples_per_base: Raw samples per base (translocation speed)
+        """
+        self.reads_per_second = reads_per_second
+        self.mean_read_length = mean_read_length
+        self.pass_fraction = pass_fraction
+        self.sample_rate = sample_rate
+        self.channel_count = channel_count
+        self.samples_per_base = samples_per_base
+
+    @classmethod
+    def for_device(cls, device: dict):
+        """Use the device's own settings, if any, in preference to the defaults"""
+        settings = dict(pyminknow.config.THROUGHPUT)
+        settings.update(device.get('throughput') or dict())
+        return cls(**settings)
+
+    def read_count(self, elapsed: float) -> int:
+        return int(self.reads_per_second * elapsed)
+
+    def pass_read_count(self, elapsed: float) -> int:
+        return int(self.read_count(elapsed) * self.pass_fraction)
+
+    def bases(self, read_count: int) -> int:
+        return int(read_count * self.mean_read_length)
+
+    def samples_per_channel(self, elapsed: float) -> int:
+        """Raw samples acquired by each channel"""
+        return int(self.sample_rate * elapsed)
+
+    def yield_summary(self, elapsed: float) -> dict:
+        """Keyword arguments for an AcquisitionYieldSummary"""
+        read_count = self.read_count(elapsed)
+        pass_read_count = self.pass_read_count(elapsed)
+        fail_read_count = read_count - pass_read_count
+        bases = self.bases(read_count)
+
+        return dict(
+            read_count=read_count,
+            basecalled_pass_read_count=pass_read_count,
+            basecalled_fail_read_count=fail_read_count,
+            basecalled_pass_bases=self.bases(pass_read_count),
+            basecalled_fail_bases=self.bases(fail_read_count),
+            basecalled_samples=int(bases * self.samples_per_base),
+            selected_raw_samples=self.samples_per_channel(elapsed) * self.channel_count,
+            estimated_selected_bases=bases,
+        )
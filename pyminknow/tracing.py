@@ -0,0 +1,341 @@
+"""
+Request tracing
+
+A server interceptor opens a span for each sampled RPC, and nested stages (loading and saving runs, writing run
+data, timestamp conversion) open child spans with `span()`. Finished spans are written by a background thread to a
+JSON-lines file in the OTLP/JSON encoding (one ExportTraceServiceRequest per line), which OpenTelemetry collectors
+and viewers can import.
+
+Sampling is decided once, at the head of each trace: a request carrying a W3C `traceparent` metadata entry (as sent
+by pyminknow.client inside `trace()`) follows the caller's decision; any other request is sampled at
+config.TRACE_SAMPLE_RATE. Unsampled requests only pay for one random number and a context variable lookup per span.
+"""
+
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+
+import grpc
+
+import pyminknow.config
+import pyminknow.interceptors
+
+LOGGER = logging.getLogger(__name__)
+
+# gRPC metadata key for W3C trace context, e.g. "00-<32 hex trace ID>-<16 hex span ID>-01"
+TRACEPARENT = 'traceparent'
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+SpanContext = collections.namedtuple('SpanContext', ('trace_id', 'span_id', 'sampled'))
+
+# Context of the span in progress in this thread (or task)
+_context = contextvars.ContextVar('trace_context', default=None)
+
+_random = random.Random()
+
+
+def new_id(bits: int) -> str:
+    return '{:0{}x}'.format(_random.getrandbits(bits) or 1, bits // 4)
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return '00-{}-{}-{:02x}'.format(context.trace_id, context.span_id, int(context.sampled))
+
+
+def parse_traceparent(value: str) -> SpanContext:
+    """Trace context from a traceparent header (None if it isn't valid)"""
+    try:
+        version, trace_id, span_id, flags = value.strip().split('-')
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+
+    if len(trace_id) != 32 or len(span_id) != 16 or version == 'ff':
+        return None
+
+    return SpanContext(trace_id.lower(), span_id.lower(), sampled)
+
+
+def current() -> SpanContext:
+    """Context of the span in progress (None outside a trace)"""
+    return _context.get()
+
+
+def encode_value(value) -> dict:
+    """OTLP AnyValue"""
+    if isinstance(value, bool):
+        return dict(boolValue=value)
+    if isinstance(value, int):
+        return dict(intValue=str(value))
+    if isinstance(value, float):
+        return dict(doubleValue=value)
+    return dict(stringValue=str(value))
+
+
+class Span:
+    """A timed stage of a trace"""
+
+    def __init__(self, name: str, context: SpanContext, parent_id: str = None, kind: int = KIND_INTERNAL,
+                 attributes: dict = None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or ())
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+
+    def as_dict(self) -> dict:
+        """OTLP/JSON span"""
+        data = dict(
+            traceId=self.context.trace_id,
+            spanId=self.context.span_id,
+            name=self.name,
+            kind=self.kind,
+            startTimeUnixNano=str(self.start),
+            endTimeUnixNano=str(self.end),
+            attributes=[dict(key=key, value=encode_value(value)) for key, value in self.attributes.items()],
+            status=dict(code=STATUS_ERROR, message=self.error) if self.error else dict(code=STATUS_OK),
+        )
+        if self.parent_id:
+            data['parentSpanId'] = self.parent_id
+        return data
+
+
+class Tracer:
+    """Sample traces and export their spans to a file"""
+
+    def __init__(self, path: str, sample_rate: float = None, seed: int = None):
+        """
+        :param path: JSON-lines output file
+        :param sample_rate: Fraction of traces started here that are recorded
+        :param seed: Random seed for sampling and IDs
+        """
+        self.path = path
+        self.sample_rate = pyminknow.config.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        if seed is not None:
+            _random.seed(seed)
+
+        # Finished spans waiting to be written (dropped if the writer falls behind)
+        self.queue = queue.Queue(maxsize=pyminknow.config.TRACE_QUEUE_SIZE)
+        self.dropped = 0
+        self.exported = 0
+
+        self.file = open(path, 'a')
+        self._thread = threading.Thread(target=self.export, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+        LOGGER.info("Tracing %.1f%% of requests to '%s'", self.sample_rate * 100, path)
+
+    def sample(self) -> bool:
+        return _random.random() < self.sample_rate
+
+    def finish(self, span: Span):
+        span.end = time.time_ns()
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def export(self):
+        """Writer thread: write each batch of finished spans as one line"""
+        while True:
+            spans = [self.queue.get()]
+            while True:
+                try:
+                    spans.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in spans
+            spans = [span for span in spans if span is not None]
+
+            if spans:
+                self.file.write(json.dumps(dict(resourceSpans=[dict(
+                    resource=dict(attributes=[dict(key='service.name', value=encode_value('pyminknow'))]),
+                    scopeSpans=[dict(scope=dict(name=__name__), spans=[span.as_dict() for span in spans])],
+                )])) + '\n')
+                self.file.flush()
+                self.exported += len(spans)
+
+            if stop:
+                return
+
+    def close(self):
+        self.queue.put(None)
+        self._thread.join()
+        self.file.close()
+        LOGGER.info("Exported %s spans (%s dropped)", self.exported, self.dropped)
+
+
+# Tracer for this process (None: tracing is off)
+TRACER = None
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Time a stage as a child of the span in progress, if this trace is sampled"""
+    parent = _context.get()
+    tracer = TRACER
+    if tracer is None or parent is None or not parent.sampled:
+        yield None
+        return
+
+    item = Span(name, SpanContext(parent.trace_id, new_id(64), True), parent_id=parent.span_id,
+                attributes=attributes)
+    token = _context.set(item.context)
+    try:
+        yield item
+    except BaseException as error:
+        item.error = repr(error)
+        raise
+    finally:
+        _context.reset(token)
+        tracer.finish(item)
+
+
+def traced(name: str):
+    """Decorator: time each call as a span"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            parent = _context.get()
+            if parent is None or not parent.sampled:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def trace(sampled: bool = True):
+    """
+    Client side: start a trace, so RPCs sent inside it carry its context to the server
+
+    :param sampled: Ask servers to record the trace
+    """
+    token = _context.set(SpanContext(new_id(128), new_id(64), sampled))
+    try:
+        yield _context.get()
+    finally:
+        _context.reset(token)
+
+
+class TracingInterceptor(grpc.ServerInterceptor):
+    """Open a server span for each sampled RPC"""
+
+    def __init__(self, tracer: Tracer, device: dict = None):
+        self.tracer = tracer
+        self.device_name = device['name'] if device else ''
+
+    def start(self, method: str, context) -> Span:
+        """Server span for a request, or None if it isn't sampled"""
+        parent = None
+        for key, value in context.invocation_metadata() or ():
+            if key == TRACEPARENT:
+                parent = parse_traceparent(value)
+                break
+
+        if parent is None:
+            if not self.tracer.sample():
+                return None
+            trace_id, parent_id = new_id(128), None
+        elif parent.sampled:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            return None
+
+        attributes = {'rpc.system': 'grpc', 'rpc.method': method}
+        if self.device_name:
+            attributes['pyminknow.device'] = self.device_name
+
+        return Span(method.lstrip('/'), SpanContext(trace_id, new_id(64), True), parent_id=parent_id,
+                    kind=KIND_SERVER, attributes=attributes)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method = handler_call_details.method
+        tracer = self.tracer
+
+        def run(item: Span, function, *args):
+            token = _context.set(item.context)
+            try:
+                return function(*args)
+            except StopIteration:
+                raise
+            except BaseException as error:
+                item.error = repr(error)
+                raise
+            finally:
+                _context.reset(token)
+
+        def wrapper(behaviour, response_streaming: bool):
+            def handle(request, context):
+                item = self.start(method, context)
+                if item is None:
+                    return behaviour(request, context)
+                try:
+                    return run(item, behaviour, request, context)
+                finally:
+                    tracer.finish(item)
+
+            def handle_stream(request, context):
+                item = self.start(method, context)
+                if item is None:
+                    yield from behaviour(request, context)
+                    return
+
+                # Each response is produced in this span's context
+                responses = run(item, behaviour, request, context)
+                try:
+                    while True:
+                        try:
+                            response = run(item, next, responses)
+                        except StopIteration:
+                            break
+                        item.attributes['rpc.responses'] = item.attributes.get('rpc.responses', 0) + 1
+                        yield response
+                finally:
+                    tracer.finish(item)
+
+            return handle_stream if response_streaming else handle
+
+        return pyminknow.interceptors.wrap_handler(handler, wrapper)
+
+
+class ClientTracingInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """Send the context of the trace in progress with each call"""
+
+    @staticmethod
+    def add_context(client_call_details):
+        context = _context.get()
+        if context is None:
+            return client_call_details
+
+        metadata = list(client_call_details.metadata or ())
+        metadata.append((TRACEPARENT, format_traceparent(context)))
+        return client_call_details._replace(metadata=metadata)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return continuation(self.add_context(client_call_details), request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return continuation(self.add_context(client_call_details), request)